@@ -0,0 +1,143 @@
+"""
+Server-side user analytics.
+
+`user_signals` gathers the numbers the dashboard and the cognitive
+profile engine need in one aggregation round trip: it starts from the
+user's document and fans out with $facet into three correlated $lookup
+branches (emotion rollup window, recent decision confidence, course
+progress). Each branch projects only the fields it averages, so just the
+final numbers (plus the window's emotion labels for tie-breaking the
+dominant emotion) come back over the wire.
+
+The $lookup form with localField/foreignField *and* a sub-pipeline needs
+MongoDB 5.0+; it uses the (user_id, timestamp) and user_id indexes.
+`check_server` runs during app warm-up and reports an older server.
+"""
+from bson import ObjectId
+
+import emotion_rollup
+
+MIN_SERVER_VERSION = (5, 0)
+
+
+def _has_result():
+    return {"$and": [
+        {"$ne": [{"$ifNull": ["$result", None]}, None]},
+        {"$ne": ["$result", {}]},
+    ]}
+
+
+def signals_pipeline(user_oid, emotion_window, decision_limit):
+    uid = str(user_oid)
+    return [
+        {"$match": {"_id": user_oid}},
+        {"$project": {"_id": 0, "uid": {"$literal": uid}}},
+        {"$facet": {
+            "emotions": [
+                {"$lookup": {
+                    "from": "emotion_rollups",
+                    "localField": "uid",
+                    "foreignField": "_id",
+                    "pipeline": [
+                        {"$project": {
+                            "_id": 0,
+                            "window": f"$windows.{emotion_window}",
+                            "labels": {"$slice": ["$recent.emotion", emotion_window]},
+                        }},
+                    ],
+                    "as": "rollup",
+                }},
+                {"$unwind": "$rollup"},
+                {"$replaceRoot": {"newRoot": "$rollup"}},
+            ],
+            "decisions": [
+                {"$lookup": {
+                    "from": "decisions",
+                    "localField": "uid",
+                    "foreignField": "user_id",
+                    "pipeline": [
+                        {"$sort": {"timestamp": -1}},
+                        {"$limit": decision_limit},
+                        {"$project": {
+                            "_id": 0,
+                            "has_result": _has_result(),
+                            "confidence": {"$ifNull": ["$result.confidence_score", 50]},
+                        }},
+                    ],
+                    "as": "rows",
+                }},
+                {"$project": {
+                    "count": {"$size": "$rows"},
+                    "confidence_avg": {"$avg": {"$map": {
+                        "input": {"$filter": {"input": "$rows", "cond": "$$this.has_result"}},
+                        "in": "$$this.confidence",
+                    }}},
+                }},
+            ],
+            "courses": [
+                {"$lookup": {
+                    "from": "courses",
+                    "localField": "uid",
+                    "foreignField": "user_id",
+                    "pipeline": [
+                        {"$project": {"_id": 0, "progress": {"$ifNull": ["$progress_percent", 0]}}},
+                    ],
+                    "as": "rows",
+                }},
+                {"$project": {
+                    "count": {"$size": "$rows"},
+                    "progress_avg": {"$avg": "$rows.progress"},
+                }},
+            ],
+        }},
+    ]
+
+
+def check_server(client):
+    """False (and a startup message) when the server can't run signals_pipeline."""
+    version = tuple(client.server_info().get("versionArray", [0, 0])[:2])
+    if version < MIN_SERVER_VERSION:
+        print(f"❌ MongoDB {'.'.join(map(str, version))} is older than 5.0: "
+              "user_signals needs $lookup with localField/foreignField and a pipeline")
+        return False
+    return True
+
+
+def _first(facets, name):
+    rows = facets.get(name) or []
+    return rows[0] if rows else {}
+
+
+def user_signals(db, user_id, emotion_window=20, decision_limit=10):
+    """
+    {
+      "emotions": emotion_rollup.window_stats(...) for the newest `emotion_window` entries,
+      "decision_count", "decision_confidence_avg" (None without decisions),
+      "course_count", "course_progress_avg" (None without courses)
+    }
+
+    Needs MongoDB 5.0+ (see check_server).
+    """
+    oid = user_id if isinstance(user_id, ObjectId) else ObjectId(str(user_id))
+    docs = list(db["users"].aggregate(signals_pipeline(oid, emotion_window, decision_limit)))
+    facets = docs[0] if docs else {}
+
+    rollup_part = _first(facets, "emotions")
+    if rollup_part:
+        rollup = {
+            "recent": [{"emotion": label} for label in rollup_part.get("labels", [])],
+            "windows": {str(emotion_window): rollup_part.get("window") or {}},
+        }
+    else:
+        # user predates the rollup; build it once
+        rollup = emotion_rollup.get_rollup(db, str(oid))
+
+    decisions = _first(facets, "decisions")
+    courses = _first(facets, "courses")
+    return {
+        "emotions": emotion_rollup.window_stats(rollup, emotion_window),
+        "decision_count": decisions.get("count", 0),
+        "decision_confidence_avg": decisions.get("confidence_avg"),
+        "course_count": courses.get("count", 0),
+        "course_progress_avg": courses.get("progress_avg"),
+    }
@@ -1,6 +1,8 @@
-from flask import Flask, request, jsonify
+import readiness  # first: starts the startup clock
+from flask import Blueprint, Flask, current_app, g, request, jsonify, make_response, Response, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 import bcrypt
 import jwt
@@ -8,23 +10,58 @@ import datetime
 import os
 from dotenv import load_dotenv
 from functools import wraps
-from groq import Groq
+from statistics import mean
+import analytics
+import auth_cache
+import batch
+import decision_ai
+import compression
+import course_items
+import course_store
+import data_version
+import decision_cache
+import emotion_ai
+import emotion_rollup
+import indexes
+import json_provider
+import llm_cache
+import llm_client
+import metrics
+import mongo
+import pagination
+import profiling
+import request_loader
+import streaming
+import syllabus
 
 # Load environment variables
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-groq_client = Groq(api_key=GROQ_API_KEY)
+
+
+def _groq_client():
+    # groq pulls in httpx and pydantic: imported on first use, not at boot
+    from groq import Groq
+    # retries/timeouts are owned by LLMClient, so the SDK's own retries are off
+    return Groq(api_key=GROQ_API_KEY, max_retries=0)
+
+
+llm = llm_client.LLMClient(client_factory=_groq_client)
+metrics.watch_llm(llm)
 print("GROQ KEY LOADED:", GROQ_API_KEY)
 
-app = Flask(__name__)
+# "sync" (default) interprets before responding; "async" always answers 202
+# and enriches in the background. Per request: ?async=1 or {"async": true}.
+EMOTION_AI_MODE = os.getenv("EMOTION_AI_MODE", "sync").lower()
+
+# every route lives on this blueprint; create_app() (bottom of file) builds the app
+api = Blueprint("api", __name__)
 
 # ---------------------------
-# 🌐 FIXED CORS CONFIG
+# 🌐 FIXED CORS CONFIG (CORS() itself is applied in create_app)
 # ---------------------------
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
-
-@app.before_request
+@api.before_app_request
 def handle_preflight():
     if request.method == "OPTIONS":
         response = jsonify({"status": "ok"})
@@ -33,20 +70,13 @@ def handle_preflight():
         response.headers.add("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
         return response
 
-# Secret key for JWT
-app.config["SECRET_KEY"] = os.getenv("JWT_SECRET", "neuro_secret_key")
-
 # ---------------------------
 # 🧩 MongoDB Connection
+# created lazily in each worker process, never inherited across fork (mongo.py)
 # ---------------------------
-try:
-    client = MongoClient(os.getenv("MONGO_URI"))
-    db = client["nuerolink_db"]
-    users = db["users"]
-    courses_col = db["courses"]
-    print("✅ Successfully connected to MongoDB")
-except Exception as e:
-    print(f"❌ MongoDB connection failed: {e}")
+db = mongo.db
+users = mongo.collection("users")
+courses_col = mongo.collection("courses")
 
 # ---------------------------
 # 🔐 JWT Middleware
@@ -63,23 +93,99 @@ def token_required(f):
         if not token:
             return jsonify({"error": "Access denied. Token missing!"}), 401
 
+        # /api/batch sub-requests: the batch already verified this token
+        loader = _loader()
+        if loader.user is not None and g.get("auth_token") == token:
+            return f(loader.user, *args, **kwargs)
+
         try:
-            decoded = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
-            current_user = users.find_one({"_id": ObjectId(decoded["user_id"])})
-            if not current_user:
-                return jsonify({"error": "User not found"}), 404
+            decoded = auth_cache.get_claims(token)
+            if decoded is None:
+                decoded = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
+                auth_cache.put_claims(token, decoded)
+
+            current_user, user_version = auth_cache.get_user(decoded["user_id"])
+            if current_user is None:
+                current_user = users.find_one({"_id": ObjectId(decoded["user_id"])})
+                if not current_user:
+                    return jsonify({"error": "User not found"}), 404
+                auth_cache.refresh_user(current_user)
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Session expired, please login again"}), 401
         except jwt.InvalidTokenError:
             return jsonify({"error": "Invalid token"}), 401
 
+        loader.set_user(current_user, user_version)
+        g.auth_token = token
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+
+def _loader():
+    """This request's RequestLoader (memoized reads, write invalidation)."""
+    return request_loader.loader(db)
+
+
+def conditional_get(f):
+    """
+    Strong ETag from the user's data version (see data_version.py).
+    A matching If-None-Match gets a 304 before the handler runs.
+    Otherwise the handler gets a user document at least as new as that
+    version (auth_cache may hold one from before another worker's write).
+    Goes under @token_required.
+    """
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        loader = _loader()
+        version = loader.data_version()
+        tag = data_version.etag(current_user["_id"], version, request.full_path)
+        for candidate in (tag, *(f"{tag}-{enc}" for enc in compression.ENCODINGS)):
+            if request.if_none_match.contains(candidate):
+                response = Response(status=304)
+                response.set_etag(candidate)
+                response.headers["Cache-Control"] = "private, no-cache"
+                response.vary.add("Accept-Encoding")
+                return response
+
+        if loader.user_version != version:
+            fresh = users.find_one({"_id": current_user["_id"]})
+            if fresh is not None:
+                auth_cache.refresh_user(fresh, version)
+                loader.set_user(fresh, version)
+                current_user = fresh
+        response = make_response(f(current_user, *args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(tag)
+            response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    return decorated
+
+
+def repairs_course_counters(f):
+    """
+    Rebuild the user's stale course counters (course_store.counters_stale)
+    before conditional_get computes its ETag: the repair bumps the data
+    version, so a client holding the old tag gets the rebuilt course
+    instead of a 304. Goes between @token_required and @conditional_get.
+    """
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        course_oid = _course_oid(kwargs["cid"]) if "cid" in kwargs else None
+        if "cid" not in kwargs or course_oid is not None:
+            if course_store.repair_stale_counters(courses_col, current_user["_id"], course_oid):
+                _loader().wrote("courses")
         return f(current_user, *args, **kwargs)
     return decorated
 
+
+@api.after_app_request
+def _compress(response):
+    return compression.compress_response(response, request.accept_encodings)
+
 # ---------------------------
 # 🧠 AUTH ROUTES
 # ---------------------------
-@app.route("/api/auth/register", methods=["POST"])
+@api.route("/api/auth/register", methods=["POST"])
 def register_user():
     data = request.get_json() or {}
     name = data.get("name")
@@ -89,21 +195,28 @@ def register_user():
     if not name or not email or not password:
         return jsonify({"error": "All fields are required"}), 400
 
-    if users.find_one({"email": email}):
-        return jsonify({"error": "Email already exists"}), 400
+    # uniqueness is enforced by the users.email unique index, which the
+    # Mongo warm-up builds; without it a duplicate would be accepted
+    if not readiness.warmup.wait("mongo", readiness.WAIT_SECONDS):
+        response = jsonify({"error": "Service is starting, please retry"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
 
     hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-    users.insert_one({
-        "name": name,
-        "email": email,
-        "password": hashed_pw.decode("utf-8"),
-        "created_at": datetime.datetime.utcnow()
-    })
+    try:
+        users.insert_one({
+            "name": name,
+            "email": email,
+            "password": hashed_pw.decode("utf-8"),
+            "created_at": datetime.datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return jsonify({"error": "Email already exists"}), 400
 
     return jsonify({"message": "User registered successfully"}), 201
 
 
-@app.route("/api/auth/login", methods=["POST"])
+@api.route("/api/auth/login", methods=["POST"])
 def login_user():
     data = request.get_json() or {}
     email = data.get("email")
@@ -122,7 +235,7 @@ def login_user():
     token = jwt.encode({
         "user_id": str(user["_id"]),
         "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=8)
-    }, app.config["SECRET_KEY"], algorithm="HS256")
+    }, current_app.config["SECRET_KEY"], algorithm="HS256")
 
     return jsonify({
         "message": "Login successful",
@@ -137,7 +250,7 @@ def login_user():
 
 def _serialize_user_doc(doc):
     return {
-        "id": str(doc.get("_id")),
+        "id": doc.get("_id"),
         "name": doc.get("name"),
         "email": doc.get("email"),
         "department": doc.get("department"),
@@ -149,15 +262,16 @@ def _serialize_user_doc(doc):
         "enrollment_number": doc.get("enrollment_number"),
         "dob": doc.get("dob"),
         "cognitive_profile": doc.get("cognitive_profile", {}),
-        "created_at": doc.get("created_at").isoformat() if doc.get("created_at") else None
+        "created_at": doc.get("created_at")
     }
 
-@app.route("/api/user/profile", methods=["GET"])
+@api.route("/api/user/profile", methods=["GET"])
 @token_required
+@conditional_get
 def get_user_profile(current_user):
     return jsonify(_serialize_user_doc(current_user)), 200
 
-@app.route("/api/user/profile", methods=["PUT"])
+@api.route("/api/user/profile", methods=["PUT"])
 @token_required
 def update_user_profile(current_user):
     data = request.get_json() or {}
@@ -185,8 +299,13 @@ def update_user_profile(current_user):
             else:
                 updates[key] = str(value).strip()
 
-    users.update_one({"_id": current_user["_id"]}, {"$set": updates})
-    updated = users.find_one({"_id": current_user["_id"]})
+    updated = users.find_one_and_update(
+        {"_id": current_user["_id"]},
+        {"$set": updates},
+        return_document=ReturnDocument.AFTER
+    )
+    auth_cache.refresh_user(updated)
+    _loader().wrote("user", user=updated)
 
     return jsonify(_serialize_user_doc(updated)), 200
 
@@ -194,51 +313,29 @@ def update_user_profile(current_user):
 # ---------------------------
 # 🧠 ADVANCED COGNITIVE PROFILE ENGINE
 # ---------------------------
-from statistics import mean
-
-@app.route("/api/cognitive/profile/analyze", methods=["POST"])
+@api.route("/api/cognitive/profile/analyze", methods=["POST"])
 @token_required
 def analyze_cognitive_profile(current_user):
-    user_id = str(current_user["_id"])
-
     # Fetch user data
     learning = current_user.get("learning_styles", [])
     subjects = current_user.get("subjects", [])
     dept = current_user.get("department", "Unknown")
     year = current_user.get("year", "Unknown")
 
+    # One aggregation round trip for emotions, decisions and courses
+    signals = _loader().signals(emotion_window=15, decision_limit=10)
+
     # ----------------------------------------------------
     # 1️⃣ Read REAL signals from emotions
     # ----------------------------------------------------
-    emotions_col = db["emotions"]
-    recent_emotions = list(
-        emotions_col.find({"user_id": user_id}).sort("timestamp", -1).limit(15)
-    )
+    stats = signals["emotions"]
 
-    if recent_emotions:
-        focus_scores = []
-        stress_scores = []
-        motivation_scores = []
-        intensities = []
-        emotion_names = []
-
-        for e in recent_emotions:
-            ai = e.get("ai", {})
-            intensities.append(e.get("intensity", 50))
-            emotion_names.append(e.get("emotion"))
-
-            if ai.get("focus_score") is not None:
-                focus_scores.append(ai["focus_score"])
-            if ai.get("stress_score") is not None:
-                stress_scores.append(ai["stress_score"])
-            if ai.get("motivation_score") is not None:
-                motivation_scores.append(ai["motivation_score"])
-
-        dominant_emotion = Counter(emotion_names).most_common(1)[0][0]
-        avg_focus = round(mean(focus_scores)) if focus_scores else 55
-        avg_stress = round(mean(stress_scores)) if stress_scores else 55
-        avg_motivation = round(mean(motivation_scores)) if motivation_scores else 55
-        emotional_intensity = round(mean(intensities)) if intensities else 50
+    if stats["count"]:
+        dominant_emotion = stats["dominant_emotion"]
+        avg_focus = round(stats["focus_avg"]) if stats["focus_avg"] is not None else 55
+        avg_stress = round(stats["stress_avg"]) if stats["stress_avg"] is not None else 55
+        avg_motivation = round(stats["motivation_avg"]) if stats["motivation_avg"] is not None else 55
+        emotional_intensity = round(stats["avg_intensity"]) if stats["avg_intensity"] is not None else 50
 
     else:
         dominant_emotion = "Neutral"
@@ -250,25 +347,16 @@ def analyze_cognitive_profile(current_user):
     # ----------------------------------------------------
     # 2️⃣ Read REAL signals from Decisions
     # ----------------------------------------------------
-    decisions = list(
-        db["decisions"].find({"user_id": user_id}).sort("timestamp", -1).limit(10)
-    )
-    if decisions:
-        confidence_scores = [
-            d["result"].get("confidence_score", 50)
-            for d in decisions
-        ]
-        decision_confidence = round(mean(confidence_scores))
+    if signals["decision_confidence_avg"] is not None:
+        decision_confidence = round(signals["decision_confidence_avg"])
     else:
         decision_confidence = 55
 
     # ----------------------------------------------------
     # 3️⃣ Read REAL Course performance
     # ----------------------------------------------------
-    courses = list(db["courses"].find({"user_id": user_id}))
-    if courses:
-        progresses = [c.get("progress_percent", 0) for c in courses]
-        course_engagement = round(mean(progresses))
+    if signals["course_progress_avg"] is not None:
+        course_engagement = round(signals["course_progress_avg"])
     else:
         course_engagement = 0
 
@@ -378,61 +466,40 @@ def analyze_cognitive_profile(current_user):
     }
 
     # Save to DB
-    users.update_one(
+    updated = users.find_one_and_update(
         {"_id": current_user["_id"]},
-        {"$set": {"cognitive_profile": cognitive_obj}}
+        {"$set": {"cognitive_profile": cognitive_obj}},
+        return_document=ReturnDocument.AFTER
     )
-
-    updated = users.find_one({"_id": current_user["_id"]})
+    auth_cache.refresh_user(updated)
+    _loader().wrote("user", user=updated)
     return jsonify(_serialize_user_doc(updated)), 200
 
 
 # ============================================================
 # 🧠 HYBRID COGNITIVE DASHBOARD ENGINE (CLEAN VERSION)
 # ============================================================
-from statistics import mean
-from collections import Counter
-
-@app.route("/api/dashboard", methods=["GET"])
+@api.route("/api/dashboard", methods=["GET"])
 @token_required
+@conditional_get
 def get_dashboard_data(current_user):
-    user_id = str(current_user["_id"])
+    # One aggregation round trip; only final numbers come back
+    signals = _loader().signals(emotion_window=20, decision_limit=10)
 
     # ----------------------------------------------------------
     # 1️⃣ REAL-TIME EMOTION SIGNALS
     # ----------------------------------------------------------
-    emotions_col = db["emotions"]
-    recent = list(
-        emotions_col.find({"user_id": user_id})
-        .sort("timestamp", -1)
-        .limit(20)
-    )
-
-    if recent:
-        emotion_names = [e.get("emotion") for e in recent]
-        intensities = [e.get("intensity", 50) for e in recent]
+    stats = signals["emotions"]
 
-        dominant_emotion = Counter(emotion_names).most_common(1)[0][0]
-        avg_intensity = round(mean(intensities))
-        emotion_variety = len(set(emotion_names))
+    if stats["count"]:
+        dominant_emotion = stats["dominant_emotion"]
+        avg_intensity = round(stats["avg_intensity"]) if stats["avg_intensity"] is not None else 0
+        emotion_variety = stats["variety"]
 
         # AI-based scores
-        focus_scores = []
-        stress_scores = []
-        motivation_scores = []
-
-        for e in recent:
-            ai = e.get("ai") or {}
-            if ai.get("focus_score") is not None:
-                focus_scores.append(ai["focus_score"])
-            if ai.get("stress_score") is not None:
-                stress_scores.append(ai["stress_score"])
-            if ai.get("motivation_score") is not None:
-                motivation_scores.append(ai["motivation_score"])
-
-        focus_avg = round(mean(focus_scores)) if focus_scores else 50
-        stress_avg = round(mean(stress_scores)) if stress_scores else 50
-        motivation_avg = round(mean(motivation_scores)) if motivation_scores else 50
+        focus_avg = round(stats["focus_avg"]) if stats["focus_avg"] is not None else 50
+        stress_avg = round(stats["stress_avg"]) if stats["stress_avg"] is not None else 50
+        motivation_avg = round(stats["motivation_avg"]) if stats["motivation_avg"] is not None else 50
 
     else:
         dominant_emotion = None
@@ -445,31 +512,18 @@ def get_dashboard_data(current_user):
     # ----------------------------------------------------------
     # 2️⃣ REAL-TIME DECISION CONFIDENCE
     # ----------------------------------------------------------
-    decisions_col = db["decisions"]
-    last_decisions = list(
-        decisions_col.find({"user_id": user_id})
-        .sort("timestamp", -1)
-        .limit(10)
-    )
-
-    confidence_scores = [
-        d["result"].get("confidence_score", 50)
-        for d in last_decisions if d.get("result")
-    ]
-
     decision_confidence_avg = (
-        round(mean(confidence_scores)) if confidence_scores else 50
+        round(signals["decision_confidence_avg"])
+        if signals["decision_confidence_avg"] is not None else 50
     )
 
     # ----------------------------------------------------------
     # 3️⃣ COURSE ENGAGEMENT (REAL-TIME)
     # ----------------------------------------------------------
-    user_courses = list(db["courses"].find({"user_id": user_id}))
-    if user_courses:
-        course_progresses = [c.get("progress_percent", 0) for c in user_courses]
-        course_engagement = round(mean(course_progresses))
-    else:
-        course_engagement = 0
+    course_engagement = (
+        round(signals["course_progress_avg"])
+        if signals["course_progress_avg"] is not None else 0
+    )
 
     # ----------------------------------------------------------
     # 4️⃣ CACHED AI SCORES (OPTIONAL)
@@ -511,28 +565,23 @@ def get_dashboard_data(current_user):
 # ============================================================
 # 🧠 CLEAN EMOTION SUMMARY (DASHBOARD VERSION)
 # ============================================================
-@app.route("/api/emotions/summary", methods=["GET"])
+@api.route("/api/emotions/summary", methods=["GET"])
 @token_required
+@conditional_get
 def get_emotion_summary(current_user):
-    emotions_col = db["emotions"]
-    records = list(
-        emotions_col.find({"user_id": str(current_user["_id"])}).sort("timestamp", -1).limit(5)
-    )
+    stats = _loader().emotion_stats(5)
 
-    if not records:
+    if not stats["count"]:
         return jsonify({
             "stability": "No data",
             "dominant_emotion": None,
             "average_intensity": 0
         }), 200
 
-    emotion_counts = Counter([e["emotion"] for e in records])
-    total_intensity = [e.get("intensity", 50) for e in records]
-
-    dominant = emotion_counts.most_common(1)[0][0]
-    avg_intensity = round(mean(total_intensity))
+    dominant = stats["dominant_emotion"]
+    avg_intensity = round(stats["avg_intensity"])
 
-    variety = len(emotion_counts)
+    variety = stats["variety"]
     stability = (
         "Stable" if variety <= 2 else
         "Balanced" if variety <= 4 else
@@ -549,10 +598,7 @@ def get_emotion_summary(current_user):
 # ============================================
 # ❤️ EMOTION TRACKER — COGNITIVE TWIN ENGINE
 # ============================================
-from collections import Counter
-import json
-
-@app.route("/api/emotions", methods=["POST"])
+@api.route("/api/emotions", methods=["POST"])
 @token_required
 def add_emotion(current_user):
     data = request.get_json() or {}
@@ -562,112 +608,196 @@ def add_emotion(current_user):
     if not emotion:
         return jsonify({"error": "Emotion is required"}), 400
 
-    # ------------------------------------------
-    # AI INTERPRETATION PROMPT
-    # ------------------------------------------
-    prompt = f"""
-    You are an Emotional Cognitive Twin Engine analyzing the user's emotional state.
-
-    Emotion Logged: {emotion}
-    Intensity: {intensity}
-
-    Output STRICT JSON:
-
-    {{
-      "focus_score": number (0-100),
-      "stress_score": number (0-100),
-      "motivation_score": number (0-100),
-      "cognitive_state": "string",
-      "interpretation": "short explanation",
-      "recommendation": "one actionable suggestion"
-    }}
-    """
-
-    try:
-        completion = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-
-        raw = completion.choices[0].message.content
-        cleaned = raw.replace("```json", "").replace("```", "").strip()
-        ai_data = json.loads(cleaned)
-
-    except Exception as e:
-        print("AI Emotion Error:", e)
-        ai_data = {
-            "focus_score": 50,
-            "stress_score": 50,
-            "motivation_score": 50,
-            "cognitive_state": "neutral",
-            "interpretation": "AI failed to interpret emotion, fallback values used.",
-            "recommendation": "Try logging again in a moment."
-        }
-
     emotions_col = db["emotions"]
-    emotions_col.insert_one({
+    emotion_doc = {
         "user_id": str(current_user["_id"]),
         "emotion": emotion,
         "intensity": intensity,
         "timestamp": datetime.datetime.utcnow(),
-        "ai": ai_data
-    })
+    }
+
+    # ------------------------------------------
+    # ASYNC MODE: insert now, interpret in the background
+    # ------------------------------------------
+    async_mode = (
+        EMOTION_AI_MODE == "async"
+        or request.args.get("async") in ("1", "true")
+        or data.get("async") is True
+    )
+    cached = llm_cache.lookup(db, emotion, intensity) if async_mode else None
+    if async_mode and cached is None:
+        emotion_doc.update({
+            "ai": {},
+            "ai_status": "pending",
+            "ai_requested_at": emotion_doc["timestamp"],
+        })
+        emotions_col.insert_one(emotion_doc)
+        emotion_rollup.record_emotion(db, current_user["_id"], emotion_doc)
+        _loader().wrote("emotions")
+
+        if emotion_ai.enricher.submit(db, llm, emotion_doc):
+            return jsonify({
+                "message": "Emotion recorded, AI interpretation pending",
+                "id": emotion_doc["_id"],
+                "ai_status": "pending",
+                "ai": None,
+                "status_url": f"/api/emotions/{emotion_doc['_id']}/ai"
+            }), 202
+
+        # pool saturated: interpret inline rather than queue unboundedly
+        ai_data, ai_status = emotion_ai.interpret(db, llm, emotion, intensity, lookup=False)
+        emotion_ai.apply_interpretation(db, emotion_doc, ai_data, ai_status)
+        return jsonify({
+            "message": "Emotion recorded successfully",
+            "id": emotion_doc["_id"],
+            "ai_status": ai_status,
+            "ai": ai_data
+        }), 201
+
+    # ------------------------------------------
+    # SYNC MODE (or cache hit): AI interpretation before insert
+    # ------------------------------------------
+    if cached is not None:
+        ai_data, ai_status = cached, "done"
+    else:
+        ai_data, ai_status = emotion_ai.interpret(db, llm, emotion, intensity)
+    emotion_doc.update({"ai": ai_data, "ai_status": ai_status})
+    emotions_col.insert_one(emotion_doc)
+    emotion_rollup.record_emotion(db, current_user["_id"], emotion_doc)
+    _loader().wrote("emotions")
 
     return jsonify({
         "message": "Emotion recorded successfully",
+        "id": emotion_doc["_id"],
+        "ai_status": ai_status,
         "ai": ai_data
     }), 201
 
 
+# ===================================================
+# AI INTERPRETATION STATUS (async mode polling)
+# ===================================================
+@api.route("/api/emotions/<eid>/ai", methods=["GET"])
+@token_required
+def get_emotion_ai(current_user, eid):
+    try:
+        doc = db["emotions"].find_one(
+            {"_id": ObjectId(eid), "user_id": str(current_user["_id"])},
+            {"ai": 1, "ai_status": 1}
+        )
+    except Exception:
+        return jsonify({"error": "Invalid id"}), 400
+
+    if not doc:
+        return jsonify({"error": "Emotion not found"}), 404
+
+    # read-only: records a lost worker left pending are re-queued by emotion_ai.sweeper
+    status = doc.get("ai_status", "done")
+    return jsonify({
+        "id": doc["_id"],
+        "ai_status": status,
+        "ai": doc.get("ai") if status != "pending" else None
+    }), 200
+
+
+# ===================================================
+# PAGINATED / STREAMED HISTORY HELPERS
+# ===================================================
+def _history_response(collection, base, projection, serialize, default_limit, max_limit, recent=None):
+    """
+    Shared GET handler for time-ordered history. `recent(n)` (a loader
+    accessor) serves the first page so it is shared within the request.
+
+    Query params:
+      limit   page size (capped at max_limit)
+      before  cursor from the previous page's X-Next-Cursor header
+      format  "ndjson" to stream newline-delimited JSON
+      stream  "1" to stream a JSON array (no limit => full history)
+    """
+    fmt = request.args.get("format", "json")
+    streamed = fmt == "ndjson" or request.args.get("stream") in ("1", "true")
+    before = request.args.get("before")
+
+    try:
+        limit = pagination.parse_limit(
+            request.args.get("limit"), None if streamed else default_limit, max_limit
+        )
+        pagination.keyset_filter(base, before)
+    except pagination.CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if streamed:
+        docs = pagination.iter_docs(collection, base, projection, limit, before)
+        if fmt == "ndjson":
+            body = pagination.stream_ndjson(docs, serialize, current_app.json.dumps)
+            mimetype = "application/x-ndjson"
+        else:
+            body = pagination.stream_json_array(docs, serialize, current_app.json.dumps)
+            mimetype = "application/json"
+        return Response(stream_with_context(body), mimetype=mimetype)
+
+    if recent is not None and not before:
+        docs, next_cursor = pagination.split_page(recent(limit + 1), limit)
+    else:
+        docs, next_cursor = pagination.fetch_page(collection, base, projection, limit, before)
+    response = jsonify([serialize(d) for d in docs])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor"
+    return response, 200
+
+
 # ===================================================
 # GET ALL EMOTIONS (with cognitive interpretation)
 # ===================================================
-@app.route("/api/emotions", methods=["GET"])
+EMOTION_LIST_PROJECTION = request_loader.EMOTION_LIST_PROJECTION
+
+def _serialize_emotion(e):
+    return {
+        "_id": e["_id"],
+        "emotion": e.get("emotion"),
+        "intensity": e.get("intensity"),
+        "timestamp": e["timestamp"],
+        "ai": e.get("ai") or {},
+        "ai_status": e.get("ai_status", "done"),
+    }
+
+@api.route("/api/emotions", methods=["GET"])
 @token_required
+@conditional_get
 def get_emotions(current_user):
-    emotions_col = db["emotions"]
-    user_emotions = list(
-        emotions_col.find({"user_id": str(current_user["_id"])}).sort("timestamp", -1)
+    return _history_response(
+        db["emotions"],
+        {"user_id": str(current_user["_id"])},
+        EMOTION_LIST_PROJECTION,
+        _serialize_emotion,
+        default_limit=100,
+        max_limit=500,
+        recent=_loader().recent_emotions,
     )
 
-    for e in user_emotions:
-        e["_id"] = str(e["_id"])
-        e["timestamp"] = e["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
-        if "ai" not in e:
-            e["ai"] = {}
-
-    return jsonify(user_emotions), 200
-
 
 # ===================================================
 # WEEKLY TREND + EMOTIONAL PROFILE SUMMARY
 # ===================================================
-@app.route("/api/emotions/insights", methods=["GET"])
+@api.route("/api/emotions/insights", methods=["GET"])
 @token_required
+@conditional_get
 def get_emotion_insights(current_user):
-    emotions_col = db["emotions"]
-    records = list(
-        emotions_col.find({"user_id": str(current_user["_id"])}).sort("timestamp", -1).limit(5)
-    )
+    stats = _loader().emotion_stats(5)
 
-    if not records:
+    if not stats["count"]:
         return jsonify({
             "dominant_emotion": "None",
             "stability": "No Data",
             "average_intensity": 0,
         })
 
-    # Dominant Emotion
-    emotion_list = [r["emotion"] for r in records]
-    dominant_emotion = Counter(emotion_list).most_common(1)[0][0]
-
-    # Intensity Calculation
-    intensities = [r.get("intensity", 50) for r in records]
-    avg_intensity = round(sum(intensities) / len(intensities))
+    dominant_emotion = stats["dominant_emotion"]
+    avg_intensity = round(stats["avg_intensity"])
 
     # Stability Based on Emotional Variance
-    unique_emotions = len(set(emotion_list))
+    unique_emotions = stats["variety"]
     if unique_emotions <= 2:
         stability = "Stable"
     elif unique_emotions <= 4:
@@ -684,10 +814,7 @@ def get_emotion_insights(current_user):
 # ---------------------------
 # 🎯 DECISION LAB – COGNITIVE DECISION ENGINE (Advanced)
 # ---------------------------
-import json
-from collections import Counter
-
-@app.route("/api/decision/analyze", methods=["POST"])
+@api.route("/api/decision/analyze", methods=["POST"])
 @token_required
 def analyze_decision(current_user):
     data = request.get_json() or {}
@@ -696,308 +823,127 @@ def analyze_decision(current_user):
     if not question:
         return jsonify({"error": "Question is required"}), 400
 
-    # --- Gather user context ---
-    user_doc = users.find_one({"_id": current_user["_id"]})
-    cognitive_profile = user_doc.get("cognitive_profile", {})
-    learning_styles = user_doc.get("learning_styles", [])
-    subjects = user_doc.get("subjects", [])
-
-    # --- Recent emotion summary (last 10) ---
-    emotions_col = db["emotions"]
-    recent = list(emotions_col.find({"user_id": str(current_user["_id"])}).sort("timestamp", -1).limit(10))
-    dominant_emotion = None
-    avg_intensity = None
-    emotional_summary = {}
-    if recent:
-        emotion_names = [r.get("emotion") for r in recent if r.get("emotion")]
-        dominant_emotion = Counter(emotion_names).most_common(1)[0][0] if emotion_names else None
-        intensities = [r.get("intensity", 50) for r in recent]
-        avg_intensity = round(sum(intensities) / len(intensities)) if intensities else None
-
-        # aggregate ai scores if present
-        focus_scores = []
-        stress_scores = []
-        motivation_scores = []
-        for r in recent:
-            ai = r.get("ai") or {}
-            if isinstance(ai, dict):
-                if ai.get("focus_score") is not None:
-                    focus_scores.append(ai.get("focus_score"))
-                if ai.get("stress_score") is not None:
-                    stress_scores.append(ai.get("stress_score"))
-                if ai.get("motivation_score") is not None:
-                    motivation_scores.append(ai.get("motivation_score"))
-
-        emotional_summary = {
-            "dominant_emotion": dominant_emotion,
-            "avg_intensity": avg_intensity,
-            "focus_avg": round(sum(focus_scores)/len(focus_scores)) if focus_scores else None,
-            "stress_avg": round(sum(stress_scores)/len(stress_scores)) if stress_scores else None,
-            "motivation_avg": round(sum(motivation_scores)/len(motivation_scores)) if motivation_scores else None
-        }
-    else:
-        emotional_summary = {
-            "dominant_emotion": None,
-            "avg_intensity": None,
-            "focus_avg": None,
-            "stress_avg": None,
-            "motivation_avg": None
-        }
-
-    # --- Build a deterministic prompt that includes user context ---
-    prompt = f"""
-You are an expert decision advisor that tailors decisions to a student's cognitive profile and emotional state.
-Return STRICT JSON only.
-
-User question: "{question}"
-
-User context:
-- Name: {user_doc.get('name')}
-- Email: {user_doc.get('email')}
-- Learning styles: {learning_styles}
-- Subjects: {subjects}
-- Cognitive profile: {json.dumps(cognitive_profile)}
-- Recent emotion summary: {json.dumps(emotional_summary)}
-
-Respond with a JSON object with the following keys:
-- final_decision: string (direct concise recommendation)
-- rationale: string (concise explanation of reasoning)
-- confidence_score: integer (0-100)
-- bias_detected: string or null (e.g., "Overconfidence", "Loss aversion", null)
-- risk_level: "low"|"medium"|"high"
-- cognitive_alignment: string (how well this decision fits user's cognitive style)
-- emotional_influence: string (how current emotions might bias or affect this decision)
-- short_term_effect: string
-- long_term_effect: string
-- action_steps: array of short actionable steps (strings)
-
-Keep answers concise and practical.
-"""
+    # --- Gather user context (token_required already loaded the user) ---
+    user_id = str(current_user["_id"])
+    summary = decision_ai.emotional_summary(db, user_id, _loader().rollup())
+    key = decision_cache.context_hash(user_id, question, current_user, summary)
 
-    try:
-        completion = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.25,
-            max_tokens=800
-        )
+    cached = decision_cache.lookup(db, user_id, key)
 
-        msg = completion.choices[0].message
-        if isinstance(msg.content, list):
-            response_text = "".join(block.text if hasattr(block, "text") else str(block) for block in msg.content)
-        else:
-            response_text = msg.content
+    # Opt-in SSE variant: ?stream=1 or Accept: text/event-stream
+    if (request.args.get("stream") in ("1", "true")
+            or "text/event-stream" in request.headers.get("Accept", "")):
+        return _stream_decision(user_id, question, current_user, summary, key, cached)
 
-        cleaned = response_text.replace("```json", "").replace("```", "").strip()
+    if cached is not None:
+        return jsonify(cached), 200
 
-        # Try parse JSON safely
-        parsed = {}
-        try:
-            parsed = json.loads(cleaned)
-        except Exception as e:
-            print("Decision JSON parse error:", e)
-            # fallback minimal structure
-            parsed = {
-                "final_decision": cleaned[:1000],
-                "rationale": "",
-                "confidence_score": 50,
-                "bias_detected": None,
-                "risk_level": "medium",
-                "cognitive_alignment": "",
-                "emotional_influence": "",
-                "short_term_effect": "",
-                "long_term_effect": "",
-                "action_steps": []
-            }
-
-        # Normalize fields (ensure keys exist)
-        result = {
-            "final_decision": parsed.get("final_decision", "") or "",
-            "rationale": parsed.get("rationale", "") or "",
-            "confidence_score": int(parsed.get("confidence_score", 50) or 50),
-            "bias_detected": parsed.get("bias_detected", None),
-            "risk_level": parsed.get("risk_level", "medium"),
-            "cognitive_alignment": parsed.get("cognitive_alignment", "") or "",
-            "emotional_influence": parsed.get("emotional_influence", "") or "",
-            "short_term_effect": parsed.get("short_term_effect", "") or "",
-            "long_term_effect": parsed.get("long_term_effect", "") or "",
-            "action_steps": parsed.get("action_steps", []) or []
-        }
-
-        # Save decision record for learning
-        decisions_col = db["decisions"]
-        decisions_col.insert_one({
-            "user_id": str(current_user["_id"]),
-            "question": question,
-            "result": result,
-            "raw_ai": cleaned,
-            "timestamp": datetime.datetime.utcnow()
-        })
+    def generate():
+        prompt = decision_ai.build_prompt(question, current_user, summary)
+        result, cleaned = decision_ai.parse_response(decision_ai.complete(llm, prompt))
+        _save_decision(user_id, question, result, cleaned, key)
+        return result
 
+    try:
+        result, _ = decision_cache.coalesce(key, generate)
         return jsonify(result), 200
 
     except Exception as e:
         print("Decision Engine Error:", e)
+        metrics.fallback("decision", e)
         return jsonify({"error": "AI failed to generate a response"}), 500
 
 
-# ---------------------------
-# GET PAST DECISIONS (for UI)
-# ---------------------------
-@app.route("/api/decisions", methods=["GET"])
-@token_required
-def list_decisions(current_user):
+def _save_decision(user_id, question, result, cleaned, key):
+    """Save decision record for learning and make it the cached answer."""
     decisions_col = db["decisions"]
-    docs = list(decisions_col.find({"user_id": str(current_user["_id"])}).sort("timestamp", -1).limit(50))
-    out = []
-    for d in docs:
-        out.append({
-            "id": str(d.get("_id")),
-            "question": d.get("question"),
-            "result": d.get("result", {}),
-            "timestamp": d.get("timestamp").strftime("%Y-%m-%d %H:%M:%S") if d.get("timestamp") else None
-        })
-    return jsonify(out), 200
+    decisions_col.insert_one({
+        "user_id": user_id,
+        "question": question,
+        "result": result,
+        "raw_ai": cleaned,
+        "context_hash": key,
+        "timestamp": datetime.datetime.utcnow()
+    })
+    _loader().wrote("decisions")
+    decision_cache.store(key, result)
 
 
-# ---------------------------
-# COURSE SYSTEM — with Cognitive Learning Engine
-# ---------------------------
-from statistics import mean
-from collections import Counter
-
-def compute_course_progress(course):
-    weights = {
-        "lessons": 0.40,
-        "modules": 0.25,
-        "labs": 0.15,
-        "assessments": 0.20,
-    }
+def _stream_decision(user_id, question, user_doc, summary, key, cached):
+    """
+    SSE stream of a decision:
+      event: token   {"text": ...}            raw model deltas
+      event: field   {"key": ..., "value": ...} each top-level result key once complete
+      event: done    normalized result (persisted before this is sent)
+      event: error   {"error": ...}
+    """
+    def events():
+        if cached is not None:
+            for field, value in cached.items():
+                yield streaming.sse_event("field", {"key": field, "value": value})
+            yield streaming.sse_event("done", cached)
+            return
+
+        scanner = streaming.JSONFieldScanner()
+        parts = []
+        try:
+            prompt = decision_ai.build_prompt(question, user_doc, summary)
+            for delta in decision_ai.complete_stream(llm, prompt):
+                parts.append(delta)
+                yield streaming.sse_event("token", {"text": delta})
+                for field, value in scanner.feed(delta):
+                    yield streaming.sse_event("field", {"key": field, "value": value})
 
-    counts = {
-        "lessons": len(course.get("lessons", [])),
-        "modules": len(course.get("modules", [])),
-        "labs": len(course.get("labs", [])),
-        "assessments": len(course.get("assessments", [])),
-    }
+            result, cleaned = decision_ai.parse_response("".join(parts))
+            _save_decision(user_id, question, result, cleaned, key)
+            yield streaming.sse_event("done", result)
 
-    present = {k: v for k, v in weights.items() if counts[k] > 0}
-    if not present:
-        return 0
+        except Exception as e:
+            print("Decision Stream Error:", e)
+            metrics.fallback("decision", e)
+            yield streaming.sse_event("error", {"error": "AI failed to generate a response"})
 
-    total_nominal = sum(present.values())
-    adjusted = {k: weights[k] / total_nominal for k in present}
+    response = Response(stream_with_context(events()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
-    def pct(arr):
-        if not arr:
-            return 0
-        done = sum(1 for x in arr if x.get("completed"))
-        return done / len(arr)
 
-    lessons_pct = pct(course.get("lessons", []))
-    modules_pct = pct(course.get("modules", []))
-    labs_pct = pct(course.get("labs", []))
+# ---------------------------
+# GET PAST DECISIONS (for UI)
+# ---------------------------
+DECISION_LIST_PROJECTION = request_loader.DECISION_LIST_PROJECTION
 
-    assessments = course.get("assessments", [])
-    if assessments:
-        total = sum(a.get("score", 0) for a in assessments)
-        max_total = sum(a.get("max_score", 1) for a in assessments)
-        assessments_pct = total / max_total if max_total else 0
-    else:
-        assessments_pct = 0
+def _serialize_decision(d):
+    return {
+        "id": d.get("_id"),
+        "question": d.get("question"),
+        "result": d.get("result", {}),
+        "timestamp": d.get("timestamp")
+    }
 
-    progress = (
-        lessons_pct * adjusted.get("lessons", 0) +
-        modules_pct * adjusted.get("modules", 0) +
-        labs_pct * adjusted.get("labs", 0) +
-        assessments_pct * adjusted.get("assessments", 0)
+@api.route("/api/decisions", methods=["GET"])
+@token_required
+@conditional_get
+def list_decisions(current_user):
+    return _history_response(
+        db["decisions"],
+        {"user_id": str(current_user["_id"])},
+        DECISION_LIST_PROJECTION,
+        _serialize_decision,
+        default_limit=50,
+        max_limit=200,
+        recent=_loader().recent_decisions,
     )
 
-    return round(progress * 100)
 
 # ---------------------------
-# Cognitive learning helpers (per-course)
+# COURSE SYSTEM — with Cognitive Learning Engine
 # ---------------------------
-def compute_learning_load(course):
-    """Estimate Learning Load Index (LLI) from counts and total items."""
-    lessons = len(course.get("lessons", []))
-    modules = len(course.get("modules", []))
-    labs = len(course.get("labs", []))
-    assessments = len(course.get("assessments", []))
-
-    # simple heuristic: more items => higher load
-    nominal = lessons + modules*2 + labs*1.5 + assessments*2.5
-    # normalize to 0..100 (tweak scale if needed)
-    lli = min(100, round(nominal * 5))  # each unit ~5 points
-    return lli
-
-def compute_skill_mastery(course):
-    """Skill Mastery Index from assessment scores and lesson completions."""
-    assessments = course.get("assessments", [])
-    lessons = course.get("lessons", [])
-
-    # assessments: average score% (if present)
-    if assessments:
-        total = sum((a.get("score") or 0) for a in assessments)
-        max_total = sum((a.get("max_score") or 100) for a in assessments)
-        assess_pct = (total / max_total) * 100 if max_total else 0
-    else:
-        assess_pct = 0
-
-    # lessons completion %
-    if lessons:
-        done = sum(1 for l in lessons if l.get("completed"))
-        lessons_pct = (done / len(lessons)) * 100
-    else:
-        lessons_pct = 0
-
-    # weighted mastery
-    smi = round((assess_pct * 0.6) + (lessons_pct * 0.4))
-    return max(0, min(100, smi))
-
-def compute_memory_retention(course):
-    """Memory Retention Score — favors recent completions and assessment recency.
-       If timestamps are not stored, fallback to progress-based approximation."""
-    # If you later add timestamps to lesson completions, use recency decay.
-    progress = course.get("progress_percent", 0)
-    # retention approx: higher progress -> better retained but saturates
-    mrs = round(min(100, progress * 0.9 + 10))
-    return mrs
-
-def compute_fatigue_for_user_course(user_id, course):
-    """Cognitive fatigue: combines learning load and user's recent stress signals for this course."""
-    lli = compute_learning_load(course)
-
-    # fetch user's recent stress from emotions and weigh it
-    emotions_col = db["emotions"]
-    recent = list(emotions_col.find({"user_id": str(user_id)}).sort("timestamp", -1).limit(15))
-    if recent:
-        stress_scores = [ (e.get("ai") or {}).get("stress_score") for e in recent ]
-        stress_scores = [s for s in stress_scores if s is not None]
-        stress_avg = round(mean(stress_scores)) if stress_scores else 50
-    else:
-        stress_avg = 50
-
-    # fatigue heuristic: higher LLI and higher stress => higher fatigue
-    fatigue = round((lli * 0.6) + (stress_avg * 0.4))
-    return max(0, min(100, fatigue))
-
-def course_recommendation(course, lli, fatigue, smi, mrs):
-    """Return simple actionable recommendation for this course."""
-    if fatigue > 75:
-        return "High fatigue — consider short breaks and reduce new study load."
-    if smi < 50 and mrs < 50:
-        return "Revise recent lessons and attempt a short quiz to reinforce memory."
-    if lli > 70 and smi > 75:
-        return "Load is high but mastery is strong — schedule spaced repetition."
-    if smi >= 80:
-        return "Strong mastery — try advanced problems or accelerate modules."
-    return "Keep steady — 30–40 min focused sessions with short breaks."
-
 # ---------------------------
 # CREATE COURSE
 # ---------------------------
-@app.route("/api/courses", methods=["POST"])
+@api.route("/api/courses", methods=["POST"])
 @token_required
 def create_course(current_user):
     data = request.get_json() or {}
@@ -1008,173 +954,399 @@ def create_course(current_user):
     if not title or not code:
         return jsonify({"error": "title and code required"}), 400
 
-    course = {
-        "user_id": str(current_user["_id"]),
-        "title": title,
-        "code": code,
-        "semester": semester or "",
-        "lessons": [],
-        "modules": [],
-        "labs": [],
-        "assessments": [],
-        "created_at": datetime.datetime.utcnow()
-    }
-
-    course["progress_percent"] = compute_course_progress(course)
+    course = course_store.new_course(
+        current_user["_id"], title, code, semester, datetime.datetime.utcnow()
+    )
 
-    result = courses_col.insert_one(course)
-    course["_id"] = str(result.inserted_id)
+    courses_col.insert_one(course)
+    _loader().wrote("courses")
     return jsonify(course), 201
 
 # ---------------------------
-# GET ALL COURSES (with cognitive insights)
+# GET ALL COURSES (summary fields + cognitive insights)
+# ?sort=created_at|progress|fatigue  &order=asc|desc  &limit=  &after=<X-Next-Cursor>
+# full documents (items) only come from GET /api/courses/<cid>
 # ---------------------------
-@app.route("/api/courses", methods=["GET"])
+COURSE_SUMMARY_PROJECTION = {
+    "title": 1, "code": 1, "semester": 1, "created_at": 1,
+    "progress_percent": 1, "learning_load": 1, "counters": 1, "items_layout": 1, "version": 1,
+}
+# fatigue = 0.6 * LLI + 0.4 * the user's stress, so it orders like the stored learning_load
+COURSE_SORTS = {"created_at": "created_at", "progress": "progress_percent", "fatigue": "learning_load"}
+
+@api.route("/api/courses", methods=["GET"])
 @token_required
+@repairs_course_counters
+@conditional_get
 def list_courses(current_user):
     uid = str(current_user["_id"])
+    field = COURSE_SORTS.get(request.args.get("sort", "created_at"))
+    if not field:
+        return jsonify({"error": f"sort must be one of {', '.join(COURSE_SORTS)}"}), 400
+    default_order = "asc" if field == "created_at" else "desc"
+    direction = 1 if request.args.get("order", default_order) == "asc" else -1
+    after = request.args.get("after")
+
+    try:
+        limit = pagination.parse_limit(request.args.get("limit"), 100, 200)
+        docs, next_cursor = pagination.sorted_page(
+            courses_col, {"user_id": uid}, COURSE_SUMMARY_PROJECTION, field, direction, limit, after
+        )
+    except pagination.CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    engine = _loader().course_engine()
     output = []
-    for c in courses_col.find({"user_id": uid}):
-        c["_id"] = str(c["_id"])
-        # ensure progress is up-to-date
-        c["progress_percent"] = compute_course_progress(c)
-
-        # compute cognitive metrics
-        lli = compute_learning_load(c)
-        smi = compute_skill_mastery(c)
-        mrs = compute_memory_retention(c)
-        fatigue = compute_fatigue_for_user_course(uid, c)
-        recommendation = course_recommendation(c, lli, fatigue, smi, mrs)
-
-        c["lli"] = lli
-        c["smi"] = smi
-        c["mrs"] = mrs
-        c["fatigue"] = fatigue
-        c["recommendation"] = recommendation
-
-        output.append(c)
-    return jsonify(output), 200
+    for c in docs:
+        output.append(engine.annotate(c))
+    response = jsonify(output)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor"
+    return response, 200
 
 # ---------------------------
 # GET SINGLE COURSE
+# collection-layout courses return the first `items_limit` items per section
+# plus `items_next` cursors for GET /api/courses/<cid>/items
 # ---------------------------
-@app.route("/api/courses/<cid>", methods=["GET"])
+@api.route("/api/courses/<cid>", methods=["GET"])
 @token_required
+@repairs_course_counters
+@conditional_get
 def get_course(current_user, cid):
     try:
-        course = courses_col.find_one({"_id": ObjectId(cid)})
+        course = _loader().course(cid)
     except:
         return jsonify({"error": "Invalid id"}), 400
 
-    if not course or str(course["user_id"]) != str(current_user["_id"]):
+    if not course:
         return jsonify({"error": "Course not found"}), 404
 
-    course["_id"] = str(course["_id"])
-    course["progress_percent"] = compute_course_progress(course)
+    if course_items.uses_collection(course):
+        course_items.attach_first_pages(db, course, request.args.get("items_limit", type=int))
     # add insights for single view as well
-    lli = compute_learning_load(course)
-    smi = compute_skill_mastery(course)
-    mrs = compute_memory_retention(course)
-    fatigue = compute_fatigue_for_user_course(str(current_user["_id"]), course)
-    course["lli"] = lli
-    course["smi"] = smi
-    course["mrs"] = mrs
-    course["fatigue"] = fatigue
-    course["recommendation"] = course_recommendation(course, lli, fatigue, smi, mrs)
+    _loader().course_engine().annotate(course)
 
     return jsonify(course), 200
 
+# ---------------------------
+# COURSE ITEMS PAGE
+# ?section=lessons|modules|labs|assessments&limit=&after=<items_next cursor>
+# ---------------------------
+@api.route("/api/courses/<cid>/items", methods=["GET"])
+@token_required
+@repairs_course_counters
+@conditional_get
+def get_course_items(current_user, cid):
+    section = request.args.get("section", "")
+    plural = course_store.CONTENT_PLURALS.get(section, section)
+    if plural not in course_items.SECTIONS:
+        return jsonify({"error": "Invalid section"}), 400
+    try:
+        course = _loader().course(cid)
+    except:
+        return jsonify({"error": "Invalid id"}), 400
+    if not course:
+        return jsonify({"error": "Course not found"}), 404
+
+    if not course_items.uses_collection(course):
+        return jsonify({"items": course.get(plural, []), "next_cursor": None}), 200
+    try:
+        items, next_cursor = course_items.page(
+            db, course["_id"], plural, request.args.get("limit", type=int), request.args.get("after")
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    return jsonify({"items": items, "next_cursor": next_cursor}), 200
+
 # ---------------------------
 # DELETE COURSE
 # ---------------------------
-@app.route("/api/courses/<cid>", methods=["DELETE"])
+@api.route("/api/courses/<cid>", methods=["DELETE"])
 @token_required
 def delete_course(current_user, cid):
     try:
-        course = courses_col.find_one({"_id": ObjectId(cid)})
+        course = _loader().course(cid)
     except:
         return jsonify({"error": "Invalid id"}), 400
 
-    if not course or str(course["user_id"]) != str(current_user["_id"]):
+    if not course:
         return jsonify({"error": "Course not found"}), 404
 
-    courses_col.delete_one({"_id": ObjectId(cid)})
+    courses_col.delete_one({"_id": course["_id"]})
+    course_items.delete_for_course(db, cid)
+    _loader().wrote("courses")
     return jsonify({"message": "Deleted"}), 200
 
+def _course_oid(cid):
+    try:
+        return ObjectId(cid)
+    except Exception:
+        return None
+
 # ---------------------------
-# ADD LESSON (updates progress & insights)
+# ADD CONTENT (lessons, modules, labs, assessments — one or many)
+# body: {"title": "..."}, {"items": [{"title", "completed"?, "max_score"?, "score"?}, ...]}
+#       or the items list itself
 # ---------------------------
-@app.route("/api/courses/<cid>/lesson", methods=["PUT"])
+@api.route("/api/courses/<cid>/<section>", methods=["PUT"])
 @token_required
-def add_lesson(current_user, cid):
-    title = request.json.get("title")
-    if not title:
-        return jsonify({"error": "title required"}), 400
-
-    item = {"_id": str(ObjectId()), "title": title, "completed": False}
-    courses_col.update_one({"_id": ObjectId(cid)}, {"$push": {"lessons": item}})
-    course = courses_col.find_one({"_id": ObjectId(cid)})
-    courses_col.update_one({"_id": ObjectId(cid)}, {"$set": {"progress_percent": compute_course_progress(course)}})
-    course["_id"] = str(course["_id"])
-    # update insights could happen here or lazily on next list/get
+def add_course_items(current_user, cid, section):
+    plural = course_store.CONTENT_PLURALS.get(section)
+    if not plural:
+        return jsonify({"error": "Invalid section"}), 400
+    course_oid = _course_oid(cid)
+    if course_oid is None:
+        return jsonify({"error": "Invalid id"}), 400
+
+    data = request.get_json(silent=True)
+    if isinstance(data, list):
+        raw_items = data
+    elif isinstance(data, dict):
+        raw_items = data["items"] if isinstance(data.get("items"), list) else [data]
+    else:
+        return jsonify({"error": "body must be a JSON object or an array of items"}), 400
+    if len(raw_items) > syllabus.MAX_ITEMS:
+        return jsonify({"error": f"too many items (max {syllabus.MAX_ITEMS})"}), 400
+    try:
+        items = [course_store.make_item(plural, raw) for raw in raw_items]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        course = course_store.add_items(courses_col, course_oid, current_user["_id"], {plural: items})
+    except course_store.CourseNotFound:
+        return jsonify({"error": "Course not found"}), 404
+    except course_store.VersionConflict as e:
+        return jsonify({"error": "Course is being modified, retry", "version": e.args[0]}), 409
+    _loader().wrote("courses")
     return jsonify(course), 200
 
+# ---------------------------
+# ASSESSMENT SCORE
+# body: {"score": n, "max_score"?: n}
+# ---------------------------
+@api.route("/api/courses/<cid>/assessment/<aid>", methods=["POST", "PATCH"])
+@token_required
+def update_assessment_score(current_user, cid, aid):
+    course_oid = _course_oid(cid)
+    if course_oid is None:
+        return jsonify({"error": "Invalid id"}), 400
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or "score" not in data:
+        return jsonify({"error": "score required"}), 400
+    try:
+        score = course_store.parse_number(data.get("score"), None)
+        max_score = course_store.parse_number(data.get("max_score"), None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        course = course_store.score_assessment(courses_col, course_oid, current_user["_id"], aid, score, max_score)
+    except course_store.CourseNotFound:
+        return jsonify({"error": "Course not found"}), 404
+    except course_store.ItemNotFound:
+        return jsonify({"error": "Assessment not found"}), 404
+    except course_store.VersionConflict as e:
+        return jsonify({"error": "Course is being modified, retry", "version": e.args[0]}), 409
+    _loader().wrote("courses")
+    return jsonify(course), 200
+
+# ---------------------------
+# SYLLABUS IMPORT (CSV / NDJSON / JSON, see syllabus.py)
+# ---------------------------
+@api.route("/api/courses/<cid>/syllabus", methods=["POST"])
+@token_required
+def import_syllabus(current_user, cid):
+    course_oid = _course_oid(cid)
+    if course_oid is None:
+        return jsonify({"error": "Invalid id"}), 400
+
+    try:
+        sections = syllabus.parse(request.stream, request.content_type)
+    except syllabus.SyllabusError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        course = course_store.add_items(courses_col, course_oid, current_user["_id"], sections)
+    except course_store.CourseNotFound:
+        return jsonify({"error": "Course not found"}), 404
+    except course_store.VersionConflict as e:
+        return jsonify({"error": "Course is being modified, retry", "version": e.args[0]}), 409
+    _loader().wrote("courses")
+    return jsonify({
+        "imported": {plural: len(items) for plural, items in sections.items()},
+        "course": course,
+    }), 201
+
 # ============================================================
 # ✔ UNIVERSAL TOGGLE COMPLETION (Lessons, Modules, Labs)
 # URL: /api/courses/<cid>/<section>/<item_id>/toggle
 # ============================================================
-@app.route("/api/courses/<cid>/<section>/<item_id>/toggle", methods=["POST"])
+@api.route("/api/courses/<cid>/<section>/<item_id>/toggle", methods=["POST"])
 @token_required
 def toggle_course_item(current_user, cid, section, item_id):
-    valid_sections = ["lesson", "module", "lab"]
-    plural_map = {"lesson": "lessons", "module": "modules", "lab": "labs"}
-
-    if section not in valid_sections:
+    if section not in course_store.SECTION_PLURALS:
         return jsonify({"error": "Invalid section"}), 400
 
-    plural = plural_map[section]
+    plural = course_store.SECTION_PLURALS[section]
+
+    # optional optimistic-concurrency guard: {"version": <course.version the client saw>}
+    data = request.get_json(silent=True)
+    expected = data.get("version") if isinstance(data, dict) else None
+    try:
+        expected = int(expected) if expected is not None else None
+        course_oid = ObjectId(cid)
+    except Exception:
+        return jsonify({"error": "Invalid id or version"}), 400
 
-    course = courses_col.find_one({"_id": ObjectId(cid)})
-    if not course or course["user_id"] != str(current_user["_id"]):
+    try:
+        updated_course = course_store.toggle_item(
+            courses_col, course_oid, current_user["_id"], plural, item_id, expected
+        )
+    except course_store.CourseNotFound:
         return jsonify({"error": "Course not found"}), 404
+    except course_store.ItemNotFound:
+        return jsonify({"error": f"{section.capitalize()} not found"}), 404
+    except course_store.VersionConflict as e:
+        return jsonify({"error": "Course was modified", "version": e.args[0]}), 409
 
-    items = course.get(plural, [])
-    updated = False
+    _loader().wrote("courses")
+    return jsonify(updated_course), 200
 
-    for item in items:
-        if item["_id"] == item_id:
-            item["completed"] = not item.get("completed", False)
-            updated = True
-            break
 
-    if not updated:
-        return jsonify({"error": f"{section.capitalize()} not found"}), 404
+# ---------------------------
+# 📊 Cache stats
+# ---------------------------
+@api.route("/api/cache/stats", methods=["GET"])
+@token_required
+def get_cache_stats(current_user):
+    return jsonify({
+        "auth": auth_cache.stats(),
+        "emotion_ai": llm_cache.stats(),
+        "decisions": decision_cache.stats(),
+    }), 200
 
-    # Save updated list
-    courses_col.update_one(
-        {"_id": ObjectId(cid)},
-        {"$set": {plural: items}}
-    )
 
-    # Recalculate progress
-    updated_course = courses_col.find_one({"_id": ObjectId(cid)})
-    updated_course["progress_percent"] = compute_course_progress(updated_course)
-    courses_col.update_one(
-        {"_id": ObjectId(cid)},
-        {"$set": {"progress_percent": updated_course["progress_percent"]}}
-    )
+# ---------------------------
+# 🤖 LLM client stats (latency histograms, breaker state)
+# ---------------------------
+@api.route("/api/llm/stats", methods=["GET"])
+@token_required
+def get_llm_stats(current_user):
+    return jsonify(llm.stats()), 200
 
-    updated_course["_id"] = str(updated_course["_id"])
-    return jsonify(updated_course), 200
+
+# ---------------------------
+# 📦 BATCH — several API calls in one round trip (see batch.py)
+# ---------------------------
+@api.route("/api/batch", methods=["POST"])
+@token_required
+def run_batch(current_user):
+    try:
+        subs, parallel = batch.parse(request.get_json(silent=True))
+    except batch.BatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    responses = batch.run(current_app._get_current_object(), subs, request.headers["Authorization"], parallel)
+    return jsonify({"responses": responses}), 200
+
+
+# ---------------------------
+# 🚦 Readiness (see readiness.py)
+# ---------------------------
+@api.route("/readyz", methods=["GET"])
+def readyz():
+    status = readiness.warmup.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+# ---------------------------
+# 📈 Metrics, Prometheus text format (see metrics.py)
+# ---------------------------
+@api.route("/metrics", methods=["GET"])
+def get_metrics():
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"error": "Access denied"}), 401
+    return Response(metrics.render(metrics.collect()), content_type=metrics.CONTENT_TYPE)
+
+
+# ---------------------------
+# 🔬 Request profiles (see profiling.py); same X-Profile header that enables them
+# ?format=collapsed  folded stacks for flamegraph.pl / speedscope
+# ---------------------------
+@api.route("/api/debug/profiles/<pid>", methods=["GET"])
+def get_profile(pid):
+    if not profiling.authorized(request.headers.get(profiling.HEADER)):
+        return jsonify({"error": "Access denied"}), 401
+    doc = profiling.load(pid)
+    if doc is None:
+        return jsonify({"error": "Profile not found"}), 404
+    if request.args.get("format") == "collapsed":
+        return Response(doc["collapsed"], mimetype="text/plain")
+    return jsonify(doc), 200
 
 
 # ---------------------------
 # 🏠 Root Endpoint
 # ---------------------------
-@app.route("/", methods=["GET"])
+@api.route("/", methods=["GET"])
 def home():
     return jsonify({"message": "NeuroLink backend is running"}), 200
 
 
+# ---------------------------
+# 🏭 App factory
+# ---------------------------
+def create_app():
+    """
+    Build the Flask app. Called once per worker process:
+        gunicorn -c gunicorn.conf.py       (production, see gunicorn.conf.py)
+        flask --app app run                (development)
+    """
+    app = Flask(__name__)
+    # Secret key for JWT
+    app.config["SECRET_KEY"] = os.getenv("JWT_SECRET", "neuro_secret_key")
+    # ObjectId/datetime are encoded natively; handlers return documents as-is
+    app.json = json_provider.FastJSONProvider(app)
+    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+    # before the blueprint, so timing and profiling start ahead of its hooks
+    metrics.init_app(app)
+    profiling.init_app(app)
+    app.register_blueprint(api)
+
+    # Mongo/LLM round trips happen off the boot path; /readyz reports them
+    readiness.warmup.start(_warmup_checks())
+    emotion_ai.sweeper.start(db, llm)
+    print(f"✅ App created in {readiness.warmup.mark_started():.3f}s")
+    return app
+
+
+def _warm_mongo():
+    mongo.client().admin.command("ping")
+    analytics.check_server(mongo.client())
+    indexes.ensure_indexes(db)
+    print("✅ MongoDB indexes ensured")
+
+
+def _warmup_checks():
+    checks = {"mongo": _warm_mongo}
+    if os.getenv("LLM_WARMUP") == "1":
+        checks["llm"] = llm.warm
+    return checks
+
+
+def shutdown(wait=True):
+    """Drain in-flight LLM work and close this process's Mongo client (worker exit)."""
+    emotion_ai.sweeper.stop()
+    emotion_ai.enricher.shutdown(wait=wait)
+    llm.shutdown(wait=wait)
+    mongo.close()
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Werkzeug development server; production runs gunicorn -c gunicorn.conf.py
+    create_app().run(debug=os.getenv("FLASK_DEBUG") == "1")
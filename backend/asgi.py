@@ -0,0 +1,336 @@
+"""
+ASGI entry point: the same API on an event loop.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+The two routes that spend seconds waiting on the model run natively as
+coroutines, on pymongo's AsyncMongoClient and llm_client.AsyncLLMClient
+(groq.AsyncGroq):
+
+    POST /api/emotions            sync and async (202) modes
+    POST /api/decision/analyze    blocking JSON and ?stream=1 SSE
+
+A request parked on the LLM holds no thread, so one process can keep
+thousands of them in flight. Every other route is the Flask app from
+app.py mounted through a2wsgi (a small thread pool, ASGI_WSGI_WORKERS,
+default 16); those requests are short Mongo reads and writes.
+
+Both halves share the auth caches, the LLM circuit breaker, the emotion
+and decision caches, the data-version ETags and the /metrics registry,
+and answer with the same status codes and JSON bodies as app.py. The in-request loader,
+/api/batch and response compression stay on the Flask side.
+"""
+import datetime
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import wraps
+
+import jwt
+from a2wsgi import WSGIMiddleware
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as wsgi
+import auth_cache
+import data_version
+import decision_ai
+import decision_cache
+import emotion_ai
+import emotion_rollup
+import indexes
+import json_provider
+import llm_cache
+import llm_client
+import metrics
+import mongo
+import streaming
+
+WSGI_WORKERS = int(os.getenv("ASGI_WSGI_WORKERS", "16"))
+DRAIN_TIMEOUT = float(os.getenv("ASGI_DRAIN_TIMEOUT", "30"))
+
+# AsyncMongoClient binds to the loop it first runs on, so it is opened by
+# `lifespan` on the serving loop (not at import) and closed there on shutdown
+_mongo = None
+
+
+def _database():
+    if _mongo is None:
+        raise RuntimeError("AsyncMongoClient is not open; serve asgi:app through its lifespan")
+    return _mongo[indexes.DB_NAME]
+
+
+adb = mongo.LazyHandle(_database)
+
+
+def _async_groq_client():
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+
+
+# one breaker for both clients: the Flask half trips it for us and vice versa
+allm = llm_client.AsyncLLMClient(client_factory=_async_groq_client, breaker=wsgi.llm.breaker)
+metrics.watch_llm(allm)
+enricher = emotion_ai.AsyncEnricher(max_pending=emotion_ai.enricher.max_pending)
+flask_app = wsgi.create_app()
+
+
+# ---------------------------
+# responses (same JSON encoding and CORS answer as the Flask app)
+# ---------------------------
+def _cors_headers(request):
+    origin = request.headers.get("origin")
+    if not origin:
+        return {}
+    return {"Access-Control-Allow-Origin": origin, "Access-Control-Allow-Credentials": "true", "Vary": "Origin"}
+
+
+def json_response(request, payload, status=200):
+    return Response(
+        json_provider.dumps_bytes(payload),
+        status_code=status,
+        media_type=json_provider.MIMETYPE,
+        headers=_cors_headers(request),
+    )
+
+
+async def _json_body(request):
+    try:
+        return await request.json() or {}
+    except ValueError:
+        return {}
+
+
+# ---------------------------
+# 🔐 JWT Middleware (coroutine version of app.token_required)
+# ---------------------------
+def token_required(handler):
+    @wraps(handler)
+    async def decorated(request):
+        token = None
+        auth_header = request.headers.get("authorization", "")
+        if auth_header.startswith("Bearer "):
+            token = auth_header.split(" ")[1]
+
+        if not token:
+            return json_response(request, {"error": "Access denied. Token missing!"}, 401)
+
+        try:
+            decoded = auth_cache.get_claims(token)
+            if decoded is None:
+                decoded = jwt.decode(token, flask_app.config["SECRET_KEY"], algorithms=["HS256"])
+                auth_cache.put_claims(token, decoded)
+
+            current_user, _ = auth_cache.get_user(decoded["user_id"])
+            if current_user is None:
+                current_user = await adb["users"].find_one({"_id": ObjectId(decoded["user_id"])})
+                if not current_user:
+                    return json_response(request, {"error": "User not found"}, 404)
+                auth_cache.refresh_user(current_user)
+        except jwt.ExpiredSignatureError:
+            return json_response(request, {"error": "Session expired, please login again"}, 401)
+        except jwt.InvalidTokenError:
+            return json_response(request, {"error": "Invalid token"}, 401)
+
+        return await handler(request, current_user)
+    return decorated
+
+
+# ============================================
+# ❤️ EMOTION TRACKER (see app.add_emotion)
+# ============================================
+@token_required
+async def add_emotion(request, current_user):
+    data = await _json_body(request)
+    emotion = data.get("emotion")
+    intensity = data.get("intensity", 50)
+
+    if not emotion:
+        return json_response(request, {"error": "Emotion is required"}, 400)
+
+    user_id = str(current_user["_id"])
+    emotion_doc = {
+        "user_id": user_id,
+        "emotion": emotion,
+        "intensity": intensity,
+        "timestamp": datetime.datetime.utcnow(),
+    }
+
+    async_mode = (
+        wsgi.EMOTION_AI_MODE == "async"
+        or request.query_params.get("async") in ("1", "true")
+        or data.get("async") is True
+    )
+    cached = await llm_cache.lookup_async(adb, emotion, intensity) if async_mode else None
+    if async_mode and cached is None:
+        emotion_doc.update({
+            "ai": {},
+            "ai_status": "pending",
+            "ai_requested_at": emotion_doc["timestamp"],
+        })
+        await adb["emotions"].insert_one(emotion_doc)
+        await emotion_rollup.record_emotion_async(adb, user_id, emotion_doc)
+        await data_version.bump_async(adb, user_id)
+
+        if enricher.submit(adb, allm, emotion_doc):
+            return json_response(request, {
+                "message": "Emotion recorded, AI interpretation pending",
+                "id": emotion_doc["_id"],
+                "ai_status": "pending",
+                "ai": None,
+                "status_url": f"/api/emotions/{emotion_doc['_id']}/ai"
+            }, 202)
+
+        ai_data, ai_status = await emotion_ai.interpret_async(adb, allm, emotion, intensity, lookup=False)
+        await emotion_ai.apply_interpretation_async(adb, emotion_doc, ai_data, ai_status)
+        return json_response(request, {
+            "message": "Emotion recorded successfully",
+            "id": emotion_doc["_id"],
+            "ai_status": ai_status,
+            "ai": ai_data
+        }, 201)
+
+    if cached is not None:
+        ai_data, ai_status = cached, "done"
+    else:
+        ai_data, ai_status = await emotion_ai.interpret_async(adb, allm, emotion, intensity)
+    emotion_doc.update({"ai": ai_data, "ai_status": ai_status})
+    await adb["emotions"].insert_one(emotion_doc)
+    await emotion_rollup.record_emotion_async(adb, user_id, emotion_doc)
+    await data_version.bump_async(adb, user_id)
+
+    return json_response(request, {
+        "message": "Emotion recorded successfully",
+        "id": emotion_doc["_id"],
+        "ai_status": ai_status,
+        "ai": ai_data
+    }, 201)
+
+
+# ---------------------------
+# 🎯 DECISION LAB (see app.analyze_decision)
+# ---------------------------
+@token_required
+async def analyze_decision(request, current_user):
+    data = await _json_body(request)
+    question = (data.get("question") or "").strip()
+
+    if not question:
+        return json_response(request, {"error": "Question is required"}, 400)
+
+    user_id = str(current_user["_id"])
+    rollup = await emotion_rollup.get_rollup_async(adb, user_id)
+    summary = decision_ai.emotional_summary(adb, user_id, rollup)
+    key = decision_cache.context_hash(user_id, question, current_user, summary)
+
+    cached = await decision_cache.lookup_async(adb, user_id, key)
+
+    if (request.query_params.get("stream") in ("1", "true")
+            or "text/event-stream" in request.headers.get("accept", "")):
+        return _stream_decision(request, user_id, question, current_user, summary, key, cached)
+
+    if cached is not None:
+        return json_response(request, cached)
+
+    async def generate():
+        prompt = decision_ai.build_prompt(question, current_user, summary)
+        result, cleaned = decision_ai.parse_response(await decision_ai.complete_async(allm, prompt))
+        await _save_decision(user_id, question, result, cleaned, key)
+        return result
+
+    try:
+        result, _ = await decision_cache.coalesce_async(key, generate)
+        return json_response(request, result)
+
+    except Exception as e:
+        print("Decision Engine Error:", e)
+        metrics.fallback("decision", e)
+        return json_response(request, {"error": "AI failed to generate a response"}, 500)
+
+
+async def _save_decision(user_id, question, result, cleaned, key):
+    await adb["decisions"].insert_one({
+        "user_id": user_id,
+        "question": question,
+        "result": result,
+        "raw_ai": cleaned,
+        "context_hash": key,
+        "timestamp": datetime.datetime.utcnow()
+    })
+    await data_version.bump_async(adb, user_id)
+    decision_cache.store(key, result)
+
+
+def _stream_decision(request, user_id, question, user_doc, summary, key, cached):
+    """Same SSE events as app._stream_decision."""
+    async def events():
+        if cached is not None:
+            for field, value in cached.items():
+                yield streaming.sse_event("field", {"key": field, "value": value})
+            yield streaming.sse_event("done", cached)
+            return
+
+        scanner = streaming.JSONFieldScanner()
+        parts = []
+        try:
+            prompt = decision_ai.build_prompt(question, user_doc, summary)
+            async for delta in decision_ai.complete_stream_async(allm, prompt):
+                parts.append(delta)
+                yield streaming.sse_event("token", {"text": delta})
+                for field, value in scanner.feed(delta):
+                    yield streaming.sse_event("field", {"key": field, "value": value})
+
+            result, cleaned = decision_ai.parse_response("".join(parts))
+            await _save_decision(user_id, question, result, cleaned, key)
+            yield streaming.sse_event("done", result)
+
+        except Exception as e:
+            print("Decision Stream Error:", e)
+            metrics.fallback("decision", e)
+            yield streaming.sse_event("error", {"error": "AI failed to generate a response"})
+
+    headers = dict(_cors_headers(request), **{"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+# ---------------------------
+# app
+# ---------------------------
+def timed(route, handler):
+    """Same http_* metrics as metrics.init_app records for the Flask routes."""
+    async def endpoint(request):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.observe_request(route, request.method, status, time.perf_counter() - started)
+    return endpoint
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global _mongo
+    _mongo = AsyncMongoClient(os.getenv("MONGO_URI"), event_listeners=metrics.mongo_listeners())
+    yield
+    # let background interpretations land before the loop goes away
+    await enricher.drain(DRAIN_TIMEOUT)
+    await _mongo.close()
+    _mongo = None
+    wsgi.shutdown()
+
+
+app = Starlette(
+    routes=[
+        # POST only: other methods on these paths (GET history, OPTIONS) fall through to Flask
+        Route("/api/emotions", timed("/api/emotions", add_emotion), methods=["POST"]),
+        Route("/api/decision/analyze", timed("/api/decision/analyze", analyze_decision), methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(flask_app, workers=WSGI_WORKERS)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,64 @@
+"""
+In-process caches for the auth path of `token_required`.
+
+- token cache: raw JWT -> decoded claims, so repeat requests skip jwt.decode.
+  Entries never outlive the token's own `exp`.
+- user cache: user id -> user document, so protected routes skip the
+  users.find_one round trip.
+
+Both are bounded LRU maps with a TTL. Handlers that write the user
+document call `refresh_user` / `invalidate_user` so this process never
+serves a stale profile. Each cached user remembers the data version
+(data_version.py) it was read at, when known; `@conditional_get` routes
+re-read the user when the version has moved, so a write made by another
+worker process never shows up as an old body under a new ETag. Other
+routes converge within the TTL (AUTH_CACHE_TTL, default 60s).
+"""
+import os
+import time
+
+from ttl_cache import LRUTTLCache
+
+_size = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+_ttl = float(os.getenv("AUTH_CACHE_TTL", "60"))
+
+tokens = LRUTTLCache(_size, _ttl)
+users = LRUTTLCache(_size, _ttl)
+
+
+def get_claims(token):
+    """Cached decoded claims, or None. Expired tokens are never returned."""
+    claims = tokens.get(token)
+    if claims is not None and claims.get("exp") is not None and claims["exp"] <= time.time():
+        tokens.delete(token)
+        return None
+    return claims
+
+
+def put_claims(token, claims):
+    ttl = None
+    if claims.get("exp") is not None:
+        ttl = claims["exp"] - time.time()
+    tokens.set(token, claims, ttl)
+
+
+def get_user(user_id):
+    """(user document, data version it was read at or None), or (None, None)."""
+    entry = users.get(str(user_id))
+    if entry is None:
+        return None, None
+    doc, version = entry
+    return dict(doc), version
+
+
+def refresh_user(doc, version=None):
+    """Write-through after a users write: cache the fresh document."""
+    users.set(str(doc["_id"]), (dict(doc), version))
+
+
+def invalidate_user(user_id):
+    users.delete(str(user_id))
+
+
+def stats():
+    return {"tokens": tokens.stats(), "users": users.stats()}
@@ -0,0 +1,134 @@
+"""
+/api/batch: several API calls in one HTTP round trip.
+
+    POST /api/batch
+    {"requests": [{"method": "GET", "path": "/api/user/profile"},
+                  {"method": "GET", "path": "/api/emotions/summary"},
+                  {"method": "POST", "path": "/api/emotions", "body": {...}}],
+     "parallel": true}
+
+    -> {"responses": [{"status": 200, "body": {...}, "etag": "..."}, ...]}
+
+Each sub-request is dispatched through the app's own routes
+(app.full_dispatch_request), so it gets exactly the status and body the
+standalone call would. The caller's Authorization header is used for
+every sub-request and the token is verified once: sub-requests share
+the batch's app context, so token_required finds the user already on
+the RequestLoader, and they share its memoized reads (the profile,
+summary and dashboard calls load the rollup once between them).
+
+Sub-requests run in order. With "parallel": true, each run of
+consecutive GETs is executed concurrently; a non-GET waits for
+everything before it and blocks everything after it, so reads never
+race a write in the same batch. Optional per-sub-request "headers"
+(e.g. If-None-Match) are passed through, except Authorization and
+Accept-Encoding.
+Streamed JSON (?stream=1) is buffered into the batch payload; NDJSON
+and Server-Sent Events cannot be batched and come back as 400.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import g
+
+MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+PATH = "/api/batch"
+# set by the batch itself: one token, and the outer response is what gets compressed
+HOP_HEADERS = ("authorization", "accept-encoding")
+STREAMING = ("text/event-stream", "application/x-ndjson")
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse(payload):
+    """Validate the batch body; returns (sub-requests, parallel)."""
+    if not isinstance(payload, dict) or not isinstance(payload.get("requests"), list):
+        raise BatchError("Body must be {\"requests\": [...]}")
+    subs = payload["requests"]
+    if not subs:
+        raise BatchError("No requests given")
+    if len(subs) > MAX_REQUESTS:
+        raise BatchError(f"At most {MAX_REQUESTS} requests per batch")
+
+    parsed = []
+    for i, sub in enumerate(subs):
+        if not isinstance(sub, dict):
+            raise BatchError(f"requests[{i}] must be an object")
+        method = str(sub.get("method", "GET")).upper()
+        path = sub.get("path")
+        if method not in METHODS:
+            raise BatchError(f"requests[{i}]: unsupported method {method}")
+        if not isinstance(path, str) or not path.startswith("/api/"):
+            raise BatchError(f"requests[{i}]: path must start with /api/")
+        if path.split("?", 1)[0].rstrip("/") == PATH:
+            raise BatchError(f"requests[{i}]: batches cannot be nested")
+        headers = sub.get("headers") or {}
+        if not isinstance(headers, dict):
+            raise BatchError(f"requests[{i}]: headers must be an object")
+        headers = {k: str(v) for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+        parsed.append({"method": method, "path": path, "body": sub.get("body"), "headers": headers})
+    return parsed, bool(payload.get("parallel"))
+
+
+def _result(response):
+    if response.mimetype in STREAMING:
+        response.close()
+        return {"status": 400, "body": {"error": "Streaming responses cannot be batched"}}
+    result = {"status": response.status_code}
+    if response.status_code != 304:
+        result["body"] = response.get_json(silent=True)
+        if result["body"] is None:
+            result["body"] = response.get_data(as_text=True)
+    tag, _ = response.get_etag()
+    if tag:
+        result["etag"] = tag
+    return result
+
+
+def _dispatch(app, sub, authorization):
+    headers = dict(sub["headers"], Authorization=authorization)
+    kwargs = {"json": sub["body"]} if sub["body"] is not None else {}
+    try:
+        with app.test_request_context(sub["path"], method=sub["method"], headers=headers, **kwargs):
+            return _result(app.full_dispatch_request())
+    except Exception as e:
+        print(f"❌ Batch sub-request {sub['method']} {sub['path']} failed: {e}")
+        return {"status": 500, "body": {"error": "Internal error"}}
+
+
+def _dispatch_in_thread(app, sub, authorization, shared):
+    # a fresh app context per thread, carrying the batch's loader and token
+    with app.app_context():
+        for key, value in shared.items():
+            setattr(g, key, value)
+        return _dispatch(app, sub, authorization)
+
+
+def _groups(subs, parallel):
+    """Split into runs that may execute together (consecutive GETs)."""
+    groups = []
+    for i, sub in enumerate(subs):
+        if parallel and sub["method"] == "GET" and groups and groups[-1][1]:
+            groups[-1][0].append(i)
+        else:
+            groups.append(([i], sub["method"] == "GET"))
+    return [idx for idx, _ in groups]
+
+
+def run(app, subs, authorization, parallel=False):
+    """Dispatch `subs` inside the current (authenticated) app context."""
+    results = [None] * len(subs)
+    shared = {k: g.get(k) for k in ("loader", "auth_token")}
+    for idx in _groups(subs, parallel):
+        if len(idx) == 1:
+            results[idx[0]] = _dispatch(app, subs[idx[0]], authorization)
+            continue
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(idx))) as pool:
+            futures = {i: pool.submit(_dispatch_in_thread, app, subs[i], authorization, shared) for i in idx}
+            for i, future in futures.items():
+                results[i] = future.result()
+    return results
@@ -0,0 +1,130 @@
+"""
+Benchmark: /api/courses insight computation vs. number of courses.
+
+Compares the old per-course pattern (one emotion read per course) with
+CourseInsightsEngine (one read per request). Runs against an in-memory
+collection that charges a fixed round-trip time per call, so it needs no
+MongoDB and the numbers isolate round-trip count from server variance.
+
+    python benchmarks/bench_course_insights.py --rtt-ms 2 --courses 1 4 12 32
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import emotion_rollup  # noqa: E402
+from course_insights import (  # noqa: E402
+    CourseInsightsEngine,
+    compute_course_progress,
+    compute_fatigue,
+    compute_learning_load,
+    compute_memory_retention,
+    compute_skill_mastery,
+    course_recommendation,
+)
+
+
+class _Collection:
+    def __init__(self, db, docs):
+        self.db = db
+        self.docs = docs
+
+    def _rtt(self):
+        self.db.round_trips += 1
+        time.sleep(self.db.rtt)
+
+    def find_one(self, query):
+        self._rtt()
+        for d in self.docs:
+            if all(d.get(k) == v for k, v in query.items()):
+                return d
+        return None
+
+
+class LatencyDB:
+    """Just enough of a pymongo Database for the rollup read path."""
+
+    def __init__(self, rtt_ms):
+        self.rtt = rtt_ms / 1000.0
+        self.round_trips = 0
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, _Collection(self, []))
+
+
+def make_course(i):
+    def items(n):
+        return [{"_id": str(j), "title": f"item {j}", "completed": random.random() < 0.5} for j in range(n)]
+
+    return {
+        "_id": str(i),
+        "user_id": "u1",
+        "title": f"Course {i}",
+        "lessons": items(random.randint(3, 15)),
+        "modules": items(random.randint(0, 6)),
+        "labs": items(random.randint(0, 4)),
+        "assessments": [{"score": random.randint(0, 100), "max_score": 100} for _ in range(random.randint(0, 3))],
+    }
+
+
+def legacy_annotate(db, courses):
+    for c in courses:
+        c["progress_percent"] = compute_course_progress(c)
+        lli = compute_learning_load(c)
+        smi = compute_skill_mastery(c)
+        mrs = compute_memory_retention(c)
+        stats = emotion_rollup.window_stats(emotion_rollup.get_rollup(db, "u1"), 15)
+        stress = round(stats["stress_avg"]) if stats["stress_avg"] is not None else 50
+        fatigue = compute_fatigue(c, stress)
+        c["recommendation"] = course_recommendation(c, lli, fatigue, smi, mrs)
+
+
+def engine_annotate(db, courses):
+    CourseInsightsEngine(db, "u1").annotate_all(courses)
+
+
+def run(fn, db, courses, repeat):
+    samples = []
+    trips = 0
+    for _ in range(repeat):
+        db.round_trips = 0
+        start = time.perf_counter()
+        fn(db, [dict(c) for c in courses])
+        samples.append((time.perf_counter() - start) * 1000)
+        trips = db.round_trips
+    samples.sort()
+    return samples[len(samples) // 2], trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="simulated Mongo round-trip time")
+    parser.add_argument("--courses", type=int, nargs="+", default=[1, 4, 12, 32, 64])
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    random.seed(7)
+    db = LatencyDB(args.rtt_ms)
+    ring = [
+        {"emotion": random.choice(["Happy", "Stressed", "Calm"]), "intensity": random.randint(0, 100),
+         "focus": 60, "stress": random.randint(0, 100), "motivation": 55, "timestamp": None}
+        for _ in range(emotion_rollup.RING_SIZE)
+    ]
+    db["emotion_rollups"].docs.append(emotion_rollup.build_rollup("u1", ring))
+
+    print(f"rtt={args.rtt_ms}ms  (median of {args.repeat} runs)")
+    print(f"{'courses':>8} {'legacy ms':>10} {'trips':>6} {'engine ms':>10} {'trips':>6}")
+    for n in args.courses:
+        courses = [make_course(i) for i in range(n)]
+        legacy_ms, legacy_trips = run(legacy_annotate, db, courses, args.repeat)
+        engine_ms, engine_trips = run(engine_annotate, db, courses, args.repeat)
+        print(f"{n:>8} {legacy_ms:>10.2f} {legacy_trips:>6} {engine_ms:>10.2f} {engine_trips:>6}")
+
+
+if __name__ == "__main__":
+    main()
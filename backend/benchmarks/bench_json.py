@@ -0,0 +1,113 @@
+"""
+Benchmark: serializing a GET /api/emotions payload.
+
+Compares the old path (per-document str(_id)/strftime conversion, then
+Flask's stdlib-json provider) with FastJSONProvider encoding the raw
+documents directly. Serialization only, no HTTP or MongoDB.
+
+    python benchmarks/bench_json.py --emotions 10000 --repeat 20
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import json_provider  # noqa: E402
+
+LABELS = ["Joy", "Calm", "Focused", "Love", "Sad", "Neutral", "Stressed", "Anxious", "Tired"]
+
+
+def make_emotions(n):
+    now = datetime.datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "emotion": random.choice(LABELS),
+            "intensity": random.randint(0, 100),
+            "timestamp": now - datetime.timedelta(minutes=i),
+            "ai": {
+                "focus_score": random.randint(0, 100),
+                "stress_score": random.randint(0, 100),
+                "motivation_score": random.randint(0, 100),
+                "cognitive_state": "Moderately focused",
+                "interpretation": "You seem engaged but slightly tense.",
+                "recommendation": "Take a 5 minute break before the next task.",
+            },
+            "ai_status": "done",
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_serialize(e):
+    return {
+        "_id": str(e["_id"]),
+        "emotion": e.get("emotion"),
+        "intensity": e.get("intensity"),
+        "timestamp": e["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
+        "ai": e.get("ai") or {},
+        "ai_status": e.get("ai_status", "done"),
+    }
+
+
+def native_serialize(e):
+    return {
+        "_id": e["_id"],
+        "emotion": e.get("emotion"),
+        "intensity": e.get("intensity"),
+        "timestamp": e["timestamp"],
+        "ai": e.get("ai") or {},
+        "ai_status": e.get("ai_status", "done"),
+    }
+
+
+def run(fn, repeat):
+    samples = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(fn())
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emotions", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(7)
+    docs = make_emotions(args.emotions)
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    fast = json_provider.FastJSONProvider(app)
+
+    cases = [
+        ("stdlib + per-doc conversion", lambda: stdlib.response([legacy_serialize(e) for e in docs]).get_data()),
+        ("fast + per-doc conversion", lambda: fast.response([legacy_serialize(e) for e in docs]).get_data()),
+        ("fast, native types", lambda: fast.response([native_serialize(e) for e in docs]).get_data()),
+    ]
+
+    backend = "orjson" if json_provider.orjson is not None else "stdlib json (orjson not installed)"
+    print(f"{args.emotions} emotions, median of {args.repeat} runs, fast provider backend: {backend}")
+    print(f"{'case':<30} {'ms':>9} {'bytes':>10}")
+    baseline = None
+    for name, fn in cases:
+        with app.app_context():
+            ms, size = run(fn, args.repeat)
+        baseline = baseline or ms
+        print(f"{name:<30} {ms:>9.2f} {size:>10}  ({baseline / ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
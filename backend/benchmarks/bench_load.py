@@ -0,0 +1,517 @@
+"""
+Load benchmark: latency and throughput of every API route.
+
+Starts a fake Groq server (fake_groq.py) in this process and the app in
+a child process, seeds it through the public API with users, emotions,
+decisions and courses, then drives each route in turn with a fixed
+number of concurrent keep-alive clients. Reports p50/p95/p99 latency,
+throughput and error counts per endpoint.
+
+MongoDB, by default, is an in-process stand-in (mongomock, a benchmark-only
+dependency: `pip install mongomock`) inside the app process, so a run
+needs no network or services. The stand-in measures the app's own cost,
+not MongoDB's, and it lacks a few server features. Routes that use them
+(pipeline $lookup, arrayFilters) show up as errors. Use --mongo-uri with
+a local mongod for real numbers; only documents of the benchmark's own
+@bench.local users are written or deleted there.
+
+    python benchmarks/bench_load.py                                   # laptop, offline
+    python benchmarks/bench_load.py --mongo-uri mongodb://127.0.0.1:27017 --server gunicorn
+    python benchmarks/bench_load.py --json baseline.json              # save a baseline
+    python benchmarks/bench_load.py --baseline baseline.json          # exit 1 on regression
+    python benchmarks/bench_load.py --url http://127.0.0.1:5000 --mongo-uri ...   # running server
+
+An endpoint regresses when a latency percentile grows by more than
+--tolerance (and by at least --floor-ms), when its throughput drops by
+more than --tolerance, or when its error rate rises by more than one
+point. With --url the server must use the same database and the fake
+Groq server, whose URL is printed (see also --groq-port).
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import fake_groq
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+EMAIL_DOMAIN = "bench.local"
+LABELS = ["Joy", "Calm", "Focused", "Love", "Sad", "Neutral", "Stressed", "Anxious", "Tired"]
+
+CHILD = """
+import sys
+sys.path.insert(0, {backend!r})
+if {memory!r}:
+    import mongomock, pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+import app
+from werkzeug.serving import make_server
+make_server("127.0.0.1", {port!r}, app.create_app(), threaded=True).serve_forever()
+"""
+
+
+# ---------------------------
+# HTTP client (one keep-alive connection per worker thread)
+# ---------------------------
+class Client:
+    def __init__(self, base_url, accept_encoding="identity"):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.accept_encoding = accept_encoding
+        self.conn = None
+
+    def request(self, method, path, token=None, body=None):
+        """Returns (status, body bytes); the whole body is read, streamed or not."""
+        headers = {"Accept-Encoding": self.accept_encoding}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        data = None
+        if isinstance(body, tuple):
+            data, headers["Content-Type"] = body
+        elif body is not None:
+            data, headers["Content-Type"] = json.dumps(body).encode(), "application/json"
+
+        for attempt in range(2):
+            reused = self.conn is not None
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+            try:
+                self.conn.request(method, path, body=data, headers=headers)
+                response = self.conn.getresponse()
+                payload = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt or not reused:  # only a stale keep-alive connection is retried
+                    raise
+                continue
+            if response.will_close:
+                self.close()
+            return response.status, payload
+
+    def json(self, method, path, token=None, body=None):
+        status, payload = self.request(method, path, token, body)
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} -> {status}: {payload[:200]!r}")
+        return json.loads(payload) if payload else None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# ---------------------------
+# seed data (through the API, like real clients)
+# ---------------------------
+class User:
+    def __init__(self, email, token):
+        self.email = email
+        self.token = token
+        self.emotion_ids = []
+        self.course_ids = []
+        self.items = {}       # plural -> item ids of course_ids[0]
+        self.created = []     # courses made by "POST /api/courses", removed by the DELETE phase
+        self._seq = itertools.count()
+
+    def seq(self):
+        return next(self._seq)
+
+
+def _parallel(fn, jobs, concurrency):
+    jobs = list(jobs)
+    errors = []
+
+    def worker():
+        while jobs:
+            try:
+                job = jobs.pop()
+            except IndexError:
+                return
+            try:
+                fn(*job)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+
+
+def seed(base_url, args):
+    client = Client(base_url)
+    users = []
+    for i in range(args.users):
+        email = f"user{i}@{EMAIL_DOMAIN}"
+        client.request("POST", "/api/auth/register", body={
+            "name": f"Bench User {i}", "email": email, "password": "bench-password"})
+        token = client.json("POST", "/api/auth/login", body={"email": email, "password": "bench-password"})["token"]
+        client.json("PUT", "/api/user/profile", token, {
+            "department": "CSE", "year": 2, "learning_styles": ["visual", "reflective"],
+            "subjects": ["Algorithms", "Databases"]})
+        users.append(User(email, token))
+
+    local = threading.local()
+
+    def api(method, path, user, body=None):
+        if not hasattr(local, "client"):
+            local.client = Client(base_url)
+        return local.client.json(method, path, user.token, body)
+
+    def add_emotion(user, n):
+        doc = api("POST", "/api/emotions", user, {"emotion": LABELS[n % len(LABELS)], "intensity": (n * 37) % 101})
+        user.emotion_ids.append(doc["id"])
+
+    def add_decision(user, n):
+        api("POST", "/api/decision/analyze", user, {"question": f"Seed question {n}: should I take the elective?"})
+
+    def add_course(user, n):
+        course = api("POST", "/api/courses", user, {"title": f"Course {n}", "code": f"CS{100 + n}", "semester": "5"})
+        cid = course["_id"]
+        user.course_ids.append(cid)
+        for section, count in (("lesson", args.lessons), ("module", args.lessons // 2),
+                               ("lab", args.lessons // 3), ("assessment", 3)):
+            items = [{"title": f"{section} {j}", "completed": j % 3 == 0} for j in range(count)]
+            if section == "assessment":
+                items = [{"title": f"Quiz {j}", "max_score": 20, "score": 10 + j} for j in range(count)]
+            api("PUT", f"/api/courses/{cid}/{section}", user, {"items": items})
+
+    _parallel(add_emotion, [(u, n) for u in users for n in range(args.emotions)], args.concurrency)
+    _parallel(add_decision, [(u, n) for u in users for n in range(args.decisions)], args.concurrency)
+    _parallel(add_course, [(u, n) for u in users for n in range(args.courses)], args.concurrency)
+
+    for user in users:
+        if user.course_ids:
+            course = client.json("GET", f"/api/courses/{user.course_ids[0]}", user.token)
+            for plural in ("lessons", "modules", "labs", "assessments"):
+                user.items[plural] = [item["_id"] for item in course.get(plural, [])]
+    client.close()
+    return users
+
+
+def cleanup(mongo_uri):
+    """Remove the benchmark's own users (@bench.local) and everything they own."""
+    from pymongo import MongoClient
+    sys.path.insert(0, BACKEND)
+    import indexes
+
+    db = MongoClient(mongo_uri)[indexes.DB_NAME]
+    ids = [u["_id"] for u in db["users"].find({"email": {"$regex": re.escape("@" + EMAIL_DOMAIN) + "$"}}, {"_id": 1})]
+    owned = [str(i) for i in ids]
+    for name in ("emotions", "decisions", "course_items"):
+        db[name].delete_many({"user_id": {"$in": owned}})
+    for name in ("emotion_rollups", "data_versions"):
+        db[name].delete_many({"_id": {"$in": owned}})
+    db["courses"].delete_many({"user_id": {"$in": ids}})
+    db["users"].delete_many({"_id": {"$in": ids}})
+
+
+# ---------------------------
+# endpoints: name -> (method, path(user), body(user))
+# reads run first, so they see the seeded data; then writes; DELETE last
+# ---------------------------
+def _first(user, plural):
+    return user.items.get(plural, [None])[0] or "000000000000000000000000"
+
+
+def _course(user):
+    return user.course_ids[0] if user.course_ids else "000000000000000000000000"
+
+
+def _batch(user):
+    return {"parallel": True, "requests": [
+        {"method": "GET", "path": "/api/dashboard"},
+        {"method": "GET", "path": "/api/emotions/insights"},
+        {"method": "GET", "path": "/api/courses"},
+    ]}
+
+
+def _syllabus(user):
+    n = user.seq()
+    rows = "".join(f"lesson,Imported {n}.{j},false,,\n" for j in range(10))
+    return ("section,title,completed,max_score,score\n" + rows).encode(), "text/csv"
+
+
+ENDPOINTS = {
+    "GET /": ("GET", lambda u: "/", None),
+    "GET /readyz": ("GET", lambda u: "/readyz", None),
+    "GET /metrics": ("GET", lambda u: "/metrics", None),
+    "GET /api/user/profile": ("GET", lambda u: "/api/user/profile", None),
+    "GET /api/dashboard": ("GET", lambda u: "/api/dashboard", None),
+    "GET /api/emotions": ("GET", lambda u: "/api/emotions", None),
+    "GET /api/emotions/summary": ("GET", lambda u: "/api/emotions/summary", None),
+    "GET /api/emotions/insights": ("GET", lambda u: "/api/emotions/insights", None),
+    "GET /api/emotions/<eid>/ai": ("GET", lambda u: f"/api/emotions/{u.emotion_ids[0]}/ai", None),
+    "GET /api/decisions": ("GET", lambda u: "/api/decisions", None),
+    "GET /api/courses": ("GET", lambda u: "/api/courses", None),
+    "GET /api/courses/<cid>": ("GET", lambda u: f"/api/courses/{_course(u)}", None),
+    "GET /api/courses/<cid>/items": ("GET", lambda u: f"/api/courses/{_course(u)}/items?section=lessons", None),
+    "GET /api/cache/stats": ("GET", lambda u: "/api/cache/stats", None),
+    "GET /api/llm/stats": ("GET", lambda u: "/api/llm/stats", None),
+    "POST /api/batch": ("POST", lambda u: "/api/batch", _batch),
+    "POST /api/cognitive/profile/analyze": ("POST", lambda u: "/api/cognitive/profile/analyze", None),
+    "POST /api/auth/login": ("POST", lambda u: "/api/auth/login",
+                             lambda u: {"email": u.email, "password": "bench-password"}),
+    "POST /api/auth/register": ("POST", lambda u: "/api/auth/register", lambda u: {
+        "name": "New User", "email": f"new-{uuid.uuid4().hex}@{EMAIL_DOMAIN}", "password": "bench-password"}),
+    "PUT /api/user/profile": ("PUT", lambda u: "/api/user/profile",
+                              lambda u: {"college": f"Campus {u.seq() % 5}", "subjects": ["Algorithms", "Networks"]}),
+    "POST /api/emotions": ("POST", lambda u: "/api/emotions",
+                           lambda u: {"emotion": LABELS[u.seq() % len(LABELS)], "intensity": (u.seq() * 13) % 101}),
+    "POST /api/decision/analyze": ("POST", lambda u: "/api/decision/analyze",
+                                   lambda u: {"question": f"Question {uuid.uuid4().hex[:8]}: switch my elective?"}),
+    "POST /api/decision/analyze?stream=1": ("POST", lambda u: "/api/decision/analyze?stream=1",
+                                            lambda u: {"question": f"Question {uuid.uuid4().hex[:8]}: drop a lab?"}),
+    "POST /api/courses": ("POST", lambda u: "/api/courses",
+                          lambda u: {"title": f"Extra {u.seq()}", "code": "CS999", "semester": "6"}),
+    "PUT /api/courses/<cid>/<section>": ("PUT", lambda u: f"/api/courses/{_course(u)}/lesson",
+                                         lambda u: {"title": f"Added lesson {u.seq()}"}),
+    "POST /api/courses/<cid>/assessment/<aid>": (
+        "POST", lambda u: f"/api/courses/{_course(u)}/assessment/{_first(u, 'assessments')}",
+        lambda u: {"score": u.seq() % 21}),
+    "POST /api/courses/<cid>/syllabus": ("POST", lambda u: f"/api/courses/{_course(u)}/syllabus", _syllabus),
+    "POST /api/courses/<cid>/<section>/<item_id>/toggle": (
+        "POST", lambda u: f"/api/courses/{_course(u)}/lesson/{_first(u, 'lessons')}/toggle", None),
+    "DELETE /api/courses/<cid>": ("DELETE", lambda u: f"/api/courses/{_pop_created(u)}", None),
+}
+LLM_ENDPOINTS = {"POST /api/decision/analyze", "POST /api/decision/analyze?stream=1"}
+
+
+def _pop_created(user):
+    try:
+        return user.created.pop()
+    except IndexError:
+        return "000000000000000000000000"
+
+
+# ---------------------------
+# measurement
+# ---------------------------
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def run_endpoint(base_url, name, users, requests, concurrency, warmup, accept_encoding):
+    method, path, body = ENDPOINTS[name]
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def call(client, user):
+        status, payload = client.request(method, path(user), user.token, body(user) if body else None)
+        if name == "POST /api/courses" and status == 201:
+            user.created.append(json.loads(payload)["_id"])
+        return status
+
+    warm = Client(base_url, accept_encoding)
+    for i in range(warmup):
+        call(warm, users[i % len(users)])
+    warm.close()
+
+    def worker(w):
+        client = Client(base_url, accept_encoding)
+        while True:
+            i = next(counter)
+            if i >= requests:
+                break
+            user = users[(w + i) % len(users)]
+            started = time.perf_counter()
+            try:
+                status = call(client, user)
+            except Exception:
+                status = "error"
+                client.close()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+        client.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(n for status, n in statuses.items() if status == "error" or int(status) >= 500)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "error_rate": round(errors / len(latencies), 4),
+        "statuses": statuses,
+    }
+
+
+def compare(report, baseline, tolerance, floor_ms):
+    """Regressions of `report` against a saved `baseline` report."""
+    flags = []
+    for name, now in report["endpoints"].items():
+        then = baseline["endpoints"].get(name)
+        if then is None or now["error_rate"] >= 1 or then["error_rate"] >= 1:
+            continue  # nothing succeeded: there are no latencies to compare
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if now[key] > then[key] * (1 + tolerance) and now[key] - then[key] >= floor_ms:
+                flags.append(f"{name}: {key} {then[key]} -> {now[key]}")
+        if now["rps"] < then["rps"] * (1 - tolerance):
+            flags.append(f"{name}: rps {then['rps']} -> {now['rps']}")
+        if now["error_rate"] > then["error_rate"] + 0.01:
+            flags.append(f"{name}: error_rate {then['error_rate']} -> {now['error_rate']}")
+    return flags
+
+
+# ---------------------------
+# server under test
+# ---------------------------
+def start_server(args, groq_url):
+    port = args.port
+    env = dict(os.environ, GROQ_BASE_URL=groq_url, GROQ_API_KEY="bench", PORT=str(port))
+    env.pop("METRICS_DIR", None)
+    env["MONGO_URI"] = args.mongo_uri or "mongodb://bench-memory"
+    if args.server == "dev":
+        cmd = [sys.executable, "-c", CHILD.format(backend=BACKEND, memory=args.mongo_uri is None, port=port)]
+    elif args.server == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    log = tempfile.NamedTemporaryFile("w+", prefix="bench-load-", suffix=".log", delete=False)
+    proc = subprocess.Popen(cmd, cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    url = f"http://127.0.0.1:{port}"
+    client = Client(url)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            break
+        try:
+            if client.request("GET", "/readyz")[0] == 200:
+                client.close()
+                return proc, url
+        except OSError:
+            pass
+        client.close()
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"server did not become ready, see {log.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", choices=("dev", "gunicorn", "uvicorn"), default="dev",
+                        help="how to run the app (gunicorn/uvicorn need --mongo-uri)")
+    parser.add_argument("--url", help="benchmark an already running server instead")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--mongo-uri", help="local MongoDB to use instead of the in-process stand-in")
+    parser.add_argument("--groq-port", type=int, default=0, help="fake Groq port (0: any free port)")
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--llm-jitter-ms", type=float, default=150)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--emotions", type=int, default=150, help="seeded per user")
+    parser.add_argument("--decisions", type=int, default=15, help="seeded per user")
+    parser.add_argument("--courses", type=int, default=4, help="seeded per user")
+    parser.add_argument("--lessons", type=int, default=12, help="lessons per seeded course")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--llm-requests", type=int, default=48, help="measured requests per LLM-bound endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--accept-encoding", default="gzip, deflate, br")
+    parser.add_argument("--only", help="regex: endpoints to run")
+    parser.add_argument("--json", help="write the report (usable as a --baseline) to this file")
+    parser.add_argument("--baseline", help="compare against this saved report; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change")
+    parser.add_argument("--floor-ms", type=float, default=2.0, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    if args.mongo_uri is None and (args.server != "dev" or args.url):
+        parser.error("the in-process Mongo stand-in only works with --server dev; pass --mongo-uri")
+
+    groq, groq_url = fake_groq.start(0, 0, port=args.groq_port)  # no model latency while seeding
+    print(f"fake Groq on {groq_url}")
+    proc = None
+    if args.mongo_uri:
+        cleanup(args.mongo_uri)
+    try:
+        if args.url:
+            url = args.url
+        else:
+            proc, url = start_server(args, groq_url)
+
+        started = time.perf_counter()
+        users = seed(url, args)
+        print(f"seeded {len(users)} users in {time.perf_counter() - started:.1f}s")
+
+        handler = groq.RequestHandlerClass
+        handler.latency, handler.jitter = args.llm_latency_ms / 1000.0, args.llm_jitter_ms / 1000.0
+
+        names = [n for n in ENDPOINTS if not args.only or re.search(args.only, n)]
+        report = {
+            "config": {key: getattr(args, key) for key in (
+                "server", "mongo_uri", "llm_latency_ms", "llm_jitter_ms", "users", "emotions", "decisions",
+                "courses", "lessons", "concurrency", "requests", "llm_requests", "accept_encoding")},
+            "endpoints": {},
+        }
+        report["config"]["mongo"] = "mongodb" if args.mongo_uri else "stand-in"
+        del report["config"]["mongo_uri"]
+
+        print(f"{'endpoint':<52} {'req':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>6}")
+        for name in names:
+            requests = args.llm_requests if name in LLM_ENDPOINTS else args.requests
+            result = run_endpoint(url, name, users, requests, args.concurrency, args.warmup, args.accept_encoding)
+            report["endpoints"][name] = result
+            print(f"{name:<52} {result['requests']:>5} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} "
+                  f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['error_rate']:>6.1%}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=60)
+        groq.shutdown()
+        if args.mongo_uri:
+            cleanup(args.mongo_uri)
+
+    failing = [name for name, result in report["endpoints"].items() if result["error_rate"] >= 1]
+    if failing and not args.mongo_uri:
+        print(f"ℹ️  {len(failing)} endpoint(s) failed every request; they need MongoDB features the stand-in "
+              "lacks, run with --mongo-uri to measure them")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != report["config"]:
+        print("⚠️  baseline was recorded with a different configuration")
+    regressions = compare(report, baseline, args.tolerance, args.floor_ms)
+    for line in regressions:
+        print(f"❌ regression: {line}")
+    if regressions:
+        return 1
+    print("✅ no regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
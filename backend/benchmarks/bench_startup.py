@@ -0,0 +1,115 @@
+"""
+Benchmark: worker cold start (import app + create_app()).
+
+Each run is a fresh interpreter, like a newly forked or autoscaled
+worker. Reports the median and worst time until the app can accept
+requests, plus the modules that cost the most to import. No MongoDB or
+Groq is needed unless --wait-ready is given, in which case each run also
+waits for /readyz's checks (readiness.py) against MONGO_URI.
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --runs 10 --budget 0.8 --json startup.json   # CI
+
+With --budget the exit status is 1 when the median startup exceeds it.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {backend!r})
+import app
+app.create_app()
+import readiness
+status = readiness.warmup.status()
+if {wait_ready!r}:
+    while not status["ready"]:
+        time.sleep(0.05)
+        status = readiness.warmup.status()
+print("RESULT " + json.dumps({{
+    "startup_seconds": status["startup_seconds"],
+    "ready_seconds": status["ready_seconds"],
+    "groq_imported": "groq" in sys.modules,
+}}))
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def run_once(wait_ready, importtime=False):
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://127.0.0.1:27017/?serverSelectionTimeoutMS=2000")
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", CHILD.format(backend=BACKEND, wait_ready=wait_ready)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env, cwd=BACKEND, timeout=120)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "child failed")
+    return json.loads(lines[-1][len("RESULT "):]), proc.stderr
+
+
+def heaviest_imports(stderr, n):
+    """Modules app.py imports directly, by cumulative microseconds."""
+    rows = []
+    for match in IMPORT_LINE.finditer(stderr):
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 3:  # one level under `app`
+            rows.append((cumulative, name))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--wait-ready", action="store_true", help="also time the Mongo/LLM warm-up")
+    parser.add_argument("--budget", type=float, help="fail if the median startup (s) exceeds this")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list")
+    args = parser.parse_args()
+
+    run_once(args.wait_ready)  # warm the filesystem / bytecode caches
+    results = [run_once(args.wait_ready)[0] for _ in range(args.runs)]
+    _, stderr = run_once(False, importtime=True)
+
+    startup = sorted(r["startup_seconds"] for r in results)
+    report = {
+        "runs": args.runs,
+        "startup_median": round(statistics.median(startup), 4),
+        "startup_max": round(startup[-1], 4),
+        "groq_imported_at_boot": any(r["groq_imported"] for r in results),
+        "heaviest_imports_ms": {name: round(us / 1000, 1) for us, name in heaviest_imports(stderr, args.top)},
+    }
+    if args.wait_ready:
+        ready = sorted(r["ready_seconds"] for r in results)
+        report["ready_median"] = round(statistics.median(ready), 4)
+        report["ready_max"] = round(ready[-1], 4)
+
+    print(f"cold start over {args.runs} runs: median {report['startup_median']:.3f}s, max {report['startup_max']:.3f}s")
+    if args.wait_ready:
+        print(f"ready (warm-up done): median {report['ready_median']:.3f}s, max {report['ready_max']:.3f}s")
+    print(f"groq imported at boot: {report['groq_imported_at_boot']}")
+    print("heaviest imports (ms):")
+    for name, ms in report["heaviest_imports_ms"].items():
+        print(f"  {name:<28} {ms:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.budget is not None and report["startup_median"] > args.budget:
+        print(f"❌ median startup {report['startup_median']:.3f}s is over the {args.budget:.3f}s budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Fake Groq (OpenAI-compatible) chat completions server for benchmarks.
+
+Answers POST .../chat/completions after a configurable latency with
+jitter, with a valid decision JSON when the prompt asks for a decision
+and an emotion interpretation otherwise, plus token usage. stream=true
+is answered as SSE chunks, the last one carrying x_groq.usage like Groq
+does. Point the app at it with GROQ_BASE_URL:
+
+    python benchmarks/fake_groq.py --port 8090 --latency-ms 800 --jitter-ms 200
+    GROQ_BASE_URL=http://127.0.0.1:8090 GROQ_API_KEY=bench gunicorn -c gunicorn.conf.py
+
+bench_load.py starts one in-process with start().
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LABELS = ["Focused", "Calm", "Joy", "Neutral", "Tired", "Stressed", "Anxious", "Sad"]
+
+
+def _decision():
+    return {
+        "final_decision": random.choice(["Go ahead", "Wait a week", "Ask for help first"]),
+        "rationale": "Balances the stated goal against current stress and workload.",
+        "confidence_score": random.randint(40, 95),
+        "bias_detected": random.choice([None, "anchoring", "loss aversion"]),
+        "risk_level": random.choice(["low", "medium", "high"]),
+        "cognitive_alignment": "Fits the user's reflective learning style.",
+        "emotional_influence": "Moderate stress is pushing towards a quick answer.",
+        "short_term_effect": "Some extra load this week.",
+        "long_term_effect": "Better fit with the semester plan.",
+        "action_steps": ["List the options", "Sleep on it", "Decide on Friday"],
+    }
+
+
+def _interpretation():
+    return {
+        "focus_score": random.randint(0, 100),
+        "stress_score": random.randint(0, 100),
+        "motivation_score": random.randint(0, 100),
+        "cognitive_state": random.choice(LABELS),
+        "interpretation": "Attention is steady but energy is dropping.",
+        "recommendation": "Take a short break, then continue with lighter tasks.",
+    }
+
+
+def answer(messages):
+    prompt = " ".join(m.get("content") or "" for m in messages)
+    content = _decision() if "final_decision" in prompt else _interpretation()
+    return json.dumps(content), {
+        "prompt_tokens": len(prompt) // 4,
+        "completion_tokens": len(json.dumps(content)) // 4,
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # set by start()
+    latency = 0.5
+    jitter = 0.1
+    token_delay = 0.005
+    error_rate = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "not found"}})
+
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            return self._send_json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+
+        content, usage = answer(body.get("messages", []))
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": body.get("model", "fake")}
+
+        if not body.get("stream"):
+            return self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }]))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            chunk = dict(base, object="chat.completion.chunk", choices=[{
+                "index": 0,
+                "delta": {"role": "assistant", "content": piece} if i == 0 else {"content": piece},
+                "finish_reason": "stop" if last else None,
+            }])
+            if last:
+                chunk["x_groq"] = {"id": base["id"], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def start(latency_ms=500, jitter_ms=100, token_ms=5, error_rate=0.0, host="127.0.0.1", port=0):
+    """Serve on a daemon thread; returns (server, base_url)."""
+    handler = type("FakeGroqHandler", (Handler,), {
+        "latency": latency_ms / 1000.0,
+        "jitter": jitter_ms / 1000.0,
+        "token_delay": token_ms / 1000.0,
+        "error_rate": error_rate,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-groq", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--token-ms", type=float, default=5, help="delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with a 500")
+    args = parser.parse_args()
+
+    server, url = start(args.latency_ms, args.jitter_ms, args.token_ms, args.error_rate, args.host, args.port)
+    print(f"fake Groq on {url} (GROQ_BASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
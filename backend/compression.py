@@ -0,0 +1,90 @@
+"""
+Response compression (after_request).
+
+JSON and NDJSON responses are compressed with brotli when the client
+accepts it and the `brotli` package is installed, otherwise gzip.
+Buffered bodies under COMPRESS_MIN_SIZE bytes (default 1024) are left
+alone; streamed bodies (history with ?stream=1 / ?format=ndjson) are
+compressed chunk by chunk as they are produced. Server-Sent Events are
+never compressed, since that would hold tokens back in the compressor.
+
+A compressed representation gets its own strong ETag: "<etag>-<coding>".
+"""
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BR_QUALITY", "4"))
+COMPRESSIBLE = ("application/json", "application/x-ndjson")
+ENCODINGS = ("br", "gzip")
+
+
+def choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings.quality("br") > 0:
+        return "br"
+    if accept_encodings.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def _compressor(encoding):
+    if encoding == "br":
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        return c.process, c.finish
+    c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    return c.compress, c.flush
+
+
+def compress_bytes(data, encoding):
+    process, finish = _compressor(encoding)
+    return process(data) + finish()
+
+
+def _compress_stream(chunks, encoding):
+    process, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            out = process(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if out:
+                yield out
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+def compress_response(response, accept_encodings):
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encodings)
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+
+    response.headers["Content-Encoding"] = encoding
+    tag, weak = response.get_etag()
+    if tag:
+        response.set_etag(f"{tag}-{encoding}", weak=weak)
+    return response
@@ -0,0 +1,194 @@
+"""
+Course insights engine.
+
+Per-course cognitive metrics (progress, LLI, SMI, MRS, fatigue,
+recommendation). The user-level signals the metrics depend on are loaded
+once per engine, so annotating N courses costs one emotion read instead
+of N.
+
+Item metrics come from the per-section `counters` maintained on the
+course document (see course_store); documents written before counters
+existed fall back to scanning the item arrays.
+"""
+import emotion_rollup
+
+STRESS_WINDOW = 15
+
+
+SECTIONS = ("lessons", "modules", "labs")
+
+
+def scan_counters(course):
+    """Counters derived by scanning the embedded item arrays (legacy docs / backfill)."""
+    counters = {}
+    for section in SECTIONS:
+        items = course.get(section, [])
+        counters[section] = {
+            "total": len(items),
+            "completed": sum(1 for x in items if x.get("completed")),
+        }
+    assessments = course.get("assessments", [])
+    counters["assessments"] = {
+        "total": len(assessments),
+        "score": sum((a.get("score") or 0) for a in assessments),
+        "max_score": sum((a.get("max_score") or 100) for a in assessments),
+    }
+    return counters
+
+
+def course_counters(course):
+    """Maintained counters when the document has them, otherwise a scan."""
+    return course.get("counters") or scan_counters(course)
+
+
+def progress_from_counters(counters):
+    weights = {
+        "lessons": 0.40,
+        "modules": 0.25,
+        "labs": 0.15,
+        "assessments": 0.20,
+    }
+
+    present = {k: v for k, v in weights.items() if counters.get(k, {}).get("total", 0) > 0}
+    if not present:
+        return 0
+
+    total_nominal = sum(present.values())
+    adjusted = {k: weights[k] / total_nominal for k in present}
+
+    def pct(section):
+        c = counters.get(section, {})
+        return c["completed"] / c["total"] if c.get("total") else 0
+
+    assess = counters.get("assessments", {})
+    max_total = assess.get("max_score", 0)
+    assessments_pct = assess.get("score", 0) / max_total if assess.get("total") and max_total else 0
+
+    progress = (
+        pct("lessons") * adjusted.get("lessons", 0) +
+        pct("modules") * adjusted.get("modules", 0) +
+        pct("labs") * adjusted.get("labs", 0) +
+        assessments_pct * adjusted.get("assessments", 0)
+    )
+
+    return round(progress * 100)
+
+
+def compute_course_progress(course):
+    return progress_from_counters(course_counters(course))
+
+
+def summary_fields(counters):
+    """Counter-derived fields stored on the course for list sorting."""
+    return {
+        "progress_percent": progress_from_counters(counters),
+        "learning_load": compute_learning_load({"counters": counters}),
+    }
+
+# ---------------------------
+# Cognitive learning helpers (per-course)
+# ---------------------------
+def compute_learning_load(course):
+    """Estimate Learning Load Index (LLI) from counts and total items."""
+    counters = course_counters(course)
+    lessons = counters["lessons"]["total"]
+    modules = counters["modules"]["total"]
+    labs = counters["labs"]["total"]
+    assessments = counters["assessments"]["total"]
+
+    # simple heuristic: more items => higher load
+    nominal = lessons + modules*2 + labs*1.5 + assessments*2.5
+    # normalize to 0..100 (tweak scale if needed)
+    lli = min(100, round(nominal * 5))  # each unit ~5 points
+    return lli
+
+def compute_skill_mastery(course):
+    """Skill Mastery Index from assessment scores and lesson completions."""
+    counters = course_counters(course)
+    assess = counters["assessments"]
+    lessons = counters["lessons"]
+
+    # assessments: average score% (if present)
+    if assess["total"] and assess["max_score"]:
+        assess_pct = (assess["score"] / assess["max_score"]) * 100
+    else:
+        assess_pct = 0
+
+    # lessons completion %
+    if lessons["total"]:
+        lessons_pct = (lessons["completed"] / lessons["total"]) * 100
+    else:
+        lessons_pct = 0
+
+    # weighted mastery
+    smi = round((assess_pct * 0.6) + (lessons_pct * 0.4))
+    return max(0, min(100, smi))
+
+def compute_memory_retention(course):
+    """Memory Retention Score — favors recent completions and assessment recency.
+       If timestamps are not stored, fallback to progress-based approximation."""
+    # If you later add timestamps to lesson completions, use recency decay.
+    progress = course.get("progress_percent", 0)
+    # retention approx: higher progress -> better retained but saturates
+    mrs = round(min(100, progress * 0.9 + 10))
+    return mrs
+
+def compute_fatigue(course, stress_avg):
+    """Cognitive fatigue: combines learning load and the user's recent stress signal."""
+    lli = compute_learning_load(course)
+
+    # fatigue heuristic: higher LLI and higher stress => higher fatigue
+    fatigue = round((lli * 0.6) + (stress_avg * 0.4))
+    return max(0, min(100, fatigue))
+
+def course_recommendation(course, lli, fatigue, smi, mrs):
+    """Return simple actionable recommendation for this course."""
+    if fatigue > 75:
+        return "High fatigue — consider short breaks and reduce new study load."
+    if smi < 50 and mrs < 50:
+        return "Revise recent lessons and attempt a short quiz to reinforce memory."
+    if lli > 70 and smi > 75:
+        return "Load is high but mastery is strong — schedule spaced repetition."
+    if smi >= 80:
+        return "Strong mastery — try advanced problems or accelerate modules."
+    return "Keep steady — 30–40 min focused sessions with short breaks."
+
+
+# ---------------------------
+# Batched engine
+# ---------------------------
+class CourseInsightsEngine:
+    """Computes insights for any number of one user's courses in one pass."""
+
+    def __init__(self, db, user_id, load_rollup=None):
+        self.db = db
+        self.user_id = str(user_id)
+        # callable returning the user's emotion rollup (lets a request loader share it)
+        self._load_rollup = load_rollup or (lambda: emotion_rollup.get_rollup(self.db, self.user_id))
+        self._stress_avg = None
+
+    @property
+    def stress_avg(self):
+        if self._stress_avg is None:
+            stats = emotion_rollup.window_stats(self._load_rollup(), STRESS_WINDOW)
+            self._stress_avg = round(stats["stress_avg"]) if stats["stress_avg"] is not None else 50
+        return self._stress_avg
+
+    def annotate(self, course):
+        """Refresh progress and attach lli/smi/mrs/fatigue/recommendation in place."""
+        course["progress_percent"] = compute_course_progress(course)
+
+        lli = compute_learning_load(course)
+        smi = compute_skill_mastery(course)
+        mrs = compute_memory_retention(course)
+        fatigue = compute_fatigue(course, self.stress_avg)
+
+        course["lli"] = lli
+        course["smi"] = smi
+        course["mrs"] = mrs
+        course["fatigue"] = fatigue
+        course["recommendation"] = course_recommendation(course, lli, fatigue, smi, mrs)
+        return course
+
+    def annotate_all(self, courses):
+        return [self.annotate(c) for c in courses]
@@ -0,0 +1,215 @@
+"""
+Normalized course item storage.
+
+Courses with `items_layout: "collection"` keep their lessons, modules,
+labs and assessments in the `course_items` collection instead of
+embedded arrays; only the per-section counters stay on the course, so
+course documents stay small no matter how large the syllabus gets.
+
+    {
+      "_id": "<item id>", "course_id": "<course id>", "user_id": "<user id>",
+      "section": "lessons" | "modules" | "labs" | "assessments",
+      "position": int, "title": str,
+      "completed": bool                      # lessons/modules/labs
+      "score": number|null, "max_score": n   # assessments
+    }
+
+Items are read per section in (position, _id) order, a page at a time.
+New courses use the layout when COURSE_ITEMS_LAYOUT=collection; existing
+ones are moved over with:
+
+    python course_items.py --migrate [--dry-run]
+"""
+import os
+import sys
+
+from pymongo import ASCENDING, IndexModel, UpdateOne
+
+from course_insights import scan_counters, summary_fields
+
+LAYOUT = "collection"
+SECTIONS = ("lessons", "modules", "labs", "assessments")
+PAGE_SIZE = int(os.getenv("COURSE_ITEMS_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = 500
+
+INDEXES = [
+    IndexModel(
+        [("course_id", ASCENDING), ("section", ASCENDING), ("position", ASCENDING), ("_id", ASCENDING)],
+        name="course_id_section_position",
+    ),
+]
+
+
+def default_layout():
+    return LAYOUT if os.getenv("COURSE_ITEMS_LAYOUT", "embedded") == LAYOUT else "embedded"
+
+
+def uses_collection(course):
+    return course.get("items_layout") == LAYOUT
+
+
+def items_col(db):
+    return db["course_items"]
+
+
+def item_docs(course_id, user_id, plural, items, start):
+    return [
+        {**item, "course_id": str(course_id), "user_id": str(user_id), "section": plural, "position": start + i}
+        for i, item in enumerate(items)
+    ]
+
+
+def insert(db, course_id, user_id, sections, counters):
+    """Insert {plural: [item, ...]} after the items already counted in `counters`."""
+    docs = []
+    for plural, items in sections.items():
+        docs.extend(item_docs(course_id, user_id, plural, items, counters.get(plural, {}).get("total", 0)))
+    if docs:
+        items_col(db).insert_many(docs, ordered=False)
+
+
+def flip_completed(db, course_id, plural, item_id):
+    """
+    Atomically flip one item's `completed`; returns the new value, or None
+    if the item doesn't exist. Each attempt is a conditional update, so
+    racing toggles both apply (twice toggled == unchanged).
+    """
+    col = items_col(db)
+    key = {"_id": item_id, "course_id": str(course_id), "section": plural}
+    if col.update_one({**key, "completed": {"$ne": True}}, {"$set": {"completed": True}}).modified_count:
+        return True
+    if col.update_one({**key, "completed": True}, {"$set": {"completed": False}}).modified_count:
+        return False
+    return None
+
+
+def set_score(db, course_id, item_id, score, max_score=None):
+    """Update an assessment; returns the previous document or None."""
+    fields = {"score": score}
+    if max_score is not None:
+        fields["max_score"] = max_score
+    return items_col(db).find_one_and_update(
+        {"_id": item_id, "course_id": str(course_id), "section": "assessments"},
+        {"$set": fields},
+    )
+
+
+def _after(cursor):
+    position, _, item_id = str(cursor).partition(":")
+    return {"$or": [
+        {"position": {"$gt": int(position)}},
+        {"position": int(position), "_id": {"$gt": item_id}},
+    ]}
+
+
+def page(db, course_id, plural, limit=None, after=None):
+    """(items, next_cursor) for one section; `after` is a cursor from a previous page."""
+    limit = max(1, min(int(limit or PAGE_SIZE), MAX_PAGE_SIZE))
+    query = {"course_id": str(course_id), "section": plural}
+    if after:
+        query.update(_after(after))
+    docs = list(
+        items_col(db)
+        .find(query, {"course_id": 0, "user_id": 0, "section": 0})
+        .sort([("position", ASCENDING), ("_id", ASCENDING)])
+        .limit(limit + 1)
+    )
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = f"{docs[-1]['position']}:{docs[-1]['_id']}"
+    for doc in docs:
+        doc.pop("position", None)
+    return docs, next_cursor
+
+
+def attach_first_pages(db, course, limit=None):
+    """Fill the section arrays with their first page; cursors go in `items_next`."""
+    course["items_next"] = {}
+    for plural in SECTIONS:
+        course[plural], course["items_next"][plural] = page(db, course["_id"], plural, limit)
+    return course
+
+
+def recount(db, course_id):
+    """Counters rebuilt from the stored items (repairs counters an item write never committed)."""
+    sections = {plural: [] for plural in SECTIONS}
+    for doc in items_col(db).find({"course_id": str(course_id)}, {"section": 1, "completed": 1, "score": 1, "max_score": 1}):
+        sections.setdefault(doc["section"], []).append(doc)
+    return scan_counters(sections)
+
+
+def delete_for_course(db, course_id):
+    items_col(db).delete_many({"course_id": str(course_id)})
+
+
+# ---------------------------
+# Migration (embedded arrays -> course_items)
+# ---------------------------
+def migrate_course(db, course, dry_run=False):
+    """Move one course's embedded items; returns the number of items moved, or None on a write race."""
+    if uses_collection(course):
+        return 0
+    uid = course["user_id"]
+    ops = []
+    for plural in SECTIONS:
+        for doc in item_docs(course["_id"], uid, plural, course.get(plural, []), 0):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True))
+    if dry_run:
+        return len(ops)
+
+    counters = scan_counters(course)
+    if ops:
+        # upserts keep re-runs and retries idempotent
+        items_col(db).bulk_write(ops, ordered=False)
+    result = db["courses"].update_one(
+        {"_id": course["_id"], "version": course.get("version")},
+        {
+            "$set": {"items_layout": LAYOUT, "counters": counters, **summary_fields(counters)},
+            "$unset": {plural: "" for plural in SECTIONS},
+            "$inc": {"version": 1},
+        },
+    )
+    return len(ops) if result.modified_count else None
+
+
+def migrate_all(db, dry_run=False, retries=3):
+    moved = courses = 0
+    for course in db["courses"].find({"items_layout": {"$ne": LAYOUT}}):
+        for _ in range(retries):
+            n = migrate_course(db, course, dry_run)
+            if n is not None:
+                break
+            course = db["courses"].find_one({"_id": course["_id"]})
+        else:
+            print(f"⚠️ Skipped course {course['_id']} (kept changing during migration)")
+            continue
+        moved += n
+        courses += 1
+    return courses, moved
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    import indexes
+
+    argv = sys.argv[1:] if argv is None else argv
+    if "--migrate" not in argv:
+        print(__doc__)
+        return 0
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI"))[indexes.DB_NAME]
+    dry_run = "--dry-run" in argv
+    if not dry_run:
+        items_col(db).create_indexes(INDEXES)
+    courses, moved = migrate_all(db, dry_run=dry_run)
+    verb = "Would move" if dry_run else "Moved"
+    print(f"✅ {verb} {moved} items from {courses} courses into course_items")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
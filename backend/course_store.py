@@ -0,0 +1,419 @@
+"""
+Course document writes.
+
+Every course carries per-section counters and a version:
+
+    {
+      ...,
+      "lessons": [{_id, title, completed}], "modules": [...], "labs": [...],
+      "assessments": [{_id, title, score, max_score}],
+      "counters": {
+        "lessons": {"total", "completed"}, "modules": {...}, "labs": {...},
+        "assessments": {"total", "score", "max_score"}
+      },
+      "progress_percent": int,
+      "learning_load": int,      # LLI, stored so the list can sort by fatigue
+      "version": int
+    }
+
+An item write is one small projected read (counters, version and, for a
+toggle, the target element via $elemMatch) followed by a single
+`find_one_and_update` that changes the one array element in place
+(arrayFilters), adjusts the counters with `$inc` and stores the new
+progress/learning load, so the arrays are never rewritten. The update is
+conditioned on `version`, so two racing toggles can't both apply on top
+of the same state; the loser re-reads and retries. Courses written before counters
+existed are backfilled on first write.
+
+Courses with `items_layout: "collection"` have no arrays; their items
+live in `course_items` (see course_items.py). There the item is written
+first and the counters/progress follow in one version-conditioned
+update, and returned courses carry the first page of each section.
+Before the item write the course is marked (`counters_pending` +1,
+`counters_dirty_at`) and the counter update takes the mark off again; a
+mark older than COURSE_COUNTERS_STALE_AFTER seconds (default 30) means a
+write died in between, and the next read rebuilds the counters from the
+items (`counters_stale` / `repair_stale_counters` / `ensure_counters`).
+"""
+import copy
+import datetime
+import os
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+import course_items
+from course_insights import scan_counters, summary_fields
+
+MAX_RETRIES = 5
+SECTION_PLURALS = {"lesson": "lessons", "module": "modules", "lab": "labs"}
+CONTENT_PLURALS = {**SECTION_PLURALS, "assessment": "assessments"}
+STATE_PROJECTION = {"counters": 1, "version": 1, "items_layout": 1}
+STALE_AFTER = int(os.getenv("COURSE_COUNTERS_STALE_AFTER", "30"))
+
+
+class CourseNotFound(Exception):
+    pass
+
+
+class ItemNotFound(Exception):
+    pass
+
+
+class VersionConflict(Exception):
+    """args[0] is the course's current version, for the client to retry against."""
+
+
+def _conflict(col, owner):
+    """VersionConflict carrying the version the course is at now."""
+    state = col.find_one(owner, {"version": 1})
+    if not state:
+        raise CourseNotFound()
+    return VersionConflict(state.get("version", 0))
+
+
+def empty_counters():
+    return scan_counters({})
+
+
+def new_course(user_id, title, code, semester, created_at, layout=None):
+    course = {
+        "user_id": str(user_id),
+        "title": title,
+        "code": code,
+        "semester": semester or "",
+        "counters": empty_counters(),
+        **summary_fields(empty_counters()),
+        "version": 1,
+        "created_at": created_at,
+    }
+    if (layout or course_items.default_layout()) == course_items.LAYOUT:
+        course["items_layout"] = course_items.LAYOUT
+    else:
+        course.update({"lessons": [], "modules": [], "labs": [], "assessments": []})
+    return course
+
+
+def with_items(col, course):
+    """Course as the API returns it: collection-layout courses get their first item pages."""
+    if course is not None and course_items.uses_collection(course):
+        course_items.attach_first_pages(col.database, course)
+    return course
+
+
+def _mark_pending(col, owner, expected_version=None):
+    """
+    Flag a collection-layout course before an item write; _commit_counters
+    clears it. With `expected_version` the flag is only set while the
+    course is still at that version (VersionConflict otherwise).
+    """
+    query = owner if expected_version is None else {**owner, "version": expected_version}
+    result = col.update_one(
+        query, {"$inc": {"counters_pending": 1}, "$set": {"counters_dirty_at": datetime.datetime.utcnow()}}
+    )
+    if not result.matched_count:
+        if expected_version is not None:
+            raise _conflict(col, owner)
+        raise CourseNotFound()
+
+
+def _unmark_pending(col, owner):
+    """The item write changed nothing (e.g. the item doesn't exist)."""
+    col.update_one(owner, {"$inc": {"counters_pending": -1}})
+
+
+def _commit_counters(col, owner, inc):
+    """Apply counter deltas plus the matching progress for a collection-layout course."""
+    for _ in range(MAX_RETRIES):
+        state = col.find_one(owner, STATE_PROJECTION)
+        if not state:
+            raise CourseNotFound()
+        updated = col.find_one_and_update(
+            {**owner, "version": state.get("version", 0)},
+            {
+                "$set": summary_fields(_apply_incs(state["counters"], inc)),
+                "$inc": {**inc, "version": 1, "counters_pending": -1},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated:
+            return with_items(col, updated)
+
+    # the item write already happened; keep the counters exact even if progress lags one write
+    return with_items(col, col.find_one_and_update(
+        owner, {"$inc": {**inc, "version": 1, "counters_pending": -1}}, return_document=ReturnDocument.AFTER
+    ))
+
+
+def counters_stale(course):
+    """True when ensure_counters has work to do: no counters yet, or an item write died before committing them."""
+    if "counters" not in course or "learning_load" not in course:
+        return True
+    dirty_at = course.get("counters_dirty_at")
+    return (
+        course.get("counters_pending", 0) > 0
+        and dirty_at is not None
+        and (datetime.datetime.utcnow() - dirty_at).total_seconds() > STALE_AFTER
+    )
+
+
+def stale_filter(user_id, course_oid=None):
+    """counters_stale as a query over one user's courses (or just `course_oid`)."""
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=STALE_AFTER)
+    query = {"user_id": str(user_id), "$or": [
+        {"counters": {"$exists": False}},
+        {"learning_load": {"$exists": False}},
+        {"counters_pending": {"$gt": 0}, "counters_dirty_at": {"$lt": cutoff}},
+    ]}
+    if course_oid is not None:
+        query["_id"] = course_oid
+    return query
+
+
+def repair_stale_counters(col, user_id, course_oid=None):
+    """ensure_counters on every stale course of the user (or just `course_oid`); returns how many."""
+    stale = [c["_id"] for c in col.find(stale_filter(user_id, course_oid), {"_id": 1})]
+    for oid in stale:
+        ensure_counters(col, oid, user_id)
+    return len(stale)
+
+
+def ensure_counters(col, course_oid, user_id):
+    """
+    Backfill counters/summary fields on a legacy course, or rebuild them from
+    the items after an abandoned item write; returns False if it doesn't exist.
+    """
+    course = col.find_one({"_id": course_oid, "user_id": str(user_id)})
+    if not course:
+        return False
+    if not counters_stale(course):
+        return True
+    if course_items.uses_collection(course):
+        counters = course_items.recount(col.database, course_oid)
+    else:
+        counters = course.get("counters") or scan_counters(course)
+    # a write marked since the read above will commit (or be rebuilt) itself
+    col.update_one(
+        {"_id": course_oid, "version": course.get("version"), "counters_dirty_at": course.get("counters_dirty_at")},
+        {"$set": {"counters": counters, "counters_pending": 0, **summary_fields(counters)}, "$inc": {"version": 1}},
+    )
+    return True
+
+
+def toggle_item(col, course_oid, user_id, plural, item_id, expected_version=None):
+    """
+    Flip `completed` on one lesson/module/lab; returns the updated course.
+    Raises CourseNotFound / ItemNotFound, or VersionConflict when
+    `expected_version` is given and the course has moved past it.
+
+    The projected read stays: which way the item flips decides the
+    progress the update must $set alongside its $inc. On the collection
+    layout `expected_version` is re-checked atomically when the write is
+    flagged (_mark_pending).
+    """
+    owner = {"_id": course_oid, "user_id": str(user_id)}
+    for _ in range(MAX_RETRIES):
+        state = col.find_one(
+            owner,
+            {**STATE_PROJECTION, plural: {"$elemMatch": {"_id": item_id}}},
+        )
+        if not state:
+            raise CourseNotFound()
+        if "counters" not in state:
+            ensure_counters(col, course_oid, user_id)
+            continue
+
+        version = state.get("version", 0)
+        if expected_version is not None and version != expected_version:
+            raise VersionConflict(version)
+
+        if course_items.uses_collection(state):
+            _mark_pending(col, owner, expected_version)
+            completed = course_items.flip_completed(col.database, course_oid, plural, item_id)
+            if completed is None:
+                _unmark_pending(col, owner)
+                raise ItemNotFound()
+            return _commit_counters(col, owner, {f"counters.{plural}.completed": 1 if completed else -1})
+
+        matched = state.get(plural) or []
+        if not matched:
+            raise ItemNotFound()
+
+        was_completed = bool(matched[0].get("completed"))
+        delta = -1 if was_completed else 1
+        counters = copy.deepcopy(state["counters"])
+        counters[plural]["completed"] += delta
+
+        updated = col.find_one_and_update(
+            {
+                **owner,
+                "version": version,
+                plural: {"$elemMatch": {
+                    "_id": item_id,
+                    "completed": True if was_completed else {"$ne": True},
+                }},
+            },
+            {
+                "$set": {
+                    f"{plural}.$[item].completed": not was_completed,
+                    **summary_fields(counters),
+                },
+                "$inc": {f"counters.{plural}.completed": delta, "version": 1},
+            },
+            array_filters=[{"item._id": item_id}],
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated:
+            return updated
+        if expected_version is not None:
+            raise _conflict(col, owner)
+
+    raise _conflict(col, owner)
+
+
+def make_item(plural, raw):
+    """Validated item dict for `plural` from a title string or a client dict."""
+    if isinstance(raw, str):
+        raw = {"title": raw}
+    if not isinstance(raw, dict):
+        raise ValueError("item must be an object or a title")
+    title = str(raw.get("title") or "").strip()
+    if not title:
+        raise ValueError("title required")
+
+    item = {"_id": str(ObjectId()), "title": title}
+    if plural == "assessments":
+        item["max_score"] = parse_number(raw.get("max_score"), 100)
+        item["score"] = parse_number(raw.get("score"), None)
+    else:
+        item["completed"] = _truthy(raw.get("completed"))
+    return item
+
+
+def parse_number(value, default):
+    if value is None or value == "":
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"not a number: {value!r}")
+    return int(number) if number.is_integer() else number
+
+
+def _truthy(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y", "done", "x")
+    return bool(value)
+
+
+def _counter_incs(sections):
+    inc = {}
+    for plural, items in sections.items():
+        inc[f"counters.{plural}.total"] = len(items)
+        if plural == "assessments":
+            inc["counters.assessments.score"] = sum((a.get("score") or 0) for a in items)
+            inc["counters.assessments.max_score"] = sum((a.get("max_score") or 100) for a in items)
+        else:
+            inc[f"counters.{plural}.completed"] = sum(1 for x in items if x.get("completed"))
+    return inc
+
+
+def _apply_incs(counters, inc):
+    counters = copy.deepcopy(counters)
+    for path, n in inc.items():
+        _, plural, field = path.split(".")
+        counters.setdefault(plural, {})
+        counters[plural][field] = counters[plural].get(field, 0) + n
+    return counters
+
+
+def add_items(col, course_oid, user_id, sections):
+    """
+    Append items to any sections ({plural: [item, ...]}) with one $push/$each
+    update that also moves the counters and progress; returns the updated course.
+    """
+    owner = {"_id": course_oid, "user_id": str(user_id)}
+    sections = {plural: items for plural, items in sections.items() if items}
+    inc = _counter_incs(sections)
+    for _ in range(MAX_RETRIES):
+        state = col.find_one(owner, STATE_PROJECTION)
+        if not state:
+            raise CourseNotFound()
+        if "counters" not in state:
+            ensure_counters(col, course_oid, user_id)
+            continue
+        if not sections:
+            return with_items(col, col.find_one(owner))
+
+        if course_items.uses_collection(state):
+            _mark_pending(col, owner)
+            course_items.insert(col.database, course_oid, user_id, sections, state["counters"])
+            return _commit_counters(col, owner, inc)
+
+        counters = _apply_incs(state["counters"], inc)
+        updated = col.find_one_and_update(
+            {**owner, "version": state.get("version", 0)},
+            {
+                "$push": {plural: {"$each": items} for plural, items in sections.items()},
+                "$set": summary_fields(counters),
+                "$inc": {**inc, "version": 1},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated:
+            return updated
+
+    raise _conflict(col, owner)
+
+
+def _score_incs(current, score, max_score):
+    new_max = current.get("max_score") if max_score is None else max_score
+    return {
+        "counters.assessments.score": (score or 0) - (current.get("score") or 0),
+        "counters.assessments.max_score": (new_max or 100) - (current.get("max_score") or 100),
+    }
+
+
+def score_assessment(col, course_oid, user_id, assessment_id, score, max_score=None):
+    """Set an assessment's score (and optionally max_score); returns the updated course."""
+    owner = {"_id": course_oid, "user_id": str(user_id)}
+    for _ in range(MAX_RETRIES):
+        state = col.find_one(
+            owner,
+            {**STATE_PROJECTION, "assessments": {"$elemMatch": {"_id": assessment_id}}},
+        )
+        if not state:
+            raise CourseNotFound()
+        if "counters" not in state:
+            ensure_counters(col, course_oid, user_id)
+            continue
+
+        if course_items.uses_collection(state):
+            _mark_pending(col, owner)
+            previous = course_items.set_score(col.database, course_oid, assessment_id, score, max_score)
+            if previous is None:
+                _unmark_pending(col, owner)
+                raise ItemNotFound()
+            return _commit_counters(col, owner, _score_incs(previous, score, max_score))
+
+        matched = state.get("assessments") or []
+        if not matched:
+            raise ItemNotFound()
+
+        fields = {"assessments.$[item].score": score}
+        if max_score is not None:
+            fields["assessments.$[item].max_score"] = max_score
+        inc = _score_incs(matched[0], score, max_score)
+        counters = _apply_incs(state["counters"], inc)
+        fields.update(summary_fields(counters))
+
+        updated = col.find_one_and_update(
+            {**owner, "version": state.get("version", 0)},
+            {"$set": fields, "$inc": {**inc, "version": 1}},
+            array_filters=[{"item._id": assessment_id}],
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated:
+            return updated
+
+    raise _conflict(col, owner)
@@ -0,0 +1,55 @@
+"""
+Per-user data version for conditional GETs.
+
+Every write that can change what a user's read endpoints return bumps
+one counter in the `data_versions` collection ({_id: user_id, v: int}):
+emotion inserts and late AI interpretations, decision inserts, profile
+updates and course mutations.
+
+Read endpoints derive a strong ETag from (user, version, URL) and answer
+a matching If-None-Match with 304 after a single point read of the
+counter, without running their own queries. The counter is always read
+from MongoDB, so every worker process sees a bump immediately.
+"""
+import hashlib
+import os
+
+from pymongo import ReturnDocument
+
+# change to invalidate every client copy after a response-format change
+ETAG_SALT = os.getenv("ETAG_SALT", "1")
+
+
+def versions_col(db):
+    return db["data_versions"]
+
+
+def bump(db, user_id):
+    """Record a write for `user_id`; returns the new version."""
+    doc = versions_col(db).find_one_and_update(
+        {"_id": str(user_id)},
+        {"$inc": {"v": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["v"]
+
+
+async def bump_async(adb, user_id):
+    doc = await versions_col(adb).find_one_and_update(
+        {"_id": str(user_id)},
+        {"$inc": {"v": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["v"]
+
+
+def current(db, user_id):
+    doc = versions_col(db).find_one({"_id": str(user_id)})
+    return doc["v"] if doc else 0
+
+
+def etag(user_id, version, url):
+    raw = f"{ETAG_SALT}|{user_id}|{version}|{url}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:32]
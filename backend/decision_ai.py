@@ -0,0 +1,159 @@
+"""
+Decision Lab prompt, model call and response normalization.
+
+Shared by the blocking and streamed (SSE) /api/decision/analyze paths.
+`client` is the shared llm_client.LLMClient (llm_client.AsyncLLMClient
+for the `*_async` variants used by asgi.py).
+"""
+import json
+
+import emotion_rollup
+import metrics
+
+MODEL = "llama-3.3-70b-versatile"
+MAX_TOKENS = 800
+TEMPERATURE = 0.25
+
+
+def emotional_summary(db, user_id, rollup=None):
+    """Recent emotion summary (last 10) from the rollup (loaded unless given)."""
+    if rollup is None:
+        rollup = emotion_rollup.get_rollup(db, user_id)
+    stats = emotion_rollup.window_stats(rollup, 10)
+    if not stats["count"]:
+        return {
+            "dominant_emotion": None,
+            "avg_intensity": None,
+            "focus_avg": None,
+            "stress_avg": None,
+            "motivation_avg": None
+        }
+
+    def r(value):
+        return round(value) if value is not None else None
+
+    return {
+        "dominant_emotion": stats["dominant_emotion"],
+        "avg_intensity": r(stats["avg_intensity"]),
+        "focus_avg": r(stats["focus_avg"]),
+        "stress_avg": r(stats["stress_avg"]),
+        "motivation_avg": r(stats["motivation_avg"])
+    }
+
+
+def build_prompt(question, user_doc, summary):
+    """Deterministic prompt that includes user context."""
+    return f"""
+You are an expert decision advisor that tailors decisions to a student's cognitive profile and emotional state.
+Return STRICT JSON only.
+
+User question: "{question}"
+
+User context:
+- Name: {user_doc.get('name')}
+- Email: {user_doc.get('email')}
+- Learning styles: {user_doc.get("learning_styles", [])}
+- Subjects: {user_doc.get("subjects", [])}
+- Cognitive profile: {json.dumps(user_doc.get("cognitive_profile", {}))}
+- Recent emotion summary: {json.dumps(summary)}
+
+Respond with a JSON object with the following keys:
+- final_decision: string (direct concise recommendation)
+- rationale: string (concise explanation of reasoning)
+- confidence_score: integer (0-100)
+- bias_detected: string or null (e.g., "Overconfidence", "Loss aversion", null)
+- risk_level: "low"|"medium"|"high"
+- cognitive_alignment: string (how well this decision fits user's cognitive style)
+- emotional_influence: string (how current emotions might bias or affect this decision)
+- short_term_effect: string
+- long_term_effect: string
+- action_steps: array of short actionable steps (strings)
+
+Keep answers concise and practical.
+"""
+
+
+def message_text(msg):
+    if isinstance(msg.content, list):
+        return "".join(block.text if hasattr(block, "text") else str(block) for block in msg.content)
+    return msg.content
+
+
+def _request(prompt):
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_TOKENS,
+    }
+
+
+def _delta(chunk):
+    return chunk.choices[0].delta.content if chunk.choices else None
+
+
+def complete(client, prompt):
+    """Blocking completion; returns the raw response text."""
+    completion = client.chat("decision", **_request(prompt))
+    return message_text(completion.choices[0].message)
+
+
+def complete_stream(client, prompt):
+    """Streaming completion; yields text deltas as they arrive."""
+    for chunk in client.stream("decision", **_request(prompt)):
+        delta = _delta(chunk)
+        if delta:
+            yield delta
+
+
+async def complete_async(client, prompt):
+    completion = await client.chat("decision", **_request(prompt))
+    return message_text(completion.choices[0].message)
+
+
+async def complete_stream_async(client, prompt):
+    async for chunk in client.stream("decision", **_request(prompt)):
+        delta = _delta(chunk)
+        if delta:
+            yield delta
+
+
+def normalize(parsed):
+    """Ensure every result key exists with the expected type."""
+    return {
+        "final_decision": parsed.get("final_decision", "") or "",
+        "rationale": parsed.get("rationale", "") or "",
+        "confidence_score": int(parsed.get("confidence_score", 50) or 50),
+        "bias_detected": parsed.get("bias_detected", None),
+        "risk_level": parsed.get("risk_level", "medium"),
+        "cognitive_alignment": parsed.get("cognitive_alignment", "") or "",
+        "emotional_influence": parsed.get("emotional_influence", "") or "",
+        "short_term_effect": parsed.get("short_term_effect", "") or "",
+        "long_term_effect": parsed.get("long_term_effect", "") or "",
+        "action_steps": parsed.get("action_steps", []) or []
+    }
+
+
+def parse_response(response_text):
+    """Returns (result, cleaned_text); unparseable output becomes a minimal result."""
+    cleaned = response_text.replace("```json", "").replace("```", "").strip()
+
+    try:
+        parsed = json.loads(cleaned)
+    except Exception as e:
+        print("Decision JSON parse error:", e)
+        metrics.fallback("decision", "unparseable")
+        parsed = {
+            "final_decision": cleaned[:1000],
+            "rationale": "",
+            "confidence_score": 50,
+            "bias_detected": None,
+            "risk_level": "medium",
+            "cognitive_alignment": "",
+            "emotional_influence": "",
+            "short_term_effect": "",
+            "long_term_effect": "",
+            "action_steps": []
+        }
+
+    return normalize(parsed), cleaned
@@ -0,0 +1,200 @@
+"""
+Decision Lab result cache with in-flight coalescing.
+
+Key: sha256 over a canonical JSON of the user id, the normalized question
+(whitespace-collapsed, case-folded) and the context fields that shape the
+answer: learning styles, subjects, cognitive profile and the recent
+emotion summary. Logging a new emotion or re-analyzing the profile
+therefore produces a new key.
+
+Lookup order: in-process LRU -> a `decisions` record with the same
+context_hash inside the freshness window (DECISION_CACHE_TTL seconds,
+default 600, 0 disables) -> model call. Identical requests arriving
+while a call is in flight wait for it instead of issuing their own.
+
+`lookup_async` / `coalesce_async` are the asyncio equivalents for
+asgi.py; async waiters coalesce on their own in-flight map (one event
+loop per process) and share the LRU and counters.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+from ttl_cache import LRUTTLCache
+
+TTL_SECONDS = float(os.getenv("DECISION_CACHE_TTL", "600"))
+MEMORY_SIZE = int(os.getenv("DECISION_CACHE_SIZE", "1024"))
+WAIT_TIMEOUT = 120
+
+_memory = LRUTTLCache(MEMORY_SIZE, max(TTL_SECONDS, 0))
+_lock = threading.Lock()
+_inflight = {}
+_inflight_async = {}
+_counts = {"memory_hits": 0, "db_hits": 0, "misses": 0, "coalesced": 0}
+
+
+def _bump(name):
+    with _lock:
+        _counts[name] += 1
+
+
+def normalize_question(question):
+    return " ".join(question.split()).casefold()
+
+
+def _sorted_strings(values):
+    return sorted(" ".join(str(v).split()).casefold() for v in (values or []))
+
+
+def context_hash(user_id, question, user_doc, summary):
+    canonical = json.dumps(
+        {
+            "user_id": str(user_id),
+            "question": normalize_question(question),
+            "learning_styles": _sorted_strings(user_doc.get("learning_styles")),
+            "subjects": _sorted_strings(user_doc.get("subjects")),
+            "cognitive_profile": user_doc.get("cognitive_profile") or {},
+            "emotional_summary": summary,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _memory_hit(key):
+    hit = _memory.get(key)
+    if hit is not None:
+        _bump("memory_hits")
+        return dict(hit)
+    return None
+
+
+def _fresh_query(user_id, key):
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=TTL_SECONDS)
+    return {"user_id": str(user_id), "context_hash": key, "timestamp": {"$gte": cutoff}}
+
+
+def _db_result(key, doc):
+    if doc is not None:
+        _bump("db_hits")
+        _memory.set(key, doc["result"])
+        return dict(doc["result"])
+    return None
+
+
+def lookup(db, user_id, key):
+    """Fresh cached result or None."""
+    if TTL_SECONDS <= 0:
+        return None
+    hit = _memory_hit(key)
+    if hit is not None:
+        return hit
+    doc = db["decisions"].find_one(_fresh_query(user_id, key), {"result": 1}, sort=[("timestamp", -1)])
+    return _db_result(key, doc)
+
+
+async def lookup_async(adb, user_id, key):
+    if TTL_SECONDS <= 0:
+        return None
+    hit = _memory_hit(key)
+    if hit is not None:
+        return hit
+    doc = await adb["decisions"].find_one(_fresh_query(user_id, key), {"result": 1}, sort=[("timestamp", -1)])
+    return _db_result(key, doc)
+
+
+def store(key, result):
+    if TTL_SECONDS > 0:
+        _memory.set(key, dict(result))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def coalesce(key, fn):
+    """
+    Run fn() once per key at a time. Concurrent callers with the same key
+    block until the leader finishes and share its result (or exception).
+    Returns (result, was_leader).
+    """
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+            _counts["misses"] += 1
+        else:
+            _counts["coalesced"] += 1
+
+    if not leader:
+        if not call.done.wait(WAIT_TIMEOUT):
+            raise TimeoutError("Timed out waiting for in-flight decision")
+        if call.error is not None:
+            raise call.error
+        return call.result, False
+
+    try:
+        # A previous leader may have finished between our lookup and here.
+        recent = _memory.get(key) if TTL_SECONDS > 0 else None
+        if recent is not None:
+            call.result = dict(recent)
+            return call.result, False
+        call.result = fn()
+        return call.result, True
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+async def coalesce_async(key, fn):
+    """coalesce() for coroutines: `fn` is an async callable."""
+    call = _inflight_async.get(key)
+    if call is not None:
+        _bump("coalesced")
+        result = await asyncio.wait_for(asyncio.shield(call), WAIT_TIMEOUT)
+        return result, False
+
+    _bump("misses")
+    call = _inflight_async[key] = asyncio.get_running_loop().create_future()
+    try:
+        recent = _memory.get(key) if TTL_SECONDS > 0 else None
+        result, leader = (dict(recent), False) if recent is not None else (await fn(), True)
+        call.set_result(result)
+        return result, leader
+    except asyncio.CancelledError:
+        call.set_exception(TimeoutError("In-flight decision was cancelled"))
+        call.exception()
+        raise
+    except Exception as e:
+        call.set_exception(e)
+        call.exception()  # retrieved here so an unwaited failure isn't logged
+        raise
+    finally:
+        _inflight_async.pop(key, None)
+
+
+def stats():
+    with _lock:
+        counts = dict(_counts)
+        inflight = len(_inflight) + len(_inflight_async)
+    lookups = counts["memory_hits"] + counts["db_hits"] + counts["misses"] + counts["coalesced"]
+    saved = counts["memory_hits"] + counts["db_hits"] + counts["coalesced"]
+    return {
+        **counts,
+        "inflight": inflight,
+        "hit_rate": round(saved / lookups, 4) if lookups else None,
+        "ttl_seconds": TTL_SECONDS,
+    }
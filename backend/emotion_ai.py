@@ -0,0 +1,301 @@
+"""
+AI interpretation of logged emotions.
+
+`interpret` makes the model call synchronously through the shared
+llm_client.LLMClient. `enricher` runs the same
+call on a bounded background pool so POST /api/emotions can insert the
+record with ai_status "pending", answer 202, and fill in `ai` later.
+
+`interpret_async`, `apply_interpretation_async` and AsyncEnricher are
+the asyncio versions used by asgi.py (AsyncLLMClient, AsyncMongoClient).
+
+Records left pending by a lost worker (e.g. a restart) are re-queued by
+`sweeper`, which each process runs at startup and then every
+EMOTION_AI_SWEEP_SECONDS (default 60; 0 disables), so the status poll
+GET /api/emotions/<id>/ai stays a plain read.
+
+ai_status values:
+    pending   inserted, interpretation not written yet (`ai` is {})
+    done      `ai` holds the model's scores
+    fallback  the model call failed; `ai` holds FALLBACK
+"""
+import asyncio
+import datetime
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import data_version
+import emotion_rollup
+import llm_cache
+import metrics
+
+MODEL = "llama-3.3-70b-versatile"
+STALE_AFTER = datetime.timedelta(minutes=2)
+SWEEP_INTERVAL = float(os.getenv("EMOTION_AI_SWEEP_SECONDS", "60"))
+SWEEP_BATCH = 100
+
+FALLBACK = {
+    "focus_score": 50,
+    "stress_score": 50,
+    "motivation_score": 50,
+    "cognitive_state": "neutral",
+    "interpretation": "AI failed to interpret emotion, fallback values used.",
+    "recommendation": "Try logging again in a moment."
+}
+
+
+def build_prompt(emotion, intensity):
+    return f"""
+    You are an Emotional Cognitive Twin Engine analyzing the user's emotional state.
+
+    Emotion Logged: {emotion}
+    Intensity: {intensity}
+
+    Output STRICT JSON:
+
+    {{
+      "focus_score": number (0-100),
+      "stress_score": number (0-100),
+      "motivation_score": number (0-100),
+      "cognitive_state": "string",
+      "interpretation": "short explanation",
+      "recommendation": "one actionable suggestion"
+    }}
+    """
+
+
+def interpret(db, client, emotion, intensity, lookup=True):
+    """
+    Returns (ai_data, ai_status). Served from llm_cache when possible;
+    misses prompt with the bucketed intensity so the stored answer is
+    valid for the whole bucket. Pass lookup=False when the caller has
+    already missed the cache.
+    """
+    cached = llm_cache.lookup(db, emotion, intensity) if lookup else None
+    if cached is not None:
+        return cached, "done"
+
+    try:
+        ai_data = _parse(client.chat("emotion", **_request(emotion, intensity)))
+    except Exception as e:
+        print("AI Emotion Error:", e)
+        metrics.fallback("emotion", e)
+        return dict(FALLBACK), "fallback"
+
+    try:
+        llm_cache.store(db, emotion, intensity, ai_data)
+    except Exception as e:
+        print("LLM Cache Error:", e)
+    return ai_data, "done"
+
+
+def _request(emotion, intensity):
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": build_prompt(emotion, llm_cache.bucket_intensity(intensity))}],
+        "temperature": 0.3,
+    }
+
+
+def _parse(completion):
+    raw = completion.choices[0].message.content
+    cleaned = raw.replace("```json", "").replace("```", "").strip()
+    return json.loads(cleaned)
+
+
+def _interpretation_update(ai_data, ai_status):
+    return {"$set": {"ai": ai_data, "ai_status": ai_status,
+                     "ai_completed_at": datetime.datetime.utcnow()}}
+
+
+def apply_interpretation(db, emotion_doc, ai_data, ai_status):
+    """Store a late interpretation and fold its scores into the rollup."""
+    result = db["emotions"].update_one(
+        {"_id": emotion_doc["_id"], "ai_status": "pending"},
+        _interpretation_update(ai_data, ai_status)
+    )
+    if result.modified_count:
+        emotion_rollup.record_scores(db, emotion_doc["user_id"], emotion_doc["_id"], ai_data)
+        data_version.bump(db, emotion_doc["user_id"])
+
+
+async def interpret_async(adb, client, emotion, intensity, lookup=True):
+    """interpret() on an AsyncMongoClient database with an AsyncLLMClient."""
+    cached = await llm_cache.lookup_async(adb, emotion, intensity) if lookup else None
+    if cached is not None:
+        return cached, "done"
+
+    try:
+        ai_data = _parse(await client.chat("emotion", **_request(emotion, intensity)))
+    except Exception as e:
+        print("AI Emotion Error:", e)
+        metrics.fallback("emotion", e)
+        return dict(FALLBACK), "fallback"
+
+    try:
+        await llm_cache.store_async(adb, emotion, intensity, ai_data)
+    except Exception as e:
+        print("LLM Cache Error:", e)
+    return ai_data, "done"
+
+
+async def apply_interpretation_async(adb, emotion_doc, ai_data, ai_status):
+    result = await adb["emotions"].update_one(
+        {"_id": emotion_doc["_id"], "ai_status": "pending"},
+        _interpretation_update(ai_data, ai_status)
+    )
+    if result.modified_count:
+        await emotion_rollup.record_scores_async(adb, emotion_doc["user_id"], emotion_doc["_id"], ai_data)
+        await data_version.bump_async(adb, emotion_doc["user_id"])
+
+
+class Enricher:
+    """Bounded background pool; `submit` refuses work once `max_pending` is reached."""
+
+    def __init__(self, max_workers, max_pending):
+        self.max_pending = max_pending
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._max_workers = max_workers
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="emotion-ai"
+                )
+            return self._pool
+
+    def run(self, db, client, emotion_doc):
+        # add_emotion only queues records that already missed the cache
+        ai_data, ai_status = interpret(
+            db, client, emotion_doc["emotion"], emotion_doc["intensity"], lookup=False
+        )
+        apply_interpretation(db, emotion_doc, ai_data, ai_status)
+
+    def submit(self, db, client, emotion_doc):
+        """Queue enrichment; False means the pool is saturated and the caller should run it inline."""
+        if not self._slots.acquire(blocking=False):
+            return False
+
+        def task():
+            try:
+                self.run(db, client, emotion_doc)
+            except Exception as e:
+                print("AI Enrichment Error:", e)
+            finally:
+                self._slots.release()
+
+        self._executor().submit(task)
+        return True
+
+    def shutdown(self, wait=True):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+
+
+class AsyncEnricher:
+    """Enricher for the event loop: tasks instead of pool threads, same `max_pending` bound."""
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self._tasks = set()
+
+    async def run(self, adb, client, emotion_doc):
+        try:
+            ai_data, ai_status = await interpret_async(
+                adb, client, emotion_doc["emotion"], emotion_doc["intensity"], lookup=False
+            )
+            await apply_interpretation_async(adb, emotion_doc, ai_data, ai_status)
+        except Exception as e:
+            print("AI Enrichment Error:", e)
+
+    def submit(self, adb, client, emotion_doc):
+        """Schedule enrichment; False means max_pending is reached and the caller should run it inline."""
+        if len(self._tasks) >= self.max_pending:
+            return False
+        task = asyncio.get_running_loop().create_task(self.run(adb, client, emotion_doc))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def drain(self, timeout=None):
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+
+enricher = Enricher(
+    max_workers=int(os.getenv("EMOTION_AI_WORKERS", "4")),
+    max_pending=int(os.getenv("EMOTION_AI_MAX_PENDING", "200")),
+)
+
+
+def requeue_stale(db, client, now=None, limit=SWEEP_BATCH):
+    """
+    Re-submit pending records whose worker was lost; returns how many were queued.
+    The conditional update makes sure only one process re-queues each record;
+    one claimed while the pool is full is picked up again after STALE_AFTER.
+    """
+    now = now or datetime.datetime.utcnow()
+    stale = db["emotions"].find(
+        {"ai_status": "pending", "ai_requested_at": {"$lt": now - STALE_AFTER}},
+        {"user_id": 1, "emotion": 1, "intensity": 1, "ai_requested_at": 1},
+    ).limit(limit)
+
+    queued = 0
+    for doc in stale:
+        result = db["emotions"].update_one(
+            {"_id": doc["_id"], "ai_status": "pending", "ai_requested_at": doc["ai_requested_at"]},
+            {"$set": {"ai_requested_at": now}}
+        )
+        if not result.modified_count:
+            continue
+        if not enricher.submit(db, client, doc):
+            break
+        queued += 1
+    return queued
+
+
+class Sweeper:
+    """Runs requeue_stale now and every `interval` seconds on a daemon thread (one per process)."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, db, client):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(db, client, self._stop), name="emotion-ai-sweep", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, db, client, stop):
+        while not stop.is_set():
+            try:
+                queued = requeue_stale(db, client)
+                if queued:
+                    print(f"✅ Re-queued {queued} stale emotion interpretations")
+            except Exception as e:
+                print("AI Sweep Error:", e)
+            stop.wait(self.interval)
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            self._thread = None
+
+
+sweeper = Sweeper(SWEEP_INTERVAL)
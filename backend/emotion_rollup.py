@@ -0,0 +1,400 @@
+"""
+Per-user emotion rollup.
+
+One document per user in the `emotion_rollups` collection keeps the newest
+entries in a capped ring plus running aggregates for the 5/10/15/20-entry
+windows, so readers no longer re-scan `emotions` and redo Counter/mean.
+
+Layout:
+    {
+      "_id": "<user_id>",
+      "version": int,
+      "recent": [ {id, emotion, intensity, focus, stress, motivation, timestamp}, ... ],   # newest first
+      "windows": {
+        "5": {"count", "emotions": {<label>: n}, "intensity_sum",
+              "focus_sum", "focus_n", "stress_sum", "stress_n",
+              "motivation_sum", "motivation_n"},
+        "10": {...}, "15": {...}, "20": {...}
+      },
+      "updated_at": datetime
+    }
+
+Writes are compare-and-swap on `version`, so concurrent inserts for the
+same user never double-count or drop an eviction. An entry lands in the
+ring at its (timestamp, id) position, and one already there is skipped,
+so inserts recorded out of order or after a seed from history that
+already read them still leave every window exact.
+
+Records whose AI interpretation is still pending enter the ring with
+null scores: they count toward emotion/intensity aggregates but not the
+score averages until `record_scores` folds the scores in.
+
+The `*_async` twins run the same CAS updates on an AsyncMongoClient
+database (asgi.py).
+"""
+import datetime
+
+from pymongo.errors import DuplicateKeyError
+
+WINDOWS = (5, 10, 15, 20)
+RING_SIZE = max(WINDOWS)
+SCORE_FIELDS = ("focus", "stress", "motivation")
+MAX_RETRIES = 5
+
+
+def rollups_col(db):
+    return db["emotion_rollups"]
+
+
+def _num(value):
+    """Numeric value or None (AI scores may be missing or malformed)."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _label_key(label):
+    """Mongo field names can't contain '.' or start with '$'."""
+    key = str(label).replace(".", "．")
+    if key.startswith("$"):
+        key = "＄" + key[1:]
+    return key
+
+
+def entry_from_emotion(doc):
+    """Compact ring entry from an `emotions` document."""
+    ai = doc.get("ai") or {}
+    if not isinstance(ai, dict):
+        ai = {}
+    return {
+        "id": str(doc["_id"]) if doc.get("_id") is not None else None,
+        "emotion": doc.get("emotion"),
+        "intensity": _num(doc.get("intensity", 50)),
+        "focus": _num(ai.get("focus_score")),
+        "stress": _num(ai.get("stress_score")),
+        "motivation": _num(ai.get("motivation_score")),
+        "timestamp": doc.get("timestamp"),
+    }
+
+
+def _empty_window():
+    window = {"count": 0, "emotions": {}, "intensity_sum": 0}
+    for field in SCORE_FIELDS:
+        window[f"{field}_sum"] = 0
+        window[f"{field}_n"] = 0
+    return window
+
+
+def _add_to_deltas(deltas, w, entry, sign):
+    prefix = f"windows.{w}."
+    deltas[prefix + "count"] = deltas.get(prefix + "count", 0) + sign
+    if entry.get("emotion"):
+        path = prefix + "emotions." + _label_key(entry["emotion"])
+        deltas[path] = deltas.get(path, 0) + sign
+    if entry.get("intensity") is not None:
+        deltas[prefix + "intensity_sum"] = deltas.get(prefix + "intensity_sum", 0) + sign * entry["intensity"]
+    for field in SCORE_FIELDS:
+        if entry.get(field) is not None:
+            deltas[f"{prefix}{field}_sum"] = deltas.get(f"{prefix}{field}_sum", 0) + sign * entry[field]
+            deltas[f"{prefix}{field}_n"] = deltas.get(f"{prefix}{field}_n", 0) + sign
+
+
+def build_rollup(user_id, entries):
+    """Fresh rollup document from ring entries (newest first)."""
+    ring = list(entries)[:RING_SIZE]
+    windows = {}
+    for w in WINDOWS:
+        window = _empty_window()
+        for entry in ring[:w]:
+            window["count"] += 1
+            if entry.get("emotion"):
+                key = _label_key(entry["emotion"])
+                window["emotions"][key] = window["emotions"].get(key, 0) + 1
+            if entry.get("intensity") is not None:
+                window["intensity_sum"] += entry["intensity"]
+            for field in SCORE_FIELDS:
+                if entry.get(field) is not None:
+                    window[f"{field}_sum"] += entry[field]
+                    window[f"{field}_n"] += 1
+        windows[str(w)] = window
+
+    return {
+        "_id": str(user_id),
+        "version": 1,
+        "recent": ring,
+        "windows": windows,
+        "updated_at": datetime.datetime.utcnow(),
+    }
+
+
+def _recent_cursor(db, user_id):
+    return (
+        db["emotions"].find({"user_id": str(user_id)})
+        .sort("timestamp", -1)
+        .limit(RING_SIZE)
+    )
+
+
+def rebuild(db, user_id):
+    """Recompute a user's rollup from the `emotions` collection and store it."""
+    doc = build_rollup(user_id, [entry_from_emotion(e) for e in _recent_cursor(db, user_id)])
+    rollups_col(db).replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    return doc
+
+
+def get_rollup(db, user_id):
+    """Single-document read; backfills users who predate the rollup."""
+    doc = rollups_col(db).find_one({"_id": str(user_id)})
+    if doc is None:
+        doc = rebuild(db, user_id)
+    return doc
+
+
+def _order_key(entry):
+    """(timestamp, id) newest-last ordering; Mongo stores datetimes at millisecond precision."""
+    ts = entry.get("timestamp") or datetime.datetime.min
+    return ts.replace(microsecond=ts.microsecond // 1000 * 1000), entry.get("id") or ""
+
+
+def _emotion_update(current, entry):
+    """
+    CAS update that inserts `entry` into `current`'s ring and windows at
+    its place by (timestamp, id), or None when there is nothing to do:
+    the entry is already in the ring (a concurrent seed or rebuild read
+    it from history) or is older than everything the ring keeps.
+    """
+    ring = current.get("recent", [])
+    if entry.get("id") is not None and any(e.get("id") == entry["id"] for e in ring):
+        return None
+    key = _order_key(entry)
+    pos = next((i for i, e in enumerate(ring) if _order_key(e) < key), len(ring))
+    if pos >= RING_SIZE:
+        return None
+
+    deltas = {}
+    for w in WINDOWS:
+        if pos >= w:
+            continue  # lands past this window: it neither enters nor pushes anything out
+        _add_to_deltas(deltas, w, entry, 1)
+        if len(ring) >= w:
+            _add_to_deltas(deltas, w, ring[w - 1], -1)
+
+    inc = {}
+    unset = {}
+    for path, delta in deltas.items():
+        if ".emotions." in path:
+            w, _, key = path[len("windows."):].split(".", 2)
+            existing = current["windows"].get(w, {}).get("emotions", {}).get(key, 0)
+            if existing + delta <= 0:
+                unset[path] = ""
+                continue
+        if delta:
+            inc[path] = delta
+    inc["version"] = 1
+
+    update = {
+        "$inc": inc,
+        "$push": {"recent": {"$each": [entry], "$position": pos, "$slice": RING_SIZE}},
+        "$set": {"updated_at": datetime.datetime.utcnow()},
+    }
+    if unset:
+        update["$unset"] = unset
+    return update
+
+
+def _scores(ai):
+    ai = ai if isinstance(ai, dict) else {}
+    return {
+        "focus": _num(ai.get("focus_score")),
+        "stress": _num(ai.get("stress_score")),
+        "motivation": _num(ai.get("motivation_score")),
+    }
+
+
+def _scores_update(current, emotion_id, scores):
+    """CAS update folding `scores` into the entry, or None if there is nothing to do."""
+    ring = current.get("recent", [])
+    pos = next((i for i, e in enumerate(ring) if e.get("id") == emotion_id), None)
+    if pos is None:
+        return None
+
+    inc = {}
+    sets = {}
+    for field, value in scores.items():
+        if value is None or ring[pos].get(field) is not None:
+            continue
+        sets[f"recent.{pos}.{field}"] = value
+        for w in WINDOWS:
+            if pos < w:
+                inc[f"windows.{w}.{field}_sum"] = value
+                inc[f"windows.{w}.{field}_n"] = 1
+    if not sets:
+        return None
+    inc["version"] = 1
+    sets["updated_at"] = datetime.datetime.utcnow()
+    return {"$inc": inc, "$set": sets}
+
+
+def record_emotion(db, user_id, emotion_doc):
+    """
+    Fold a newly inserted emotion into the user's rollup.
+
+    Call after the `emotions` insert. Entries that fall off the end of a
+    window are subtracted in the same update, so every window stays exact.
+    """
+    user_id = str(user_id)
+    entry = entry_from_emotion(emotion_doc)
+    col = rollups_col(db)
+
+    for _ in range(MAX_RETRIES):
+        current = col.find_one({"_id": user_id})
+        if current is None:
+            # First rollup for this user: seed it from history, which
+            # already contains the emotion we were asked to record (and
+            # maybe concurrent ones, which _emotion_update then skips).
+            try:
+                col.insert_one(build_rollup(user_id, [entry_from_emotion(e) for e in _recent_cursor(db, user_id)]))
+                return
+            except DuplicateKeyError:
+                continue
+
+        update = _emotion_update(current, entry)
+        if update is None:
+            return
+        result = col.update_one({"_id": user_id, "version": current.get("version", 0)}, update)
+        if result.modified_count:
+            return
+
+    # Lost the race too many times; fall back to an authoritative rebuild.
+    rebuild(db, user_id)
+
+
+def record_scores(db, user_id, emotion_id, ai):
+    """
+    Fold AI scores that arrived after insert into every window still
+    holding that entry. No-op once the entry has left the ring.
+    """
+    user_id = str(user_id)
+    emotion_id = str(emotion_id)
+    scores = _scores(ai)
+    col = rollups_col(db)
+
+    for _ in range(MAX_RETRIES):
+        current = col.find_one({"_id": user_id})
+        if current is None:
+            return  # next get_rollup rebuilds from emotions, scores included
+
+        update = _scores_update(current, emotion_id, scores)
+        if update is None:
+            return
+        result = col.update_one({"_id": user_id, "version": current.get("version", 0)}, update)
+        if result.modified_count:
+            return
+
+    rebuild(db, user_id)
+
+
+# ---------------------------
+# asyncio twins (AsyncMongoClient database), used by asgi.py
+# ---------------------------
+async def rebuild_async(adb, user_id):
+    entries = [entry_from_emotion(e) async for e in _recent_cursor(adb, user_id)]
+    doc = build_rollup(user_id, entries)
+    await rollups_col(adb).replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    return doc
+
+
+async def get_rollup_async(adb, user_id):
+    doc = await rollups_col(adb).find_one({"_id": str(user_id)})
+    if doc is None:
+        doc = await rebuild_async(adb, user_id)
+    return doc
+
+
+async def record_emotion_async(adb, user_id, emotion_doc):
+    user_id = str(user_id)
+    entry = entry_from_emotion(emotion_doc)
+    col = rollups_col(adb)
+
+    for _ in range(MAX_RETRIES):
+        current = await col.find_one({"_id": user_id})
+        if current is None:
+            entries = [entry_from_emotion(e) async for e in _recent_cursor(adb, user_id)]
+            try:
+                await col.insert_one(build_rollup(user_id, entries))
+                return
+            except DuplicateKeyError:
+                continue
+
+        update = _emotion_update(current, entry)
+        if update is None:
+            return
+        result = await col.update_one({"_id": user_id, "version": current.get("version", 0)}, update)
+        if result.modified_count:
+            return
+
+    await rebuild_async(adb, user_id)
+
+
+async def record_scores_async(adb, user_id, emotion_id, ai):
+    user_id = str(user_id)
+    emotion_id = str(emotion_id)
+    scores = _scores(ai)
+    col = rollups_col(adb)
+
+    for _ in range(MAX_RETRIES):
+        current = await col.find_one({"_id": user_id})
+        if current is None:
+            return
+
+        update = _scores_update(current, emotion_id, scores)
+        if update is None:
+            return
+        result = await col.update_one({"_id": user_id, "version": current.get("version", 0)}, update)
+        if result.modified_count:
+            return
+
+    await rebuild_async(adb, user_id)
+
+
+def window_stats(rollup, n):
+    """
+    Aggregates for the newest `n` entries (n must be one of WINDOWS).
+
+    Averages are None when there is nothing to average; callers apply
+    their own defaults and rounding.
+    """
+    window = (rollup or {}).get("windows", {}).get(str(n)) or _empty_window()
+    count = window.get("count", 0)
+    counts = window.get("emotions", {})
+
+    # Counter.most_common breaks ties by first occurrence in the
+    # newest-first list; walk the ring so ties resolve the same way.
+    dominant = None
+    best = 0
+    for entry in (rollup or {}).get("recent", [])[:n]:
+        label = entry.get("emotion")
+        if not label:
+            continue
+        c = counts.get(_label_key(label), 0)
+        if c > best:
+            dominant, best = label, c
+
+    def avg(total, k):
+        return total / k if k else None
+
+    return {
+        "count": count,
+        "dominant_emotion": dominant,
+        "emotion_counts": {k: v for k, v in counts.items() if v > 0},
+        "variety": sum(1 for v in counts.values() if v > 0),
+        "avg_intensity": avg(window.get("intensity_sum", 0), count),
+        "focus_avg": avg(window.get("focus_sum", 0), window.get("focus_n", 0)),
+        "stress_avg": avg(window.get("stress_sum", 0), window.get("stress_n", 0)),
+        "motivation_avg": avg(window.get("motivation_sum", 0), window.get("motivation_n", 0)),
+    }
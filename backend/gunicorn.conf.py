@@ -0,0 +1,90 @@
+"""
+Production serving profile (replaces `python app.py`, the dev server).
+
+    gunicorn -c gunicorn.conf.py                  # from backend/
+    kill -HUP <master pid>                        # graceful reload
+    kill -TERM <master pid>                       # graceful stop
+
+Preforked gthread workers, each building its own app with
+app.create_app() after the fork, so every worker gets its own Mongo
+client (mongo.py) and LLM pools.
+
+Sizing, all overridable from the environment:
+
+    WEB_CONCURRENCY      worker processes; default 2 * CPUs + 1
+    WEB_THREADS          threads per worker; default enough threads across
+                         all workers for LLM_CONCURRENCY requests blocked on
+                         the model at once, and never fewer than 4
+    LLM_CONCURRENCY      expected simultaneous LLM-waiting requests (64)
+    PORT                 listen port (5000, what the frontend expects)
+
+Reload and shutdown are graceful: on HUP or TERM a worker stops
+accepting, finishes its in-flight requests within GRACEFUL_TIMEOUT
+(default: one full LLM deadline with retries, plus margin), then
+app.shutdown() waits for background AI enrichment and the LLM pool and
+closes the worker's Mongo client.
+
+Workers share their /metrics through METRICS_DIR (metrics.py), a fresh
+directory per master unless set in the environment.
+"""
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+cpus = multiprocessing.cpu_count()
+llm_concurrency = int(os.getenv("LLM_CONCURRENCY", "64"))
+llm_deadline = float(os.getenv("LLM_DEADLINE", "20"))
+llm_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+wsgi_app = "app:create_app()"
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(2 * cpus + 1)))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", str(max(4, math.ceil(llm_concurrency / workers)))))
+
+# the app is imported by each worker after fork, never by the master: no
+# Mongo sockets, monitor threads or executor threads cross the fork
+preload_app = False
+
+# a request may legitimately wait out a whole LLM deadline (with retries)
+timeout = int(os.getenv("WEB_TIMEOUT", str(math.ceil(llm_deadline * (llm_retries + 1)) + 10)))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", str(timeout)))
+keepalive = 5
+
+# recycle workers now and then, staggered so they don't restart together
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+
+# set before the workers fork so they all inherit it
+own_metrics_dir = "METRICS_DIR" not in os.environ
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"neurolink-metrics-{os.getpid()}"))
+
+
+def post_fork(server, worker):
+    server.log.info("worker %s: %d threads", worker.pid, threads)
+
+
+def worker_exit(server, worker):
+    # in-flight requests are done; drain background LLM work before exiting
+    import app
+
+    app.shutdown(wait=True)
+
+
+def child_exit(server, worker):
+    # a dead worker's counters and gauges must leave the merged /metrics
+    try:
+        os.remove(os.path.join(os.environ["METRICS_DIR"], f"{worker.pid}.json"))
+    except FileNotFoundError:
+        pass
+
+
+def on_exit(server):
+    if own_metrics_dir:
+        shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
@@ -0,0 +1,191 @@
+"""
+Index management for NeuroLink collections.
+
+Declares every index the API's query shapes rely on and creates them
+idempotently (create_indexes is a no-op for indexes that already exist).
+A TTL index whose declared expireAfterSeconds differs from the one in the
+database (e.g. LLM_CACHE_TTL changed) is updated in place with collMod
+first, since create_indexes would fail on it with IndexOptionsConflict.
+Runs at app startup, or from the command line:
+
+    python indexes.py            # create / verify indexes exist
+    python indexes.py --check    # also explain() every query shape, fail on COLLSCAN
+"""
+import datetime
+import os
+import sys
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+import course_items
+import llm_cache
+
+DB_NAME = "nuerolink_db"
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    # _id is the keyset-pagination tiebreaker; the prefix still serves
+    # plain (user_id, timestamp desc) reads.
+    "emotions": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                   name="user_id_timestamp_id"),
+        # emotion_ai's stale-pending sweep; only pending records are indexed
+        IndexModel([("ai_requested_at", ASCENDING)], name="pending_ai_requested_at",
+                   partialFilterExpression={"ai_status": "pending"}),
+    ],
+    "decisions": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                   name="user_id_timestamp_id"),
+        IndexModel([("user_id", ASCENDING), ("context_hash", ASCENDING), ("timestamp", DESCENDING)],
+                   name="user_id_context_hash_timestamp"),
+    ],
+    # one per list sort; the (user_id, created_at) prefix serves plain user_id reads
+    "courses": [
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+                   name="user_id_created_at_id"),
+        IndexModel([("user_id", ASCENDING), ("progress_percent", ASCENDING), ("_id", ASCENDING)],
+                   name="user_id_progress_id"),
+        IndexModel([("user_id", ASCENDING), ("learning_load", ASCENDING), ("_id", ASCENDING)],
+                   name="user_id_learning_load_id"),
+    ],
+    "course_items": course_items.INDEXES,
+    "llm_cache": llm_cache.INDEXES,
+}
+
+# (collection, filter, sort, limit) for every query the handlers issue.
+# Lookups by _id are served by the built-in _id index and are not listed.
+_PROBE_ID = "000000000000000000000000"
+_PAGE_SORT = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+_PAGE_AFTER = {
+    "user_id": _PROBE_ID,
+    "$or": [
+        {"timestamp": {"$lt": datetime.datetime(2000, 1, 1)}},
+        {"timestamp": datetime.datetime(2000, 1, 1), "_id": {"$lt": ObjectId(_PROBE_ID)}},
+    ],
+}
+QUERY_SHAPES = [
+    ("users", {"email": "probe@example.com"}, None, 1),
+    ("emotions", {"user_id": _PROBE_ID}, [("timestamp", DESCENDING)], 20),
+    ("emotions", {"user_id": _PROBE_ID}, _PAGE_SORT, 101),
+    ("emotions", _PAGE_AFTER, _PAGE_SORT, 101),
+    ("emotions", {"ai_status": "pending", "ai_requested_at": {"$lt": datetime.datetime(2000, 1, 1)}}, None, 100),
+    ("decisions", {"user_id": _PROBE_ID}, [("timestamp", DESCENDING)], 10),
+    ("decisions", {"user_id": _PROBE_ID}, _PAGE_SORT, 51),
+    ("decisions", _PAGE_AFTER, _PAGE_SORT, 51),
+    ("decisions", {"user_id": _PROBE_ID, "context_hash": "0" * 64,
+                   "timestamp": {"$gte": datetime.datetime(2000, 1, 1)}}, [("timestamp", DESCENDING)], 1),
+    ("courses", {"user_id": _PROBE_ID}, None, None),
+    ("courses", {"user_id": _PROBE_ID}, [("created_at", ASCENDING), ("_id", ASCENDING)], 101),
+    ("courses", {"user_id": _PROBE_ID}, [("progress_percent", DESCENDING), ("_id", DESCENDING)], 101),
+    ("courses", {"user_id": _PROBE_ID}, [("learning_load", DESCENDING), ("_id", DESCENDING)], 101),
+    ("course_items", {"course_id": _PROBE_ID, "section": "lessons"}, [("position", ASCENDING), ("_id", ASCENDING)], 101),
+    ("course_items", {"course_id": _PROBE_ID, "section": "lessons",
+                      "$or": [{"position": {"$gt": 0}}, {"position": 0, "_id": {"$gt": _PROBE_ID}}]},
+     [("position", ASCENDING), ("_id", ASCENDING)], 101),
+]
+
+
+def _sync_ttls(db, name, models):
+    """collMod existing TTL indexes whose expireAfterSeconds changed; returns their names."""
+    existing = db[name].index_information()
+    changed = []
+    for model in models:
+        spec = model.document
+        ttl = spec.get("expireAfterSeconds")
+        current = existing.get(spec["name"], {})
+        if ttl is None or "expireAfterSeconds" not in current or current["expireAfterSeconds"] == ttl:
+            continue
+        db.command({"collMod": name, "index": {"name": spec["name"], "expireAfterSeconds": ttl}})
+        print(f"✅ {name}.{spec['name']}: expireAfterSeconds {current['expireAfterSeconds']} -> {ttl}")
+        changed.append(spec["name"])
+    return changed
+
+
+def duplicate_emails(db, limit=20):
+    """[(email, users)] for emails held by more than one user; these block email_unique."""
+    pipeline = [
+        {"$group": {"_id": "$email", "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$sort": {"n": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+    return [(doc["_id"], doc["n"]) for doc in db["users"].aggregate(pipeline)]
+
+
+def ensure_indexes(db):
+    """Create all declared indexes; returns {collection: [index names]}."""
+    created = {}
+    for name, models in INDEXES.items():
+        _sync_ttls(db, name, models)
+        try:
+            created[name] = db[name].create_indexes(models)
+        except OperationFailure as e:
+            if name == "users" and e.code == 11000:
+                listed = ", ".join(f"{email!r} ({n} users)" for email, n in duplicate_emails(db))
+                print(f"❌ users.email_unique can't be built until these duplicate emails are merged: {listed}")
+            raise
+    return created
+
+
+def _plan_stages(plan):
+    """Yield every `stage` name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+def check_query_plans(db):
+    """
+    explain() each query shape; returns a list of (description, stages)
+    for shapes whose winning plan contains a COLLSCAN.
+    """
+    failures = []
+    for name, query, sort, limit in QUERY_SHAPES:
+        cursor = db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        winning = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_plan_stages(winning))
+        if "COLLSCAN" in stages:
+            failures.append((f"{name}.find({query}) sort={sort} limit={limit}", stages))
+    return failures
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    argv = sys.argv[1:] if argv is None else argv
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI"))[DB_NAME]
+
+    try:
+        for name, names in ensure_indexes(db).items():
+            print(f"✅ {name}: {', '.join(names)}")
+    except OperationFailure as e:
+        print(f"❌ Index creation failed: {e}")
+        return 1
+
+    if "--check" in argv:
+        failures = check_query_plans(db)
+        for shape, stages in failures:
+            print(f"❌ COLLSCAN: {shape} -> {stages}")
+        if failures:
+            return 1
+        print(f"✅ {len(QUERY_SHAPES)} query shapes use indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Fast JSON provider for Flask.
+
+Installed on the app so `jsonify`, `app.json.dumps` and the streamed
+history responses encode Mongo documents as they come out of pymongo:
+
+    ObjectId          -> "hex string"
+    datetime          -> ISO 8601; naive values are UTC and get "+00:00"
+    date              -> "YYYY-MM-DD"
+    Decimal128        -> string (exact)
+    bson Timestamp    -> ISO 8601 of its time part
+    bytes / Binary    -> base64
+    set / frozenset   -> list
+
+Backed by orjson when it is installed, with the stdlib json module and
+the same type hooks as a fallback.
+"""
+import base64
+import datetime
+import json
+
+from bson import Decimal128, ObjectId, Timestamp
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+MIMETYPE = "application/json"
+
+
+def _utc(value):
+    return value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value
+
+
+def default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        return _utc(obj).isoformat()
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, Decimal128):
+        return str(obj)
+    if isinstance(obj, Timestamp):
+        return _utc(obj.as_datetime()).isoformat()
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode("ascii")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=default, option=_OPTIONS)
+
+    def _loads(s):
+        return orjson.loads(s)
+else:
+    def dumps_bytes(obj):
+        return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def _loads(s):
+        return json.loads(s)
+
+
+class FastJSONProvider(JSONProvider):
+    mimetype = MIMETYPE
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return _loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
@@ -0,0 +1,179 @@
+"""
+Memoized emotion interpretations.
+
+The add_emotion prompt depends only on (emotion label, intensity), so the
+model's answer is cached under the normalized pair:
+
+    label     trimmed, whitespace-collapsed, case-folded
+    intensity rounded to the nearest multiple of EMOTION_AI_BUCKET (default 10)
+
+Lookups go in-process LRU -> `llm_cache` collection (TTL index on
+`created_at`, LLM_CACHE_TTL seconds, default 7 days) -> Groq. Only real
+model answers are stored, never fallback payloads. Changing LLM_CACHE_TTL
+takes effect at the next startup: indexes.ensure_indexes updates the
+existing TTL index with collMod.
+
+Pre-warm the common labels from the command line:
+
+    python llm_cache.py --prewarm
+"""
+import datetime
+import os
+import sys
+import threading
+
+from pymongo import ASCENDING, IndexModel
+
+from ttl_cache import LRUTTLCache
+
+BUCKET_WIDTH = max(1, int(os.getenv("EMOTION_AI_BUCKET", "10")))
+TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "2048"))
+
+# Labels offered by the Emotion Tracker UI, plus frequent free-text ones.
+COMMON_EMOTIONS = ["Joy", "Calm", "Focused", "Love", "Sad", "Neutral", "Stressed", "Anxious", "Tired"]
+
+INDEXES = [
+    IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=TTL_SECONDS),
+]
+
+_memory = LRUTTLCache(MEMORY_SIZE, TTL_SECONDS)
+_lock = threading.Lock()
+_counts = {"memory_hits": 0, "mongo_hits": 0, "misses": 0, "stores": 0}
+
+
+def cache_col(db):
+    return db["llm_cache"]
+
+
+def _bump(name):
+    with _lock:
+        _counts[name] += 1
+
+
+def normalize_label(emotion):
+    return " ".join(str(emotion).split()).casefold()
+
+
+def bucket_intensity(intensity):
+    """Nearest bucket representative, clamped to 0..100."""
+    try:
+        value = float(intensity)
+    except (TypeError, ValueError):
+        value = 50
+    value = max(0.0, min(100.0, value))
+    return int(min(100, round(value / BUCKET_WIDTH) * BUCKET_WIDTH))
+
+
+def cache_key(emotion, intensity):
+    return f"emotion:v1:{normalize_label(emotion)}:{bucket_intensity(intensity)}:{BUCKET_WIDTH}"
+
+
+def _memory_hit(key):
+    hit = _memory.get(key)
+    if hit is not None:
+        _bump("memory_hits")
+        return dict(hit)
+    return None
+
+
+def _mongo_result(key, doc):
+    if doc is not None:
+        _bump("mongo_hits")
+        _memory.set(key, doc["ai"])
+        return dict(doc["ai"])
+    _bump("misses")
+    return None
+
+
+def lookup(db, emotion, intensity):
+    """Cached interpretation or None."""
+    key = cache_key(emotion, intensity)
+    hit = _memory_hit(key)
+    if hit is not None:
+        return hit
+    return _mongo_result(key, cache_col(db).find_one({"_id": key}, {"ai": 1}))
+
+
+async def lookup_async(adb, emotion, intensity):
+    key = cache_key(emotion, intensity)
+    hit = _memory_hit(key)
+    if hit is not None:
+        return hit
+    return _mongo_result(key, await cache_col(adb).find_one({"_id": key}, {"ai": 1}))
+
+
+def _cache_doc(key, emotion, intensity, ai_data):
+    _memory.set(key, dict(ai_data))
+    _bump("stores")
+    return {
+        "_id": key,
+        "emotion": normalize_label(emotion),
+        "intensity_bucket": bucket_intensity(intensity),
+        "ai": ai_data,
+        "created_at": datetime.datetime.utcnow(),
+    }
+
+
+def store(db, emotion, intensity, ai_data):
+    key = cache_key(emotion, intensity)
+    cache_col(db).replace_one({"_id": key}, _cache_doc(key, emotion, intensity, ai_data), upsert=True)
+
+
+async def store_async(adb, emotion, intensity, ai_data):
+    key = cache_key(emotion, intensity)
+    await cache_col(adb).replace_one({"_id": key}, _cache_doc(key, emotion, intensity, ai_data), upsert=True)
+
+
+def prewarm(db, client, labels=None):
+    """Fill the cache for every (label, bucket) not already present; returns the number of model calls."""
+    import emotion_ai
+
+    calls = 0
+    for label in labels or COMMON_EMOTIONS:
+        for intensity in range(0, 101, BUCKET_WIDTH):
+            if lookup(db, label, intensity) is not None:
+                continue
+            emotion_ai.interpret(db, client, label, intensity)
+            calls += 1
+    return calls
+
+
+def stats():
+    with _lock:
+        counts = dict(_counts)
+    lookups = counts["memory_hits"] + counts["mongo_hits"] + counts["misses"]
+    hits = counts["memory_hits"] + counts["mongo_hits"]
+    return {
+        **counts,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "bucket_width": BUCKET_WIDTH,
+        "memory": _memory.stats(),
+    }
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    from groq import Groq
+    from pymongo import MongoClient
+
+    import indexes
+    from llm_client import LLMClient
+
+    argv = sys.argv[1:] if argv is None else argv
+    if "--prewarm" not in argv:
+        print(__doc__)
+        return 0
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI"))[indexes.DB_NAME]
+    cache_col(db).create_indexes(INDEXES)
+    llm = LLMClient(Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0))
+    calls = prewarm(db, llm)
+    print(f"✅ Pre-warmed emotion cache ({calls} model calls)")
+    print(stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
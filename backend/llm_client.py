@@ -0,0 +1,479 @@
+"""
+Shared LLM client used by every Groq call site.
+
+Wraps a Groq (OpenAI-compatible) client with:
+
+- per-call deadlines   LLM_DEADLINE seconds (default 20); each attempt gets
+                       the remaining budget as its socket timeout
+- hedging              if an attempt hasn't answered after LLM_HEDGE_AFTER
+                       seconds (set it to the observed p95; 0 disables) a
+                       second identical request races it, first success wins
+- bounded retries      LLM_MAX_RETRIES (default 2) on timeouts, connection
+                       errors, 429 and 5xx, with full-jitter exponential
+                       backoff, never past the deadline
+- circuit breaker      opens after LLM_BREAKER_THRESHOLD (default 5)
+                       consecutive failed calls (the retryable kinds above;
+                       any other 4xx means the endpoint answered and does
+                       not count against it); while open, calls raise
+                       CircuitOpenError immediately so callers serve their
+                       fallback payloads; after LLM_BREAKER_COOLDOWN seconds
+                       (default 30) one trial call is let through
+
+`stats()` exposes per-site latency histograms, outcome counters and the
+breaker state.
+
+AsyncLLMClient is the same client for asyncio code (asgi.py): it wraps
+groq.AsyncGroq, hedges with tasks instead of pool threads and sleeps
+with asyncio.sleep, so a call waiting on the model holds no thread.
+Pass `breaker=` to share one breaker with the blocking client.
+
+Either client accepts `client_factory=` instead of a ready SDK client;
+the factory runs on first use (or `warm()`), which keeps the groq
+import and client construction off the worker's boot path.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import profiling
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeoutError(LLMError):
+    pass
+
+
+class CircuitOpenError(LLMError):
+    pass
+
+
+def _retryable(error):
+    if isinstance(error, (LLMTimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        # SDK timeout / connection errors carry no status code
+        return type(error).__name__ in ("APITimeoutError", "APIConnectionError")
+    return status == 429 or status >= 500
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def record_error(self, error):
+        """A failed call: only outages count; a rejected request means the endpoint is up."""
+        if _retryable(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "open_for_seconds": round(time.monotonic() - self.opened_at, 1) if self.opened_at else None,
+            }
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def snapshot(self):
+        cumulative = {}
+        running = 0
+        for bound, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += n
+            cumulative[str(bound)] = running
+        return {"count": self.count, "sum": round(self.sum, 4), "buckets": cumulative}
+
+
+class _BaseClient:
+    """Configuration, breaker and per-site stats shared by both clients."""
+
+    def __init__(self, client=None, deadline=None, hedge_after=None, max_retries=None,
+                 breaker_threshold=None, breaker_cooldown=None, breaker=None, client_factory=None):
+        self._sdk_client = client
+        self._client_factory = client_factory
+        self._client_lock = threading.Lock()
+        self.deadline = float(deadline if deadline is not None else os.getenv("LLM_DEADLINE", "20"))
+        self.hedge_after = float(hedge_after if hedge_after is not None else os.getenv("LLM_HEDGE_AFTER", "0"))
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("LLM_MAX_RETRIES", "2"))
+        self.backoff_base = 0.25
+        self.breaker = breaker or CircuitBreaker(
+            int(breaker_threshold if breaker_threshold is not None else os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            float(breaker_cooldown if breaker_cooldown is not None else os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+        )
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    @property
+    def _client(self):
+        if self._sdk_client is None:
+            with self._client_lock:
+                if self._sdk_client is None:
+                    self._sdk_client = self._client_factory()
+        return self._sdk_client
+
+    def warm(self):
+        """Build the SDK client now (warm-up hook) instead of on the first call."""
+        return self._client is not None
+
+    def _backoff(self, attempt, remaining):
+        return min(remaining, random.uniform(0, self.backoff_base * (2 ** attempt)))
+
+    # ---------------------------
+    # bookkeeping
+    # ---------------------------
+    def _count(self, site, name, n=1):
+        with self._lock:
+            counters = self._counters.setdefault(site, {})
+            counters[name] = counters.get(name, 0) + n
+
+    def _observe(self, site, seconds):
+        with self._lock:
+            self._histograms.setdefault(site, LatencyHistogram()).observe(seconds)
+        profiling.record("llm", site, seconds)
+
+    def _usage(self, site, response):
+        """Token counts from a completion, or from the last chunk of a Groq stream (x_groq.usage)."""
+        usage = getattr(response, "usage", None) or getattr(getattr(response, "x_groq", None), "usage", None)
+        if usage is not None:
+            self._count(site, "prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+            self._count(site, "completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+    def stats(self):
+        with self._lock:
+            sites = {
+                site: {
+                    "latency": hist.snapshot(),
+                    **self._counters.get(site, {}),
+                }
+                for site, hist in self._histograms.items()
+            }
+            for site, counters in self._counters.items():
+                sites.setdefault(site, dict(counters))
+        return {
+            "breaker": self.breaker.snapshot(),
+            "config": {
+                "deadline": self.deadline,
+                "hedge_after": self.hedge_after,
+                "max_retries": self.max_retries,
+            },
+            "sites": sites,
+        }
+
+
+class LLMClient(_BaseClient):
+    def __init__(self, client=None, pool_size=None, **kwargs):
+        super().__init__(client, **kwargs)
+        self._pool = ThreadPoolExecutor(
+            max_workers=int(pool_size or os.getenv("LLM_POOL_SIZE", "32")),
+            thread_name_prefix="llm",
+        )
+
+    # ---------------------------
+    # calls
+    # ---------------------------
+    def _attempt(self, kwargs, end):
+        timeout = max(0.1, end - time.monotonic())
+        return self._client.chat.completions.create(timeout=timeout, **kwargs)
+
+    def _hedged(self, site, kwargs, end):
+        first = self._pool.submit(self._attempt, kwargs, end)
+        futures = [first]
+
+        if self.hedge_after > 0 and end - time.monotonic() > self.hedge_after:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                futures.append(self._pool.submit(self._attempt, kwargs, end))
+                self._count(site, "hedged")
+
+        last_error = None
+        while futures:
+            remaining = end - time.monotonic()
+            done, _ = wait(futures, timeout=max(0, remaining), return_when=FIRST_COMPLETED)
+            if not done:
+                raise LLMTimeoutError(f"LLM call exceeded its deadline ({site})")
+            for future in done:
+                futures.remove(future)
+                if future.exception() is None:
+                    if future is not first:
+                        self._count(site, "hedge_wins")
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def chat(self, site, deadline=None, **kwargs):
+        """
+        Blocking chat completion (same kwargs as chat.completions.create).
+        Raises CircuitOpenError without calling out while the breaker is open.
+        """
+        if not self.breaker.allow():
+            self._count(site, "short_circuited")
+            raise CircuitOpenError("LLM circuit open")
+
+        start = time.monotonic()
+        end = start + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            try:
+                result = self._hedged(site, kwargs, end)
+            except Exception as e:
+                remaining = end - time.monotonic()
+                if attempt >= self.max_retries or remaining <= 0 or not _retryable(e):
+                    self.breaker.record_error(e)
+                    self._observe(site, time.monotonic() - start)
+                    self._count(site, "timeouts" if isinstance(e, LLMTimeoutError) else "failures")
+                    raise
+                attempt += 1
+                self._count(site, "retries")
+                time.sleep(self._backoff(attempt, remaining))
+                continue
+
+            self.breaker.record_success()
+            self._observe(site, time.monotonic() - start)
+            self._count(site, "success")
+            self._usage(site, result)
+            return result
+
+    def stream(self, site, deadline=None, **kwargs):
+        """
+        Streaming chat completion; yields chunks. Retries only while
+        opening the stream; the deadline bounds the whole stream.
+        """
+        if not self.breaker.allow():
+            self._count(site, "short_circuited")
+            raise CircuitOpenError("LLM circuit open")
+
+        start = time.monotonic()
+        end = start + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            try:
+                stream = self._attempt(dict(kwargs, stream=True), end)
+                break
+            except Exception as e:
+                remaining = end - time.monotonic()
+                if attempt >= self.max_retries or remaining <= 0 or not _retryable(e):
+                    self.breaker.record_error(e)
+                    self._count(site, "failures")
+                    raise
+                attempt += 1
+                self._count(site, "retries")
+                time.sleep(self._backoff(attempt, remaining))
+
+        chunk = None
+        try:
+            for chunk in stream:
+                if time.monotonic() > end:
+                    raise LLMTimeoutError(f"LLM stream exceeded its deadline ({site})")
+                yield chunk
+        except GeneratorExit:
+            # consumer went away (client disconnect); the endpoint was answering
+            self.breaker.record_success()
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+            raise
+        except Exception as e:
+            self.breaker.record_error(e)
+            self._observe(site, time.monotonic() - start)
+            self._count(site, "timeouts" if isinstance(e, LLMTimeoutError) else "failures")
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+            raise
+
+        self.breaker.record_success()
+        self._observe(site, time.monotonic() - start)
+        self._count(site, "success")
+        self._usage(site, chunk)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+class AsyncLLMClient(_BaseClient):
+    async def _attempt(self, kwargs, end):
+        timeout = max(0.1, end - time.monotonic())
+        return await self._client.chat.completions.create(timeout=timeout, **kwargs)
+
+    async def _hedged(self, site, kwargs, end):
+        first = asyncio.ensure_future(self._attempt(kwargs, end))
+        tasks = {first}
+
+        if self.hedge_after > 0 and end - time.monotonic() > self.hedge_after:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                tasks.add(asyncio.ensure_future(self._attempt(kwargs, end)))
+                self._count(site, "hedged")
+
+        last_error = None
+        try:
+            while tasks:
+                remaining = end - time.monotonic()
+                done, _ = await asyncio.wait(tasks, timeout=max(0, remaining), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise LLMTimeoutError(f"LLM call exceeded its deadline ({site})")
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is not first:
+                            self._count(site, "hedge_wins")
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def chat(self, site, deadline=None, **kwargs):
+        """Awaitable chat completion; same semantics as LLMClient.chat."""
+        if not self.breaker.allow():
+            self._count(site, "short_circuited")
+            raise CircuitOpenError("LLM circuit open")
+
+        start = time.monotonic()
+        end = start + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            try:
+                result = await self._hedged(site, kwargs, end)
+            except Exception as e:
+                remaining = end - time.monotonic()
+                if attempt >= self.max_retries or remaining <= 0 or not _retryable(e):
+                    self.breaker.record_error(e)
+                    self._observe(site, time.monotonic() - start)
+                    self._count(site, "timeouts" if isinstance(e, LLMTimeoutError) else "failures")
+                    raise
+                attempt += 1
+                self._count(site, "retries")
+                await asyncio.sleep(self._backoff(attempt, remaining))
+                continue
+
+            self.breaker.record_success()
+            self._observe(site, time.monotonic() - start)
+            self._count(site, "success")
+            self._usage(site, result)
+            return result
+
+    async def stream(self, site, deadline=None, **kwargs):
+        """Async iterator of chunks; same semantics as LLMClient.stream."""
+        if not self.breaker.allow():
+            self._count(site, "short_circuited")
+            raise CircuitOpenError("LLM circuit open")
+
+        start = time.monotonic()
+        end = start + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            try:
+                stream = await self._attempt(dict(kwargs, stream=True), end)
+                break
+            except Exception as e:
+                remaining = end - time.monotonic()
+                if attempt >= self.max_retries or remaining <= 0 or not _retryable(e):
+                    self.breaker.record_error(e)
+                    self._count(site, "failures")
+                    raise
+                attempt += 1
+                self._count(site, "retries")
+                await asyncio.sleep(self._backoff(attempt, remaining))
+
+        chunk = None
+        try:
+            while True:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeoutError(f"LLM stream exceeded its deadline ({site})")
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise LLMTimeoutError(f"LLM stream exceeded its deadline ({site})")
+                yield chunk
+        except GeneratorExit:
+            # consumer went away (client disconnect); the endpoint was answering
+            self.breaker.record_success()
+            await _aclose(stream)
+            raise
+        except Exception as e:
+            self.breaker.record_error(e)
+            self._observe(site, time.monotonic() - start)
+            self._count(site, "timeouts" if isinstance(e, LLMTimeoutError) else "failures")
+            await _aclose(stream)
+            raise
+
+        self.breaker.record_success()
+        self._observe(site, time.monotonic() - start)
+        self._count(site, "success")
+        self._usage(site, chunk)
+
+
+async def _aclose(stream):
+    close = getattr(stream, "close", None)
+    if close:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
@@ -0,0 +1,416 @@
+"""
+Prometheus-style metrics, served as text at GET /metrics.
+
+    http_requests_total{route,method,status}          counter
+    http_request_seconds{route,method}                histogram (until the response
+                                                      is ready; for SSE, its headers)
+    mongo_command_seconds{command,collection}         histogram, CommandListener
+    mongo_command_failures_total{command,collection}  counter
+    mongo_pool_connections{address}                   gauge, PoolListener
+    mongo_pool_in_use{address}                        gauge
+    mongo_pool_checkout_seconds{address}              histogram
+    mongo_pool_checkout_failures_total{address,reason} counter
+    llm_call_seconds{site}                            histogram  } from the
+    llm_calls_total{site,outcome}                     counter    } LLM clients'
+    llm_tokens_total{site,kind}                       counter    } own stats
+    llm_fallbacks_total{site,reason}                  counter
+
+LLM sites: `emotion` (add_emotion and its background enrichment) and
+`decision` (analyze_decision). A fallback is a request answered without
+a usable model response: the emotion FALLBACK payload, an unparseable
+decision, or a decision request that failed.
+
+`route` is the URL rule (/api/courses/<cid>), never the raw path, so the
+label set stays bounded. Recording is a dict update under a per-metric
+lock; rendering happens only when /metrics is scraped.
+
+Worker processes: when METRICS_DIR is set (gunicorn.conf.py sets it),
+each process writes its snapshot to METRICS_DIR/<pid>.json every
+METRICS_FLUSH seconds (default 5) and just before answering a scrape,
+and /metrics sums the snapshots of the live workers, so any worker can
+answer for all of them (a recycled worker's counters leave the sum,
+which Prometheus treats as a counter reset). Without it, /metrics
+reports this process only. Set METRICS_TOKEN to require
+`Authorization: Bearer <token>` on /metrics.
+"""
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import request
+from pymongo import monitoring
+
+import llm_client
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+METRICS_DIR = os.getenv("METRICS_DIR")
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH", "5"))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            values = {json.dumps(labels): _copy(v) for labels, v in self._values.items()}
+        return {"type": self.kind, "help": self.help, "labelnames": list(self.labelnames), "values": values}
+
+
+def _copy(value):
+    return list(value) if isinstance(value, list) else value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, n=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def add(self, *labels, n=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+
+class Histogram(_Metric):
+    """Values are [count per bucket..., +Inf count, sum]."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, seconds, *labels):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            value = self._values.get(labels)
+            if value is None:
+                value = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            value[i] += 1
+            value[-1] += seconds
+
+    def snapshot(self):
+        snap = super().snapshot()
+        snap["buckets"] = list(self.buckets)
+        return snap
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        """fn() -> {name: snapshot-shaped dict}, evaluated at snapshot time."""
+        self._collectors.append(fn)
+
+    def snapshot(self):
+        families = {m.name: m.snapshot() for m in self._metrics}
+        for collect in self._collectors:
+            try:
+                families = merge([families, collect()])
+            except Exception as e:
+                print(f"❌ Metrics collector failed: {e}")
+        return families
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP responses by route, method and status.", ("route", "method", "status")))
+http_seconds = REGISTRY.register(Histogram(
+    "http_request_seconds", "Time to produce the response.", ("route", "method")))
+mongo_seconds = REGISTRY.register(Histogram(
+    "mongo_command_seconds", "MongoDB command round trips.", ("command", "collection"), MONGO_BUCKETS))
+mongo_failures = REGISTRY.register(Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands.", ("command", "collection")))
+pool_connections = REGISTRY.register(Gauge(
+    "mongo_pool_connections", "Open pooled connections.", ("address",)))
+pool_in_use = REGISTRY.register(Gauge(
+    "mongo_pool_in_use", "Connections checked out.", ("address",)))
+pool_checkout_seconds = REGISTRY.register(Histogram(
+    "mongo_pool_checkout_seconds", "Wait for a pooled connection.", ("address",), MONGO_BUCKETS))
+pool_checkout_failures = REGISTRY.register(Counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed.", ("address", "reason")))
+llm_fallbacks = REGISTRY.register(Counter(
+    "llm_fallbacks_total", "Requests answered without a usable model response.", ("site", "reason")))
+
+
+def fallback(site, error):
+    """Count a request answered without a usable model response; `error` is the exception or a reason."""
+    if isinstance(error, str):
+        reason = error
+    elif isinstance(error, llm_client.CircuitOpenError):
+        reason = "circuit_open"
+    elif isinstance(error, llm_client.LLMTimeoutError):
+        reason = "timeout"
+    else:
+        reason = "error"
+    llm_fallbacks.inc(site, reason)
+
+
+# ---------------------------
+# HTTP requests
+# ---------------------------
+def observe_request(route, method, status, seconds):
+    http_seconds.observe(seconds, route, method)
+    http_requests.inc(route, method, str(status))
+
+
+def init_app(app):
+    """Time every request. Call before registering blueprints so the timer starts first."""
+    # on the environ, not g: /api/batch sub-requests share the outer request's g
+    @app.before_request
+    def _start_timer():
+        request.environ["metrics.started"] = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        started = request.environ.pop("metrics.started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+    if METRICS_DIR:
+        _start_flusher()
+
+
+# ---------------------------
+# pymongo listeners (pass to MongoClient(event_listeners=...))
+# ---------------------------
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}  # request_id -> collection, between started and finished
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if not isinstance(target, str):  # getMore names it separately; admin commands have none
+            target = event.command.get("collection", "")
+        self._collections[event.request_id] = target
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_seconds.observe(event.duration_micros / 1e6, event.command_name, collection)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_seconds.observe(event.duration_micros / 1e6, event.command_name, collection)
+        mongo_failures.inc(event.command_name, collection)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pool_connections.add(_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_connections.add(_address(event), n=-1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pool_checkout_failures.inc(_address(event), str(event.reason))
+
+    def connection_checked_out(self, event):
+        pool_in_use.add(_address(event))
+        duration = getattr(event, "duration", None)  # pymongo >= 4.7
+        if duration is not None:
+            pool_checkout_seconds.observe(duration, _address(event))
+
+    def connection_checked_in(self, event):
+        pool_in_use.add(_address(event), n=-1)
+
+
+def _address(event):
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+def mongo_listeners():
+    return [CommandMetrics(), PoolMetrics()]
+
+
+# ---------------------------
+# LLM clients (llm_client.LLMClient / AsyncLLMClient stats)
+# ---------------------------
+def watch_llm(client):
+    """Export a client's per-site latency, outcomes and token usage."""
+    REGISTRY.add_collector(lambda: _llm_families(client.stats()))
+
+
+_OUTCOMES = ("success", "failures", "timeouts", "retries", "hedged", "hedge_wins", "short_circuited")
+_TOKENS = ("prompt_tokens", "completion_tokens")
+
+
+def _llm_families(stats):
+    seconds = {"type": "histogram", "help": "LLM call latency, retries included.", "labelnames": ["site"],
+               "buckets": None, "values": {}}
+    calls = {"type": "counter", "help": "LLM calls by outcome.", "labelnames": ["site", "outcome"], "values": {}}
+    tokens = {"type": "counter", "help": "LLM tokens used.", "labelnames": ["site", "kind"], "values": {}}
+    for site, s in stats["sites"].items():
+        latency = s.get("latency")
+        if latency:
+            bounds = [b for b in latency["buckets"] if b != "+Inf"]
+            seconds["buckets"] = [float(b) for b in bounds]
+            cumulative = [latency["buckets"][b] for b in bounds + ["+Inf"]]
+            per_bucket = [c - p for c, p in zip(cumulative, [0] + cumulative[:-1])]
+            seconds["values"][json.dumps([site])] = per_bucket + [latency["sum"]]
+        for outcome in _OUTCOMES:
+            if s.get(outcome):
+                calls["values"][json.dumps([site, outcome])] = s[outcome]
+        for kind in _TOKENS:
+            if s.get(kind):
+                tokens["values"][json.dumps([site, kind.replace("_tokens", "")])] = s[kind]
+    families = {"llm_calls_total": calls, "llm_tokens_total": tokens}
+    if seconds["buckets"] is not None:
+        families["llm_call_seconds"] = seconds
+    return families
+
+
+# ---------------------------
+# snapshots: merge across processes, render as text
+# ---------------------------
+def merge(snapshots):
+    out = {}
+    for snap in snapshots:
+        for name, family in snap.items():
+            target = out.get(name)
+            if target is None:
+                out[name] = json.loads(json.dumps(family))
+                continue
+            for key, value in family["values"].items():
+                current = target["values"].get(key)
+                if current is None:
+                    target["values"][key] = _copy(value)
+                elif isinstance(value, list):
+                    target["values"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["values"][key] = current + value
+    return out
+
+
+def _flush():
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    fd, tmp = tempfile.mkstemp(dir=METRICS_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(REGISTRY.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _start_flusher():
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+    def loop():
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            try:
+                _flush()
+            except Exception as e:
+                print(f"❌ Metrics flush failed: {e}")
+
+    threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """All live workers' metrics (METRICS_DIR) or this process's."""
+    if not METRICS_DIR:
+        return REGISTRY.snapshot()
+    _flush()
+    snapshots = []
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        if not _alive(int(name[:-5])):
+            os.remove(path)
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # being replaced right now
+    return merge(snapshots)
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(families):
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        names = family["labelnames"]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for key, value in sorted(family["values"].items()):
+            labels = json.loads(key)
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            running = 0
+            for bound, n in zip(list(family["buckets"]) + ["+Inf"], value[:-1]):
+                running += n
+                le = bound if bound == "+Inf" else _number(float(bound))
+                bucket_labels = _labels(names, labels, f'le="{le}"')
+                lines.append(f"{name}_bucket{bucket_labels} {running}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(float(value[-1]))}")
+            lines.append(f"{name}_count{_labels(names, labels)} {running}")
+    return "\n".join(lines) + "\n"
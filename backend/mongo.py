@@ -0,0 +1,80 @@
+"""
+Process-local MongoDB client.
+
+MongoClient is not fork-safe: its pool sockets and monitor threads must
+not be shared between a parent and its children. The client here is
+created on first use and re-created whenever the current pid differs
+from the one that created it, so a preforked worker (gunicorn.conf.py)
+always talks through its own client, whether or not the app module was
+imported before the fork.
+
+app.py binds `db`, `collection("users")` etc. at import time; they are
+LazyHandle stand-ins that resolve to the current process's objects on
+every use.
+
+    MONGO_URI              connection string
+    MONGO_MAX_POOL_SIZE    per-process pool (default 100); keep it above
+                           the worker's thread count
+"""
+import os
+import threading
+
+from pymongo import MongoClient
+
+import indexes
+import metrics
+import profiling
+
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+
+_client = None
+_pid = None
+_lock = threading.Lock()
+
+
+def client():
+    """This process's MongoClient (created on first use, and again after a fork)."""
+    global _client, _pid
+    if _client is None or _pid != os.getpid():
+        with _lock:
+            if _client is None or _pid != os.getpid():
+                _client = MongoClient(
+                    os.getenv("MONGO_URI"),
+                    maxPoolSize=MAX_POOL_SIZE,
+                    event_listeners=[*metrics.mongo_listeners(), profiling.CommandTimer()],
+                )
+                _pid = os.getpid()
+    return _client
+
+
+def get_db():
+    return client()[indexes.DB_NAME]
+
+
+def close():
+    """Close this process's client (worker shutdown); an inherited one is only dropped."""
+    global _client
+    with _lock:
+        if _client is not None and _pid == os.getpid():
+            _client.close()
+        _client = None
+
+
+class LazyHandle:
+    """Stands in for a Database/Collection; resolves through client() on each use."""
+
+    def __init__(self, resolve):
+        self._resolve = resolve
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+
+db = LazyHandle(get_db)
+
+
+def collection(name):
+    return LazyHandle(lambda: get_db()[name])
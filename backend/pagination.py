@@ -0,0 +1,170 @@
+"""
+Keyset pagination and streamed responses for history endpoints.
+
+Pages are ordered newest first on (timestamp, _id). The cursor is an
+opaque token naming the last row of the previous page; the next page
+starts strictly after it, so pages stay stable while new rows arrive and
+each page is an index range scan rather than a skip.
+
+`sorted_page` does the same for any single sort field (number or
+datetime) in either direction, with `_id` as the tiebreaker. Its cursor
+tags the value's type ("d" datetime, "i" int, "f" float as repr, so
+1e-05 and inf round-trip exactly).
+"""
+import base64
+import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+SORT = [("timestamp", -1), ("_id", -1)]
+STREAM_BATCH_SIZE = 200
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(doc):
+    ts = doc["timestamp"].strftime("%Y-%m-%dT%H:%M:%S.%f")
+    raw = f"{ts}|{doc['_id']}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        ts, oid = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S.%f"), ObjectId(oid)
+    except (ValueError, InvalidId, UnicodeError):
+        raise CursorError("Invalid cursor")
+
+
+def keyset_filter(base, before=None):
+    """`base` filter restricted to rows strictly older than the `before` cursor."""
+    if not before:
+        return dict(base)
+    ts, oid = decode_cursor(before)
+    return {
+        **base,
+        "$or": [
+            {"timestamp": {"$lt": ts}},
+            {"timestamp": ts, "_id": {"$lt": oid}},
+        ],
+    }
+
+
+def encode_sort_cursor(doc, field):
+    value = doc.get(field)
+    if isinstance(value, datetime.datetime):
+        tagged = "d" + value.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    elif isinstance(value, float):
+        tagged = "f" + repr(value)
+    else:
+        tagged = "i" + str(int(value or 0))
+    raw = f"{tagged}|{doc['_id']}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_sort_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        tagged, oid = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|", 1)
+        kind, raw = tagged[0], tagged[1:]
+        if kind == "d":
+            value = datetime.datetime.strptime(raw, "%Y-%m-%dT%H:%M:%S.%f")
+        elif kind == "i":
+            value = int(raw)
+        elif kind == "f":
+            value = float(raw)
+        else:
+            raise ValueError(kind)
+        return value, ObjectId(oid)
+    except (ValueError, IndexError, InvalidId, UnicodeError):
+        raise CursorError("Invalid cursor")
+
+
+def sort_keyset_filter(base, field, direction, after=None):
+    """`base` filter restricted to rows strictly past the `after` cursor in (field, _id) order."""
+    if not after:
+        return dict(base)
+    value, oid = decode_sort_cursor(after)
+    op = "$lt" if direction < 0 else "$gt"
+    return {
+        **base,
+        "$or": [
+            {field: {op: value}},
+            {field: value, "_id": {op: oid}},
+        ],
+    }
+
+
+def sorted_page(collection, base, projection, field, direction, limit, after=None):
+    """One page in (field, _id) order plus the next cursor (None at the end)."""
+    docs = list(
+        collection.find(sort_keyset_filter(base, field, direction, after), projection)
+        .sort([(field, direction), ("_id", direction)])
+        .limit(limit + 1)
+    )
+    next_cursor = encode_sort_cursor(docs[limit - 1], field) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def parse_limit(raw, default, maximum):
+    """Page size from a query-string value; None means no explicit limit."""
+    if raw is None or raw == "":
+        return default
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        raise CursorError("limit must be an integer")
+    if limit < 1:
+        raise CursorError("limit must be positive")
+    return min(limit, maximum)
+
+
+def fetch_page(collection, base, projection, limit, before=None):
+    """
+    One page of documents plus the cursor for the next page (None at the end).
+    Reads limit + 1 rows to know whether another page exists.
+    """
+    docs = list(
+        collection.find(keyset_filter(base, before), projection)
+        .sort(SORT)
+        .limit(limit + 1)
+    )
+    return split_page(docs, limit)
+
+
+def split_page(docs, limit):
+    """(page, next_cursor) from up to limit + 1 newest-first documents."""
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def iter_docs(collection, base, projection, limit=None, before=None):
+    cursor = (
+        collection.find(keyset_filter(base, before), projection)
+        .sort(SORT)
+        .batch_size(STREAM_BATCH_SIZE)
+    )
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+def stream_json_array(docs, serialize, dumps):
+    """Yield a JSON array one element at a time."""
+    yield "["
+    first = True
+    for doc in docs:
+        if not first:
+            yield ","
+        first = False
+        yield dumps(serialize(doc))
+    yield "]"
+
+
+def stream_ndjson(docs, serialize, dumps):
+    for doc in docs:
+        yield dumps(serialize(doc)) + "\n"
@@ -0,0 +1,317 @@
+"""
+On-demand and sampled per-request profiling.
+
+A request is profiled when it carries
+
+    X-Profile: <PROFILE_ADMIN_TOKEN>               or
+    X-Profile: <expires>.<signature>               from `python profiling.py sign --ttl 3600`
+
+(HMAC-SHA256 of the expiry with PROFILE_SECRET), or, with
+PROFILE_SAMPLE=N, when it is one of every N requests. Each header form
+works only when its variable is set; with neither, on-demand profiling
+is off and /api/debug/profiles answers 401.
+
+While the request runs, a helper thread samples the stack of the thread
+serving it every PROFILE_INTERVAL_MS (default 2; in practice bounded by
+the interpreter's 5 ms switch interval when the request is CPU-bound).
+Only that thread is looked at and only for that request, so nothing
+changes for the others. Mongo commands (a CommandListener) and LLM calls
+(llm_client) issued by the thread are timed into a wall-time breakdown:
+
+    mongo     total and per command/collection
+    llm       total and per site
+    app       the rest: Python, serialization, waiting on locks
+
+Profiled on demand, the response gets `Server-Timing` (shown by browser
+dev tools) and `X-Profile-Id`; the profile itself is served by
+GET /api/debug/profiles/<id> (same X-Profile header) as JSON, or with
+?format=collapsed as folded stacks for flamegraph.pl, speedscope or
+inferno. Sampled profiles only go to disk, with no response headers.
+Every profile is written to PROFILE_DIR (default <tmp>/neurolink-profiles,
+the newest PROFILE_KEEP=200 are kept) after the response is sent.
+
+Covers the Flask routes (also under asgi.py); for SSE responses the
+profile ends when the headers are ready.
+"""
+import argparse
+import collections
+import contextvars
+import datetime
+import glob
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from flask import request
+from pymongo import monitoring
+
+from ttl_cache import LRUTTLCache
+
+HEADER = "X-Profile"
+ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+SECRET = os.getenv("PROFILE_SECRET")
+SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE", "0"))
+INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000.0
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "neurolink-profiles")
+KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+SKIP_ROUTES = ("/metrics", "/readyz")
+
+_current = contextvars.ContextVar("profile", default=None)
+_recent = LRUTTLCache(maxsize=50, ttl=3600)
+_sample_counter = itertools.count(1)
+
+
+# ---------------------------
+# who may profile
+# ---------------------------
+def sign(ttl, secret=None, now=None):
+    secret = secret or SECRET
+    if not secret:
+        raise ValueError("PROFILE_SECRET is not set")
+    expires = int((now or time.time()) + ttl)
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def authorized(value):
+    """True for the admin token or an unexpired signed value."""
+    if not value:
+        return False
+    if ADMIN_TOKEN and hmac.compare_digest(value, ADMIN_TOKEN):
+        return True
+    if not SECRET:
+        return False
+    expires, _, signature = value.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(SECRET.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected)
+
+
+# ---------------------------
+# one profile
+# ---------------------------
+class Sampler:
+    """Counts folded stacks of one thread, sampled from a helper thread."""
+
+    def __init__(self, thread_id, interval=INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profile:
+    def __init__(self, on_demand):
+        self.id = uuid.uuid4().hex[:16]
+        self.on_demand = on_demand
+        self.started_at = datetime.datetime.utcnow()
+        self.started = time.perf_counter()
+        self.wall = None
+        self.timings = {"mongo": collections.defaultdict(lambda: [0, 0.0]),
+                        "llm": collections.defaultdict(lambda: [0, 0.0])}
+        self.sampler = Sampler(threading.get_ident())
+        self._mongo_started = {}  # request_id -> "command collection"
+
+    def record(self, kind, label, seconds):
+        entry = self.timings[kind][label]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def finish(self):
+        self.sampler.stop()
+        self.wall = time.perf_counter() - self.started
+
+    def totals(self):
+        return {kind: (sum(n for n, _ in t.values()), sum(s for _, s in t.values())) for kind, t in self.timings.items()}
+
+    def server_timing(self):
+        totals = self.totals()
+        app = max(0.0, self.wall - totals["mongo"][1] - totals["llm"][1])
+        parts = [f'{kind};dur={seconds * 1000:.1f};desc="{calls} calls"' for kind, (calls, seconds) in totals.items()]
+        return ", ".join(parts + [f"app;dur={app * 1000:.1f}", f"total;dur={self.wall * 1000:.1f}"])
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.sampler.stacks.most_common())
+
+    def to_dict(self, method, route, path, status):
+        totals = self.totals()
+        return {
+            "id": self.id,
+            "mode": "on_demand" if self.on_demand else "sampled",
+            "method": method,
+            "route": route,
+            "path": path,
+            "status": status,
+            "started_at": self.started_at.isoformat() + "Z",
+            "wall_ms": round(self.wall * 1000, 2),
+            "breakdown_ms": {
+                "mongo": round(totals["mongo"][1] * 1000, 2),
+                "llm": round(totals["llm"][1] * 1000, 2),
+                "app": round(max(0.0, self.wall - totals["mongo"][1] - totals["llm"][1]) * 1000, 2),
+            },
+            "calls": {
+                kind: {label: {"count": n, "ms": round(s * 1000, 2)}
+                       for label, (n, s) in sorted(t.items(), key=lambda kv: -kv[1][1])}
+                for kind, t in self.timings.items()
+            },
+            "samples": sum(self.sampler.stacks.values()),
+            "interval_ms": self.sampler.interval * 1000,
+            "collapsed": self.collapsed(),
+        }
+
+
+def record(kind, label, seconds):
+    """Attribute a Mongo/LLM call to the profile of the current request, if any."""
+    profile = _current.get()
+    if profile is not None:
+        profile.record(kind, label, seconds)
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Mongo time per command/collection for the profiled request (pass to MongoClient)."""
+
+    def started(self, event):
+        profile = _current.get()
+        if profile is not None:
+            target = event.command.get(event.command_name)
+            if not isinstance(target, str):
+                target = event.command.get("collection", "")
+            profile._mongo_started[event.request_id] = f"{event.command_name} {target}".strip()
+
+    def succeeded(self, event):
+        profile = _current.get()
+        if profile is not None:
+            label = profile._mongo_started.pop(event.request_id, event.command_name)
+            profile.record("mongo", label, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+# ---------------------------
+# storage
+# ---------------------------
+def _save(doc):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = doc["started_at"].replace(":", "").replace("-", "")[:15]
+    base = os.path.join(PROFILE_DIR, f"{stamp}-{doc['id']}")
+    with open(base + ".collapsed", "w") as f:
+        f.write(doc["collapsed"])
+    with open(base + ".json", "w") as f:
+        json.dump(doc, f)
+    for old in sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")))[:-KEEP or None]:
+        for path in (old, old[:-len(".json")] + ".collapsed"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def load(profile_id):
+    """A stored profile by id (this process's recent ones, then PROFILE_DIR), or None."""
+    if not re.fullmatch(r"[0-9a-f]{16}", profile_id or ""):
+        return None
+    doc = _recent.get(profile_id)
+    if doc is not None:
+        return doc
+    for path in glob.glob(os.path.join(PROFILE_DIR, f"*-{profile_id}.json")):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+# ---------------------------
+# Flask hooks
+# ---------------------------
+def init_app(app):
+    @app.before_request
+    def _start_profile():
+        on_demand = HEADER in request.headers and authorized(request.headers[HEADER])
+        sampled = not on_demand and SAMPLE_EVERY > 0 and next(_sample_counter) % SAMPLE_EVERY == 0
+        route = request.url_rule.rule if request.url_rule is not None else None
+        if not (on_demand or sampled) or route in SKIP_ROUTES:
+            return
+        profile = Profile(on_demand)
+        # restored afterwards: a /api/batch sub-request runs inside the outer request
+        request.environ["profiling.outer"] = _current.get()
+        request.environ["profiling.profile"] = profile
+        _current.set(profile)
+        profile.sampler.start()
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = request.environ.pop("profiling.profile", None)
+        if profile is None:
+            return response
+        _current.set(request.environ.pop("profiling.outer", None))
+        profile.finish()
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        doc = profile.to_dict(request.method, route, request.full_path, response.status_code)
+        if profile.on_demand:
+            _recent.set(profile.id, doc)
+            response.headers["Server-Timing"] = profile.server_timing()
+            response.headers["X-Profile-Id"] = profile.id
+            response.headers["Access-Control-Expose-Headers"] = "Server-Timing, X-Profile-Id"
+        response.call_on_close(lambda: _save_quietly(doc))
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request did not run (the response never got built)
+        profile = request.environ.pop("profiling.profile", None)
+        if profile is not None:
+            profile.sampler.stop()
+            _current.set(request.environ.pop("profiling.outer", None))
+
+
+def _save_quietly(doc):
+    try:
+        _save(doc)
+    except Exception as e:
+        print(f"❌ Profile save failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mint an X-Profile header value.")
+    parser.add_argument("command", choices=("sign",))
+    parser.add_argument("--ttl", type=int, default=3600, help="seconds the value stays valid")
+    args = parser.parse_args()
+    if not SECRET:
+        parser.error("set PROFILE_SECRET to the value the server uses")
+    print(f"{HEADER}: {sign(args.ttl)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Startup warm-up and readiness (/readyz).
+
+create_app() returns as soon as the routes are registered; nothing on
+that path talks to MongoDB or Groq. The slow parts run once per process
+on a background thread:
+
+    mongo      server selection (ping) + indexes.ensure_indexes
+    llm        build the Groq client (imports groq/httpx/pydantic);
+               only when LLM_WARMUP=1, otherwise the first LLM call does it
+
+/readyz answers 503 until every check has passed, then 200, so a load
+balancer or orchestrator only routes to a worker that can serve. A
+failed check is retried every WARMUP_RETRY seconds (default 5).
+
+Routes that depend on a check (registration needs the unique
+users.email index from `mongo`) call `warmup.wait(name, WAIT_SECONDS)`
+and answer 503 if it hasn't passed by then (WARMUP_WAIT, default 10).
+
+Timings are measured from the moment this module is first imported
+(the top of app.py):
+
+    startup_seconds   import + create_app(), i.e. until routes exist
+    ready_seconds     until the last check passed
+"""
+import os
+import threading
+import time
+
+IMPORT_STARTED = time.perf_counter()
+RETRY_SECONDS = float(os.getenv("WARMUP_RETRY", "5"))
+WAIT_SECONDS = float(os.getenv("WARMUP_WAIT", "10"))
+
+
+class Warmup:
+    def __init__(self):
+        self._checks = {}
+        self._passed = {}
+        self._lock = threading.Lock()
+        self.startup_seconds = None
+        self.ready_seconds = None
+        self._thread = None
+
+    def mark_started(self):
+        """create_app() is done: the process can accept requests."""
+        self.startup_seconds = time.perf_counter() - IMPORT_STARTED
+        return self.startup_seconds
+
+    def start(self, checks):
+        """Run `checks` ({name: callable}) in order on a daemon thread."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._checks = {name: {"ok": False, "seconds": None, "error": None} for name in checks}
+            self._passed = {name: threading.Event() for name in checks}
+            self._thread = threading.Thread(target=self._run, args=(checks,), name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self, checks):
+        for name, fn in checks.items():
+            while True:
+                started = time.perf_counter()
+                try:
+                    fn()
+                except Exception as e:
+                    with self._lock:
+                        self._checks[name]["error"] = str(e)
+                    print(f"❌ Warm-up {name} failed: {e}")
+                    time.sleep(RETRY_SECONDS)
+                    continue
+                with self._lock:
+                    self._checks[name].update(ok=True, error=None, seconds=round(time.perf_counter() - started, 4))
+                self._passed[name].set()
+                break
+        self.ready_seconds = time.perf_counter() - IMPORT_STARTED
+        print(f"✅ Ready in {self.ready_seconds:.3f}s")
+
+    def wait(self, name, timeout=None):
+        """True once check `name` has passed; False on timeout or if no such check was started."""
+        with self._lock:
+            passed = self._passed.get(name)
+        return passed is not None and passed.wait(timeout)
+
+    def status(self):
+        with self._lock:
+            checks = {name: dict(c) for name, c in self._checks.items()}
+        return {
+            "ready": bool(checks) and all(c["ok"] for c in checks.values()),
+            "checks": checks,
+            "startup_seconds": round(self.startup_seconds, 4) if self.startup_seconds is not None else None,
+            "ready_seconds": round(self.ready_seconds, 4) if self.ready_seconds is not None else None,
+        }
+
+
+warmup = Warmup()
@@ -0,0 +1,141 @@
+"""
+Request-scoped data loader.
+
+One RequestLoader lives on `flask.g` per request (see `loader()`); the
+handlers and helpers in app.py read through it instead of querying
+directly, so a document is fetched at most once per request:
+
+    user                     the user token_required authenticated
+    rollup()                 the emotion rollup (summary, insights,
+                             decision context, course fatigue)
+    emotion_stats(n)         window stats over the newest n emotions
+    signals(window, limit)   analytics.user_signals
+    recent_emotions(n)       newest-first emotions / decisions; a fetch
+    recent_decisions(n)      of N also serves every later request <= N
+    course(cid)              one of the user's courses by id
+    course_engine()          CourseInsightsEngine sharing rollup()
+    data_version()           the user's data version (conditional GETs)
+
+Writes call `wrote(kind, ...)`, which drops the affected entries and
+bumps the user's data version (data_version.py), so a read after a
+write in the same request (e.g. inside /api/batch) sees the write.
+"""
+import copy
+
+from bson import ObjectId
+from flask import g
+
+import analytics
+import data_version
+import emotion_rollup
+import pagination
+from course_insights import CourseInsightsEngine
+
+# the history routes' list projections (GET /api/emotions, /api/decisions),
+# so a loader-served page has the same shape and size as a direct read
+EMOTION_LIST_PROJECTION = {"emotion": 1, "intensity": 1, "timestamp": 1, "ai": 1, "ai_status": 1}
+DECISION_LIST_PROJECTION = {"question": 1, "result": 1, "timestamp": 1}
+
+# memo entries (by key prefix) each kind of write invalidates
+_INVALIDATES = {
+    "user": (),
+    "emotions": ("rollup", "emotion_stats", "signals", "course_engine", "recent_emotions"),
+    "decisions": ("signals", "recent_decisions"),
+    "courses": ("signals", "course"),
+}
+
+
+class RequestLoader:
+    def __init__(self, db, user=None):
+        self.db = db
+        self._user = user
+        self.user_version = None  # data version the user document was read at, if known
+        self._memo = {}
+
+    # ---------------------------
+    # user
+    # ---------------------------
+    @property
+    def user(self):
+        return self._user
+
+    @property
+    def user_id(self):
+        return str(self._user["_id"])
+
+    def set_user(self, user, version=None):
+        self._user = user
+        self.user_version = version
+
+    # ---------------------------
+    # memoized reads
+    # ---------------------------
+    def _once(self, key, fn):
+        if key not in self._memo:
+            self._memo[key] = fn()
+        return self._memo[key]
+
+    def rollup(self):
+        return self._once(("rollup",), lambda: emotion_rollup.get_rollup(self.db, self.user_id))
+
+    def emotion_stats(self, n):
+        return self._once(("emotion_stats", n), lambda: emotion_rollup.window_stats(self.rollup(), n))
+
+    def signals(self, emotion_window, decision_limit):
+        return self._once(
+            ("signals", emotion_window, decision_limit),
+            lambda: analytics.user_signals(self.db, self.user_id, emotion_window, decision_limit),
+        )
+
+    def course_engine(self):
+        return self._once(("course_engine",), lambda: CourseInsightsEngine(self.db, self.user_id, self.rollup))
+
+    def data_version(self):
+        return self._once(("data_version",), lambda: data_version.current(self.db, self.user_id))
+
+    def _recent_docs(self, key, collection, n, projection):
+        cached = self._memo.get((key,))
+        if cached and (cached["n"] >= n or cached["exhausted"]):
+            return cached["docs"][:n]
+        docs = list(
+            self.db[collection]
+            .find({"user_id": self.user_id}, projection)
+            .sort(pagination.SORT)
+            .limit(n)
+        )
+        self._memo[(key,)] = {"n": n, "docs": docs, "exhausted": len(docs) < n}
+        return docs
+
+    def recent_emotions(self, n):
+        return self._recent_docs("recent_emotions", "emotions", n, EMOTION_LIST_PROJECTION)
+
+    def recent_decisions(self, n):
+        return self._recent_docs("recent_decisions", "decisions", n, DECISION_LIST_PROJECTION)
+
+    def course(self, cid):
+        """The user's course `cid` (a copy, safe to annotate), or None. Raises on a malformed id."""
+        oid = ObjectId(cid)
+        doc = self._once(
+            ("course", oid),
+            lambda: self.db["courses"].find_one({"_id": oid, "user_id": self.user_id}),
+        )
+        return copy.copy(doc) if doc is not None else None
+
+    # ---------------------------
+    # writes
+    # ---------------------------
+    def wrote(self, *kinds, user=None):
+        """Forget what the write changed and bump the data version."""
+        prefixes = {prefix for kind in kinds for prefix in _INVALIDATES[kind]}
+        for key in [k for k in self._memo if k[0] in prefixes]:
+            del self._memo[key]
+        if user is not None:
+            self.set_user(user)
+        self._memo[("data_version",)] = data_version.bump(self.db, self.user_id)
+
+
+def loader(db):
+    """The current request's loader (created on first use)."""
+    if "loader" not in g:
+        g.loader = RequestLoader(db)
+    return g.loader
@@ -0,0 +1,72 @@
+"""
+Server-Sent Events helpers and an incremental JSON field scanner.
+
+JSONFieldScanner is fed model output as it streams and reports each
+top-level member of the JSON object as soon as its value is complete,
+e.g. ("final_decision", "...") long before the closing brace arrives.
+Text before the first "{" (such as a ```json fence) is ignored.
+"""
+import json
+
+
+def sse_event(event, data):
+    payload = json.dumps(data, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class JSONFieldScanner:
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self.finished = False
+
+    def feed(self, text):
+        """Append text; returns a list of (key, value) members completed by it."""
+        self.buffer += text
+        completed = []
+        buf = self.buffer
+
+        while self._pos < len(buf) and not self.finished:
+            ch = buf[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._member_start:self._pos], completed)
+                    self.finished = True
+            elif ch == "," and self._depth == 1:
+                self._emit(buf[self._member_start:self._pos], completed)
+                self._member_start = self._pos + 1
+
+            self._pos += 1
+
+        return completed
+
+    @staticmethod
+    def _emit(member, completed):
+        if not member.strip():
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except ValueError:
+            return
+        completed.extend(parsed.items())
@@ -0,0 +1,98 @@
+"""
+Syllabus import parsing.
+
+Accepted bodies (one row per item, `section` is lesson/module/lab/assessment,
+singular or plural):
+
+    text/csv              header row with `section,title` and optionally
+                          `completed`, `max_score`, `score`
+    application/x-ndjson  one {"section", "title", ...} object per line
+    application/json      [{"section", "title", ...}, ...] or
+                          {"lessons": [...], "modules": [...], "labs": [...], "assessments": [...]}
+
+CSV and NDJSON are parsed line by line straight off the request stream;
+`parse` validates every row and groups the items per section so the
+course is updated with a single write (course_store.add_items).
+"""
+import codecs
+import csv
+import json
+import os
+
+from course_store import CONTENT_PLURALS, make_item
+
+MAX_ITEMS = int(os.getenv("SYLLABUS_MAX_ITEMS", "2000"))
+
+_PLURALS = {**CONTENT_PLURALS, **{p: p for p in CONTENT_PLURALS.values()}}
+
+
+class SyllabusError(ValueError):
+    pass
+
+
+def _lines(stream):
+    return codecs.getreader("utf-8")(stream)
+
+
+def _csv_rows(stream):
+    reader = csv.DictReader(_lines(stream))
+    if not reader.fieldnames or not {"section", "title"} <= {f.strip().lower() for f in reader.fieldnames}:
+        raise SyllabusError("CSV header must include section,title")
+    for row in reader:
+        yield {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+
+
+def _ndjson_rows(stream):
+    for line in _lines(stream):
+        if line.strip():
+            yield json.loads(line)
+
+
+def _json_rows(stream):
+    data = json.load(_lines(stream))
+    if isinstance(data, dict):
+        for section, items in data.items():
+            if section not in _PLURALS:
+                continue
+            for item in items or []:
+                yield {**item, "section": section} if isinstance(item, dict) else {"section": section, "title": item}
+    elif isinstance(data, list):
+        yield from data
+    else:
+        raise SyllabusError("JSON body must be an array or an object of sections")
+
+
+def rows(stream, content_type):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return _csv_rows(stream)
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return _ndjson_rows(stream)
+    if content_type == "application/json":
+        return _json_rows(stream)
+    raise SyllabusError("Unsupported content type (use text/csv, application/x-ndjson or application/json)")
+
+
+def parse(stream, content_type, max_items=None):
+    """{plural: [item, ...]} for every row; raises SyllabusError naming the bad row."""
+    max_items = max_items or MAX_ITEMS
+    sections = {}
+    count = 0
+    try:
+        for n, raw in enumerate(rows(stream, content_type), start=1):
+            if not isinstance(raw, dict):
+                raise SyllabusError(f"row {n}: expected an object")
+            plural = _PLURALS.get(str(raw.get("section", "")).strip().lower())
+            if not plural:
+                raise SyllabusError(f"row {n}: unknown section {raw.get('section')!r}")
+            try:
+                item = make_item(plural, raw)
+            except ValueError as e:
+                raise SyllabusError(f"row {n}: {e}")
+            count += 1
+            if count > max_items:
+                raise SyllabusError(f"too many items (max {max_items})")
+            sections.setdefault(plural, []).append(item)
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        raise SyllabusError(f"unreadable body: {e}")
+    return sections
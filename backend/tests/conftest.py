@@ -0,0 +1,59 @@
+"""
+Shared fixtures. MongoDB is mongomock (requirements-dev.txt), so the
+suite runs without a server:
+
+    pip install -r requirements-dev.txt
+    python -m pytest            # from backend/
+"""
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["nuerolink_test"]
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """The Flask app over a fresh in-memory Mongo (mongo.py's lazy client)."""
+    import mongo
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost")
+    monkeypatch.setenv("JWT_SECRET", "test-secret-that-is-32-bytes-long")
+    monkeypatch.setattr(mongo, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setattr(mongo, "_client", None)
+    import emotion_ai
+    monkeypatch.setattr(emotion_ai.sweeper, "interval", 0)  # tests call requeue_stale themselves
+    import app as app_module
+    return app_module.create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(client):
+    """Authorization headers for a freshly registered user."""
+    client.post("/api/auth/register", json={"name": "Ada", "email": "ada@example.com", "password": "pw"})
+    token = client.post("/api/auth/login", json={"email": "ada@example.com", "password": "pw"}).get_json()["token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def app_db(app):
+    """The database behind `app`."""
+    import mongo
+    return mongo.get_db()
+
+
+@pytest.fixture
+def user_id(auth, app_db):
+    """The id (str) of the user `auth` logs in as."""
+    return str(app_db.users.find_one({"email": "ada@example.com"})["_id"])
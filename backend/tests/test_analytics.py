@@ -0,0 +1,156 @@
+"""
+user_signals against a plain-Python recompute from the raw collections.
+
+mongomock can't run $lookup sub-pipelines, so these skip unless
+MONGO_TEST_URI points at a MongoDB 5.0+ server (a throwaway database is
+created and dropped there).
+"""
+import datetime
+import os
+import random
+import uuid
+from collections import Counter
+
+import mongomock
+import pytest
+from pymongo import MongoClient
+
+import analytics
+import emotion_rollup
+
+T0 = datetime.datetime(2024, 5, 1)
+
+
+@pytest.fixture
+def signals_db():
+    uri = os.getenv("MONGO_TEST_URI")
+    if not uri:
+        yield mongomock.MongoClient()["nuerolink_test"]
+        return
+    client = MongoClient(uri)
+    name = f"nuerolink_test_{uuid.uuid4().hex[:8]}"
+    try:
+        yield client[name]
+    finally:
+        client.drop_database(name)
+        client.close()
+
+
+def signals(db, uid, **kwargs):
+    try:
+        return analytics.user_signals(db, uid, **kwargs)
+    except NotImplementedError as e:
+        pytest.skip(f"{e} (set MONGO_TEST_URI to a MongoDB 5.0+ server)")
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def recompute(db, uid, emotion_window, decision_limit):
+    emotions = list(db.emotions.find({"user_id": uid}).sort("timestamp", -1).limit(emotion_window))
+    labels = [e["emotion"] for e in emotions]
+    decisions = list(db.decisions.find({"user_id": uid}).sort("timestamp", -1).limit(decision_limit))
+    answered = [d["result"] for d in decisions if d.get("result")]
+    courses = list(db.courses.find({"user_id": uid}))
+
+    def score(name):
+        return _mean((e.get("ai") or {}).get(f"{name}_score") for e in emotions)
+
+    return {
+        "emotions": {
+            "count": len(emotions),
+            "dominant_emotion": Counter(labels).most_common(1)[0][0] if labels else None,
+            "avg_intensity": _mean(e["intensity"] for e in emotions),
+            "focus_avg": score("focus"),
+            "stress_avg": score("stress"),
+            "motivation_avg": score("motivation"),
+        },
+        "decision_count": len(decisions),
+        "decision_confidence_avg": _mean(
+            50 if r.get("confidence_score") is None else r["confidence_score"] for r in answered),
+        "course_count": len(courses),
+        "course_progress_avg": _mean(c.get("progress_percent") or 0 for c in courses),
+    }
+
+
+def comparable(result):
+    """Flat (pytest.approx can't nest) and limited to what recompute derives."""
+    flat = {k: v for k, v in result.items() if k != "emotions"}
+    for k in ("count", "dominant_emotion", "avg_intensity", "focus_avg", "stress_avg", "motivation_avg"):
+        flat[f"emotions.{k}"] = result["emotions"][k]
+    return flat
+
+
+def seed(db, decisions=13, emotions=25):
+    rng = random.Random(11)
+    oid = db.users.insert_one({"name": "Ada", "email": f"{uuid.uuid4().hex}@example.com"}).inserted_id
+    uid = str(oid)
+
+    for i in range(emotions):
+        doc = {"user_id": uid, "emotion": rng.choice(["Calm", "Stressed", "Tired", "Happy"]),
+               "intensity": rng.randint(0, 100), "timestamp": T0 + datetime.timedelta(minutes=i)}
+        if rng.random() < 0.7:  # the rest are still pending interpretation
+            doc["ai"] = {"focus_score": rng.randint(0, 100), "stress_score": rng.randint(0, 100),
+                         "motivation_score": rng.randint(0, 100)}
+        db.emotions.insert_one(doc)
+
+    # oldest first; the newest ones cover every shape a stored result can take
+    results = [{"confidence_score": 5}] * max(decisions - 5, 0) + [
+        None, {}, {"final_decision": "Go"}, {"confidence_score": None}, {"confidence_score": 90},
+    ]
+    for i, result in enumerate(results[-decisions:] if decisions else []):
+        doc = {"user_id": uid, "question": f"q{i}", "timestamp": T0 + datetime.timedelta(hours=i)}
+        if result is not None:
+            doc["result"] = result
+        db.decisions.insert_one(doc)
+
+    for progress in (40, None, 75):
+        course = {"user_id": uid, "name": "Algebra"}
+        if progress is not None:
+            course["progress_percent"] = progress
+        db.courses.insert_one(course)
+    return oid
+
+
+@pytest.mark.parametrize("window, limit", [(20, 10), (5, 3), (10, 20)])
+def test_signals_match_a_recompute(signals_db, window, limit):
+    oid = seed(signals_db)
+    emotion_rollup.rebuild(signals_db, str(oid))
+
+    result = signals(signals_db, oid, emotion_window=window, decision_limit=limit)
+    assert comparable(result) == pytest.approx(comparable(recompute(signals_db, str(oid), window, limit)))
+    assert result["decision_count"] == min(limit, 13)
+
+
+def test_user_without_a_rollup_falls_back_to_building_one(signals_db):
+    oid = seed(signals_db)
+    assert signals_db.emotion_rollups.count_documents({}) == 0
+
+    result = signals(signals_db, str(oid))
+    assert comparable(result) == pytest.approx(comparable(recompute(signals_db, str(oid), 20, 10)))
+    assert signals_db.emotion_rollups.count_documents({"_id": str(oid)}) == 1
+
+
+def test_user_with_no_history(signals_db):
+    oid = seed(signals_db, decisions=0, emotions=0)
+    signals_db.courses.delete_many({})
+
+    result = signals(signals_db, oid)
+    assert comparable(result) == comparable(recompute(signals_db, str(oid), 20, 10))
+    assert result["decision_confidence_avg"] is None
+    assert result["course_progress_avg"] is None
+
+
+def test_old_servers_are_reported_at_startup(capsys):
+    class Client:
+        def __init__(self, version):
+            self.version = version
+
+        def server_info(self):
+            return {"versionArray": self.version}
+
+    assert analytics.check_server(Client([5, 0, 0, 0]))
+    assert not analytics.check_server(Client([4, 4, 29, 0]))
+    assert "MongoDB 4.4 is older than 5.0" in capsys.readouterr().out
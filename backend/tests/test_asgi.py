@@ -0,0 +1,194 @@
+"""
+asgi.py through Starlette's TestClient (which runs the lifespan). The
+native routes get an asyncio face over the same mongomock client the
+Flask half uses, and a fake AsyncLLMClient.
+"""
+import json
+import types
+
+import pytest
+from starlette.testclient import TestClient
+
+EMOTION_AI = {"focus_score": 70, "stress_score": 20, "motivation_score": 60,
+              "cognitive_state": "steady", "interpretation": "i", "recommendation": "r"}
+DECISION = {"final_decision": "Keep Physics", "rationale": "r", "confidence_score": 80, "bias_detected": None,
+            "risk_level": "low", "cognitive_alignment": "", "emotional_influence": "", "short_term_effect": "",
+            "long_term_effect": "", "action_steps": ["Ask the tutor"]}
+ANSWERS = {"emotion": json.dumps(EMOTION_AI), "decision": json.dumps(DECISION)}
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self._cursor.limit(n)
+        return self
+
+    async def __aiter__(self):
+        for doc in self._cursor:
+            yield doc
+
+
+class AsyncCollection:
+    def __init__(self, col):
+        self._col = col
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._col.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._col, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncMongomock:
+    """The AsyncMongoClient surface asgi.py uses, over a (shared) mongomock client."""
+
+    def __init__(self, client):
+        self._client = client
+        self.closed = False
+
+    def __getitem__(self, name):
+        return _AsyncDatabase(self._client[name])
+
+    async def close(self):
+        self.closed = True
+
+
+class _AsyncDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getitem__(self, name):
+        return AsyncCollection(self._database[name])
+
+
+class FakeAsyncLLM:
+    def __init__(self):
+        self.calls = []
+
+    async def chat(self, site, **kwargs):
+        self.calls.append(site)
+        message = types.SimpleNamespace(content=ANSWERS[site])
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+    async def stream(self, site, **kwargs):
+        self.calls.append(site)
+        text = ANSWERS[site]
+        for i in range(0, len(text), 9):
+            delta = types.SimpleNamespace(content=text[i:i + 9])
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+
+@pytest.fixture
+def asgi(app, monkeypatch):
+    import asgi
+    import mongo
+
+    opened = []
+
+    def open_client(uri, **kwargs):
+        opened.append(AsyncMongomock(mongo.client()))
+        return opened[-1]
+
+    monkeypatch.setattr(asgi, "AsyncMongoClient", open_client)
+    monkeypatch.setattr(asgi, "allm", FakeAsyncLLM())
+    # the real one shuts the process-wide LLM pool that later tests still use
+    monkeypatch.setattr(asgi.wsgi, "shutdown", lambda wait=True: opened.append("shutdown"))
+    asgi.opened = opened
+    return asgi
+
+
+@pytest.fixture
+def served(asgi):
+    with TestClient(asgi.app) as client:
+        client.post("/api/auth/register", json={"name": "Ada", "email": "ada@example.com", "password": "pw"})
+        token = client.post("/api/auth/login", json={"email": "ada@example.com", "password": "pw"}).json()["token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+
+
+def sse(text):
+    return [(block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in text.split("\n\n") if block]
+
+
+def test_client_is_opened_by_the_lifespan_and_closed_on_shutdown(asgi):
+    assert asgi._mongo is None  # nothing is created at import
+    with TestClient(asgi.app):
+        client = asgi._mongo
+        assert asgi.opened == [client]
+        assert not client.closed
+    assert client.closed
+    assert asgi._mongo is None
+    assert asgi.opened[-1] == "shutdown"
+
+
+def test_native_emotion_route(asgi, served, app_db):
+    r = served.post("/api/emotions", json={"emotion": "Calm", "intensity": 40})
+    assert r.status_code == 201
+    assert r.json()["ai_status"] == "done"
+    assert r.json()["ai"] == EMOTION_AI
+    assert asgi.allm.calls == ["emotion"]
+
+    # written through the async client, read back through the Flask mount
+    history = served.get("/api/emotions").json()
+    assert [e["emotion"] for e in history] == ["Calm"]
+    assert app_db.emotion_rollups.find_one()["windows"]["5"]["count"] == 1
+
+
+def test_native_emotion_route_async_mode(asgi, app_db):
+    with TestClient(asgi.app) as client:
+        client.post("/api/auth/register", json={"name": "Ada", "email": "ada@example.com", "password": "pw"})
+        token = client.post("/api/auth/login", json={"email": "ada@example.com", "password": "pw"}).json()["token"]
+        r = client.post("/api/emotions?async=1", json={"emotion": "Tired", "intensity": 80},
+                        headers={"Authorization": f"Bearer {token}"})
+        assert r.status_code == 202
+        assert r.json()["ai_status"] == "pending"
+    # the lifespan drained the background interpretation before closing Mongo
+    stored = app_db.emotions.find_one({"emotion": "Tired"})
+    assert stored["ai_status"] == "done"
+    assert stored["ai"] == EMOTION_AI
+
+
+def test_native_emotion_route_validates(served):
+    assert served.post("/api/emotions", json={"intensity": 40}).status_code == 400
+    assert served.post("/api/emotions", json={"emotion": "Calm"}, headers={"Authorization": "Bearer x"}).status_code == 401
+
+
+def test_native_decision_route(asgi, served, app_db):
+    first = served.post("/api/decision/analyze", json={"question": "Should I drop Physics?"})
+    assert first.status_code == 200
+    assert first.json() == DECISION
+    again = served.post("/api/decision/analyze", json={"question": "should I  drop physics?"})
+    assert again.json() == DECISION
+    assert asgi.allm.calls == ["decision"]
+    assert app_db.decisions.count_documents({}) == 1
+
+    assert served.post("/api/decision/analyze", json={"question": " "}).status_code == 400
+
+
+def test_native_decision_stream(asgi, served, app_db):
+    r = served.post("/api/decision/analyze?stream=1", json={"question": "Should I take Chemistry?"})
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = sse(r.text)
+    assert "".join(d["text"] for kind, d in events if kind == "token") == ANSWERS["decision"]
+    assert [(d["key"], d["value"]) for kind, d in events if kind == "field"] == list(DECISION.items())
+    assert events[-1] == ("done", DECISION)
+    assert app_db.decisions.count_documents({"question": "Should I take Chemistry?"}) == 1
+
+
+def test_flask_mount_serves_other_routes(served):
+    r = served.get("/api/user/profile")
+    assert r.status_code == 200
+    assert r.json()["email"] == "ada@example.com"
+    assert "ETag" in r.headers
+    assert served.get("/api/user/profile", headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
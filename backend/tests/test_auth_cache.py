@@ -0,0 +1,49 @@
+import time
+
+import auth_cache
+
+
+def count_user_reads(monkeypatch, app_db):
+    reads = []
+    collection = type(app_db.users)
+    find_one = collection.find_one
+
+    def spy(self, *args, **kwargs):
+        if self.name == "users":
+            reads.append(args)
+        return find_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection, "find_one", spy)
+    return reads
+
+
+def test_repeat_requests_skip_the_users_read(client, auth, app_db, monkeypatch):
+    assert client.get("/api/user/profile", headers=auth).status_code == 200
+    reads = count_user_reads(monkeypatch, app_db)
+    for _ in range(3):
+        assert client.get("/api/user/profile", headers=auth).status_code == 200
+    assert reads == []
+
+
+def test_profile_writes_are_seen_by_the_next_request(client, auth):
+    client.get("/api/user/profile", headers=auth)
+    r = client.put("/api/user/profile", json={"name": "Ada L.", "subjects": ["Math"]}, headers=auth)
+    assert r.status_code == 200
+
+    profile = client.get("/api/user/profile", headers=auth).get_json()
+    assert profile["name"] == "Ada L."
+    assert profile["subjects"] == ["Math"]
+
+
+def test_bad_tokens_are_rejected(client, auth):
+    token = auth["Authorization"].split(" ")[1]
+    forged = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    assert client.get("/api/user/profile", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+    assert client.get("/api/user/profile").status_code == 401
+
+
+def test_cached_claims_never_outlive_the_token():
+    auth_cache.put_claims("expired-token", {"user_id": "u1", "exp": time.time() - 1})
+    assert auth_cache.get_claims("expired-token") is None
+    auth_cache.put_claims("live-token", {"user_id": "u1", "exp": time.time() + 60})
+    assert auth_cache.get_claims("live-token")["user_id"] == "u1"
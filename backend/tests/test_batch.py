@@ -0,0 +1,65 @@
+import pytest
+
+
+@pytest.fixture
+def course_id(client, auth):
+    return client.post("/api/courses", json={"title": "Algebra", "code": "MA101"}, headers=auth).get_json()["_id"]
+
+
+def direct(client, auth, sub):
+    r = client.open(sub["path"], method=sub.get("method", "GET"), json=sub.get("body"), headers=auth)
+    return {"status": r.status_code, "body": r.get_json(), "etag": r.headers.get("ETag", "").strip('"') or None}
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_batch_bodies_equal_direct_calls(client, auth, course_id, parallel):
+    subs = [
+        {"path": "/api/courses"},
+        {"path": f"/api/courses/{course_id}"},
+        {"path": "/api/emotions?limit=5"},
+        {"path": "/api/decisions"},
+        {"path": "/api/courses/000000000000000000000000"},
+        {"path": "/api/courses?sort=nope"},
+    ]
+    r = client.post("/api/batch", json={"requests": subs, "parallel": parallel}, headers=auth)
+    assert r.status_code == 200
+    batched = r.get_json()["responses"]
+
+    for sub, got in zip(subs, batched):
+        want = direct(client, auth, sub)
+        assert got["status"] == want["status"], sub
+        assert got["body"] == want["body"], sub
+        assert got.get("etag") == want["etag"], sub
+
+
+def test_reads_after_a_write_in_the_same_batch_see_it(client, auth, course_id):
+    subs = [
+        {"path": "/api/courses"},
+        {"method": "PUT", "path": f"/api/courses/{course_id}/lesson", "body": {"title": "L1"}},
+        {"path": "/api/courses"},
+        {"path": f"/api/courses/{course_id}"},
+    ]
+    batched = client.post("/api/batch", json={"requests": subs, "parallel": True}, headers=auth).get_json()["responses"]
+
+    assert [b["status"] for b in batched] == [200, 200, 200, 200]
+    assert batched[0]["body"][0]["counters"]["lessons"]["total"] == 0
+    assert batched[2]["body"][0]["counters"]["lessons"]["total"] == 1
+    assert batched[3]["body"] == direct(client, auth, subs[3])["body"]
+
+
+def test_conditional_sub_request(client, auth, course_id):
+    etag = client.get("/api/courses", headers=auth).headers["ETag"]
+    subs = [{"path": "/api/courses", "headers": {"If-None-Match": etag}}]
+    batched = client.post("/api/batch", json={"requests": subs}, headers=auth).get_json()["responses"]
+    assert batched == [{"status": 304, "etag": etag.strip('"')}]
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"requests": []},
+    {"requests": [{"path": "/api/batch"}]},
+    {"requests": [{"path": "/elsewhere"}]},
+    {"requests": [{"method": "TRACE", "path": "/api/courses"}]},
+])
+def test_invalid_batches_are_rejected(client, auth, payload):
+    assert client.post("/api/batch", json=payload, headers=auth).status_code == 400
@@ -0,0 +1,72 @@
+import gzip
+import json
+
+import pytest
+
+
+def create_course(client, auth, title):
+    r = client.post("/api/courses", json={"title": title, "code": "C"}, headers=auth)
+    assert r.status_code == 201
+    return r.get_json()["_id"]
+
+
+@pytest.mark.parametrize("path", ["/api/courses", "/api/emotions", "/api/decisions"])
+def test_304_until_a_write_then_200(client, auth, path):
+    first = client.get(path, headers=auth)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    again = client.get(path, headers={**auth, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.get_data() == b""
+    assert again.headers["ETag"] == etag
+
+    create_course(client, auth, "Physics")
+    after = client.get(path, headers={**auth, "If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
+    assert client.get(path, headers={**auth, "If-None-Match": after.headers["ETag"]}).status_code == 304
+
+
+def test_etag_is_per_user(client, auth):
+    etag = client.get("/api/courses", headers=auth).headers["ETag"]
+    client.post("/api/auth/register", json={"name": "Bo", "email": "bo@example.com", "password": "pw"})
+    token = client.post("/api/auth/login", json={"email": "bo@example.com", "password": "pw"}).get_json()["token"]
+    other = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/courses", headers={**other, "If-None-Match": etag}).status_code == 200
+
+
+def test_gzip_body_and_etag(client, auth):
+    for i in range(30):
+        create_course(client, auth, f"Course number {i} with a longer title")
+    plain = client.get("/api/courses", headers=auth)
+    zipped = client.get("/api/courses", headers={**auth, "Accept-Encoding": "gzip"})
+
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+    assert json.loads(gzip.decompress(zipped.get_data())) == plain.get_json()
+    assert zipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    revalidated = client.get("/api/courses", headers={**auth, "Accept-Encoding": "gzip",
+                                                      "If-None-Match": zipped.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_another_workers_profile_write_comes_with_the_new_etag(client, auth, app_db, user_id):
+    import data_version
+    from bson import ObjectId
+
+    first = client.get("/api/user/profile", headers=auth)
+    assert first.get_json()["name"] == "Ada"  # this worker now caches the user document
+
+    # another worker: writes the user and bumps the version, this process's auth_cache is untouched
+    app_db.users.update_one({"_id": ObjectId(user_id)}, {"$set": {"name": "Ada Lovelace"}})
+    data_version.bump(app_db, user_id)
+
+    second = client.get("/api/user/profile", headers={**auth, "If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.get_json()["name"] == "Ada Lovelace"
+
+    third = client.get("/api/user/profile", headers={**auth, "If-None-Match": second.headers["ETag"]})
+    assert third.status_code == 304
+    assert client.get("/api/user/profile", headers=auth).get_json()["name"] == "Ada Lovelace"
@@ -0,0 +1,197 @@
+import datetime
+import random
+
+import pytest
+
+import course_store
+from course_insights import summary_fields as summary
+
+
+def make_course(db, layout="embedded"):
+    course = course_store.new_course("u1", "Algebra", "MA101", "", datetime.datetime.utcnow(), layout)
+    course["_id"] = db.courses.insert_one(course).inserted_id
+    return course
+
+
+def never_matches(col, monkeypatch):
+    """Every version-conditioned update loses the race."""
+    monkeypatch.setattr(col, "find_one_and_update", lambda *a, **kw: None)
+
+
+def test_toggle_conflict_reports_current_version(db):
+    course = make_course(db)
+    course_store.add_items(db.courses, course["_id"], "u1", {"lessons": [course_store.make_item("lessons", "L1")]})
+
+    with pytest.raises(course_store.VersionConflict) as e:
+        course_store.toggle_item(db.courses, course["_id"], "u1", "lessons", "missing", expected_version=1)
+    assert e.value.args[0] == 2
+
+
+def test_lost_races_report_current_version(db, monkeypatch):
+    course = make_course(db)
+    item = course_store.make_item("assessments", {"title": "Quiz"})
+    course_store.add_items(db.courses, course["_id"], "u1", {"assessments": [item]})
+    never_matches(db.courses, monkeypatch)
+
+    with pytest.raises(course_store.VersionConflict) as e:
+        course_store.add_items(db.courses, course["_id"], "u1", {"labs": [course_store.make_item("labs", "Lab")]})
+    assert e.value.args[0] == 2
+
+    with pytest.raises(course_store.VersionConflict) as e:
+        course_store.score_assessment(db.courses, course["_id"], "u1", item["_id"], 80)
+    assert e.value.args[0] == 2
+
+    lesson = course_store.make_item("lessons", "L1")
+    monkeypatch.undo()
+    course_store.add_items(db.courses, course["_id"], "u1", {"lessons": [lesson]})
+    never_matches(db.courses, monkeypatch)
+    for expected in (3, None):
+        with pytest.raises(course_store.VersionConflict) as e:
+            course_store.toggle_item(db.courses, course["_id"], "u1", "lessons", lesson["_id"], expected)
+        assert e.value.args[0] == 3
+
+
+def abandon_after_item_write(monkeypatch):
+    """The process dies between the item write and the counter commit."""
+    def die(col, owner, inc):
+        raise SystemExit("worker killed")
+    monkeypatch.setattr(course_store, "_commit_counters", die)
+
+
+def age_marks(db, seconds):
+    db.courses.update_many({}, {"$set": {
+        "counters_dirty_at": datetime.datetime.utcnow() - datetime.timedelta(seconds=seconds)}})
+
+
+def test_abandoned_item_write_is_rebuilt_on_read(db, monkeypatch):
+    course = make_course(db, layout="collection")
+    course_store.add_items(db.courses, course["_id"], "u1", {"labs": [course_store.make_item("labs", "Lab 1")]})
+
+    with monkeypatch.context() as m:
+        abandon_after_item_write(m)
+        with pytest.raises(SystemExit):
+            course_store.add_items(db.courses, course["_id"], "u1", {
+                "labs": [course_store.make_item("labs", {"title": "Lab 2", "completed": True})],
+            })
+
+    stored = db.courses.find_one({"_id": course["_id"]})
+    assert stored["counters"]["labs"] == {"total": 1, "completed": 0}
+    assert not course_store.counters_stale(stored)  # the write may still be in flight
+
+    age_marks(db, course_store.STALE_AFTER + 1)
+    stored = db.courses.find_one({"_id": course["_id"]})
+    assert course_store.counters_stale(stored)
+    course_store.ensure_counters(db.courses, course["_id"], "u1")
+
+    stored = db.courses.find_one({"_id": course["_id"]})
+    assert stored["counters"] == course_store.course_items.recount(db, course["_id"])
+    assert stored["counters"]["labs"] == {"total": 2, "completed": 1}
+    assert stored["progress_percent"] > 0
+    assert not course_store.counters_stale(stored)
+
+
+def test_committed_writes_leave_no_mark(db):
+    course = make_course(db, layout="collection")
+    course_store.add_items(db.courses, course["_id"], "u1", {"lessons": [course_store.make_item("lessons", "L1")]})
+    lesson = course_store.course_items.page(db, course["_id"], "lessons")[0][0]
+    course_store.toggle_item(db.courses, course["_id"], "u1", "lessons", lesson["_id"])
+    with pytest.raises(course_store.ItemNotFound):
+        course_store.toggle_item(db.courses, course["_id"], "u1", "lessons", "missing")
+
+    age_marks(db, course_store.STALE_AFTER + 1)
+    stored = db.courses.find_one({"_id": course["_id"]})
+    assert stored["counters_pending"] == 0
+    assert not course_store.counters_stale(stored)
+
+
+def test_collection_counters_track_every_write(db):
+    """Maintained counters equal a recount from course_items after any mix of writes."""
+    rng = random.Random(7)
+    course = make_course(db, layout="collection")
+    oid = course["_id"]
+    for step in range(60):
+        op = rng.choice(["add", "add", "toggle", "score"])
+        if op == "add":
+            plural = rng.choice(course_store.course_items.SECTIONS)
+            raw = [{"title": f"{plural} {step}.{i}", "completed": rng.random() < 0.3, "score": rng.choice([None, 40])}
+                   for i in range(rng.randint(1, 3))]
+            course_store.add_items(db.courses, oid, "u1", {plural: [course_store.make_item(plural, r) for r in raw]})
+        else:
+            plural = "assessments" if op == "score" else rng.choice(["lessons", "modules", "labs"])
+            items = list(db.course_items.find({"course_id": str(oid), "section": plural}))
+            if not items:
+                continue
+            item = rng.choice(items)
+            if op == "toggle":
+                course_store.toggle_item(db.courses, oid, "u1", plural, item["_id"])
+            else:
+                course_store.score_assessment(db.courses, oid, "u1", item["_id"], rng.randint(0, 100),
+                                              rng.choice([None, 50, 100]))
+
+        stored = db.courses.find_one({"_id": oid})
+        assert stored["counters"] == course_store.course_items.recount(db, oid), step
+        assert stored["progress_percent"] == summary(stored["counters"])["progress_percent"]
+        assert stored["counters_pending"] == 0
+
+
+def moved_after_read(db, monkeypatch):
+    """Another writer commits between toggle_item's read and its write."""
+    read = db.courses.find_one
+
+    def find_one(*args, **kwargs):
+        monkeypatch.setattr(db.courses, "find_one", read)
+        state = read(*args, **kwargs)
+        db.courses.update_one({}, {"$inc": {"version": 1}})
+        return state
+    monkeypatch.setattr(db.courses, "find_one", find_one)
+
+
+def test_collection_toggle_checks_expected_version_at_write_time(db, monkeypatch):
+    course = make_course(db, layout="collection")
+    course_store.add_items(db.courses, course["_id"], "u1", {"lessons": [course_store.make_item("lessons", "L1")]})
+    lesson = course_store.course_items.page(db, course["_id"], "lessons")[0][0]
+
+    with pytest.raises(course_store.VersionConflict) as e:
+        course_store.toggle_item(db.courses, course["_id"], "u1", "lessons", lesson["_id"], expected_version=1)
+    assert e.value.args[0] == 2
+
+    moved_after_read(db, monkeypatch)
+    with pytest.raises(course_store.VersionConflict) as e:
+        course_store.toggle_item(db.courses, course["_id"], "u1", "lessons", lesson["_id"], expected_version=2)
+    assert e.value.args[0] == 3
+
+    stored = db.courses.find_one({"_id": course["_id"]})
+    assert stored["counters"]["lessons"]["completed"] == 0
+    assert stored["counters_pending"] == 0
+    assert not db.course_items.find_one({"_id": lesson["_id"]})["completed"]
+
+    updated = course_store.toggle_item(db.courses, course["_id"], "u1", "lessons", lesson["_id"], expected_version=3)
+    assert updated["version"] == 4
+    assert updated["counters"]["lessons"]["completed"] == 1
+
+
+def test_stale_filter_agrees_with_counters_stale(db):
+    now = datetime.datetime.utcnow()
+    old = now - datetime.timedelta(seconds=course_store.STALE_AFTER + 1)
+    shapes = [
+        {},
+        {"counters_pending": 0, "counters_dirty_at": old},
+        {"counters_pending": 1, "counters_dirty_at": now},
+        {"counters_pending": 1, "counters_dirty_at": old},
+        {"counters_pending": 2},
+    ]
+    for extra in shapes:
+        course = make_course(db, layout="collection")
+        if extra:
+            db.courses.update_one({"_id": course["_id"]}, {"$set": extra})
+    legacy = db.courses.insert_one({"user_id": "u1", "title": "Legacy", "lessons": [{"_id": "a", "completed": True}]})
+    db.courses.insert_one({"user_id": "u2"})
+
+    expected = {c["_id"] for c in db.courses.find({"user_id": "u1"}) if course_store.counters_stale(c)}
+    assert {c["_id"] for c in db.courses.find(course_store.stale_filter("u1"))} == expected
+    assert len(expected) == 2 and legacy.inserted_id in expected
+
+    assert course_store.repair_stale_counters(db.courses, "u1", legacy.inserted_id) == 1
+    assert db.courses.find_one({"_id": legacy.inserted_id})["counters"]["lessons"] == {"total": 1, "completed": 1}
+    assert course_store.repair_stale_counters(db.courses, "u1") == 1
+    assert course_store.repair_stale_counters(db.courses, "u1") == 0
@@ -0,0 +1,93 @@
+import pytest
+
+
+@pytest.fixture
+def course_id(client, auth):
+    return client.post("/api/courses", json={"title": "Algebra", "code": "MA101"}, headers=auth).get_json()["_id"]
+
+
+def test_add_items_accepts_a_top_level_list(client, auth, course_id):
+    r = client.put(f"/api/courses/{course_id}/lab", json=["Lab 1", {"title": "Lab 2", "completed": True}], headers=auth)
+    assert r.status_code == 200
+    course = r.get_json()
+    assert [lab["title"] for lab in course["labs"]] == ["Lab 1", "Lab 2"]
+    assert course["counters"]["labs"] == {"total": 2, "completed": 1}
+
+
+@pytest.mark.parametrize("body", ['"Lab"', "3", "null", "not json"])
+def test_add_items_rejects_other_bodies(client, auth, course_id, body):
+    r = client.put(f"/api/courses/{course_id}/lab", data=body, content_type="application/json", headers=auth)
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("body", ["[80]", '"80"'])
+def test_score_rejects_non_object_bodies(client, auth, course_id, body):
+    r = client.post(f"/api/courses/{course_id}/assessment/x", data=body, content_type="application/json", headers=auth)
+    assert r.status_code == 400
+
+
+def test_toggle_ignores_a_non_object_body(client, auth, monkeypatch):
+    # collection layout: mongomock has no arrayFilters for the embedded toggle
+    monkeypatch.setenv("COURSE_ITEMS_LAYOUT", "collection")
+    course_id = client.post("/api/courses", json={"title": "Algebra", "code": "MA101"}, headers=auth).get_json()["_id"]
+    lesson = client.put(f"/api/courses/{course_id}/lesson", json={"title": "L1"}, headers=auth).get_json()["lessons"][0]
+    r = client.post(f"/api/courses/{course_id}/lesson/{lesson['_id']}/toggle", json=[1], headers=auth)
+    assert r.status_code == 200
+    assert r.get_json()["counters"]["lessons"]["completed"] == 1
+
+
+def test_reads_rebuild_counters_after_an_abandoned_write(client, auth, monkeypatch):
+    import datetime
+
+    import course_store
+    import mongo
+
+    monkeypatch.setenv("COURSE_ITEMS_LAYOUT", "collection")
+    course_id = client.post("/api/courses", json={"title": "Algebra", "code": "MA101"}, headers=auth).get_json()["_id"]
+    with monkeypatch.context() as m:
+        m.setattr(course_store, "_commit_counters", lambda *a: (_ for _ in ()).throw(RuntimeError("worker killed")))
+        client.put(f"/api/courses/{course_id}/lesson", json=["L1", "L2"], headers=auth)
+
+    mongo.get_db().courses.update_many({}, {"$set": {"counters_dirty_at": datetime.datetime(2000, 1, 1)}})
+    listed = client.get("/api/courses", headers=auth).get_json()
+    assert listed[0]["counters"]["lessons"]["total"] == 2
+    course = client.get(f"/api/courses/{course_id}", headers=auth).get_json()
+    assert course["counters"]["lessons"]["total"] == 2
+    assert len(course["lessons"]) == 2
+
+
+def test_unknown_sort_cursor_tag_is_a_400(client, auth, course_id):
+    import base64
+
+    token = base64.urlsafe_b64encode(f"n12|{course_id}".encode()).decode().rstrip("=")
+    r = client.get(f"/api/courses?sort=progress&after={token}", headers=auth)
+    assert r.status_code == 400
+    assert r.get_json() == {"error": "Invalid cursor"}
+
+
+def test_clients_holding_an_etag_see_the_rebuilt_counters(client, auth, monkeypatch):
+    import datetime
+
+    import course_store
+    import mongo
+
+    monkeypatch.setenv("COURSE_ITEMS_LAYOUT", "collection")
+    course_id = client.post("/api/courses", json={"title": "Algebra", "code": "MA101"}, headers=auth).get_json()["_id"]
+    paths = ["/api/courses", f"/api/courses/{course_id}", f"/api/courses/{course_id}/items?section=lessons"]
+    tags = {path: client.get(path, headers=auth).headers["ETag"] for path in paths}
+
+    with monkeypatch.context() as m:
+        m.setattr(course_store, "_commit_counters", lambda *a: (_ for _ in ()).throw(RuntimeError("worker killed")))
+        client.put(f"/api/courses/{course_id}/lesson", json=["L1", "L2"], headers=auth)
+    mongo.get_db().courses.update_many({}, {"$set": {"counters_dirty_at": datetime.datetime(2000, 1, 1)}})
+
+    for path in paths:
+        r = client.get(path, headers={**auth, "If-None-Match": tags[path]})
+        assert r.status_code == 200, path
+    assert client.get("/api/courses", headers=auth).get_json()[0]["counters"]["lessons"]["total"] == 2
+    assert client.get(f"/api/courses/{course_id}/items?section=lessons", headers=auth).get_json()["items"]
+
+    # repaired once; the new tag is good for 304s again
+    r = client.get(f"/api/courses/{course_id}", headers=auth)
+    assert r.get_json()["counters"]["lessons"] == {"total": 2, "completed": 0}
+    assert client.get(f"/api/courses/{course_id}", headers={**auth, "If-None-Match": r.headers["ETag"]}).status_code == 304
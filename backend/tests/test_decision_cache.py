@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import decision_cache
+
+
+def unique_key():
+    return uuid.uuid4().hex
+
+
+def test_identical_concurrent_requests_share_one_call():
+    key = unique_key()
+    calls = []
+    started = threading.Event()
+
+    def analyze():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)  # the model call
+        return {"final_decision": "Go"}
+
+    def request():
+        return decision_cache.coalesce(key, analyze)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        leader = pool.submit(request)
+        started.wait(5)
+        followers = [pool.submit(request) for _ in range(7)]
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1
+    assert [r for r, _ in results] == [{"final_decision": "Go"}] * 8
+    assert [was_leader for _, was_leader in results].count(True) == 1
+    assert key not in decision_cache._inflight
+
+
+def test_followers_get_the_leaders_error_and_the_next_request_retries():
+    key = unique_key()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("model down")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(decision_cache.coalesce, key, failing)
+        started.wait(5)
+        followers = [pool.submit(decision_cache.coalesce, key, failing) for _ in range(3)]
+        time.sleep(0.05)
+        release.set()
+        for future in [leader, *followers]:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    assert decision_cache.coalesce(key, lambda: {"ok": True}) == ({"ok": True}, True)
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def analyze():
+        barrier.wait()  # deadlocks if the second key waited on the first
+        return {}
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(decision_cache.coalesce, unique_key(), analyze) for _ in range(2)]
+        assert [f.result()[1] for f in futures] == [True, True]
+
+
+def test_async_requests_coalesce():
+    key = unique_key()
+    calls = []
+
+    async def analyze():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"final_decision": "Wait"}
+
+    async def run():
+        return await asyncio.gather(*(decision_cache.coalesce_async(key, analyze) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert {r["final_decision"] for r, _ in results} == {"Wait"}
+    assert [leader for _, leader in results].count(True) == 1
+
+
+def test_context_hash_ignores_formatting_but_not_context():
+    user = {"learning_styles": ["Visual", "reading"], "subjects": ["Math"], "cognitive_profile": {"a": 1}}
+    same = {"learning_styles": [" reading ", "visual"], "subjects": ["math"], "cognitive_profile": {"a": 1}}
+    summary = {"dominant": "Calm", "avg_intensity": 40}
+
+    base = decision_cache.context_hash("u1", "Should I  drop Physics?", user, summary)
+    assert decision_cache.context_hash("u1", "should i drop physics?", same, summary) == base
+    assert decision_cache.context_hash("u2", "Should I drop Physics?", user, summary) != base
+    assert decision_cache.context_hash("u1", "Should I drop Physics?", user, {**summary, "dominant": "Stressed"}) != base
@@ -0,0 +1,62 @@
+import datetime
+
+import pytest
+
+import emotion_ai
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Records handed to the enricher instead of running them."""
+    docs = []
+    monkeypatch.setattr(emotion_ai.enricher, "submit", lambda db, client, doc: docs.append(doc) or True)
+    return docs
+
+
+def insert_pending(db, user_id, minutes_ago):
+    requested = datetime.datetime.utcnow() - datetime.timedelta(minutes=minutes_ago)
+    return db.emotions.insert_one({
+        "user_id": str(user_id), "emotion": "Calm", "intensity": 40, "timestamp": requested,
+        "ai": {}, "ai_status": "pending", "ai_requested_at": requested,
+    }).inserted_id
+
+
+def test_status_poll_is_read_only(client, auth, submitted):
+    import mongo
+
+    db = mongo.get_db()
+    user = db.users.find_one({"email": "ada@example.com"})
+    eid = insert_pending(db, user["_id"], minutes_ago=10)
+    before = db.emotions.find_one({"_id": eid})
+
+    for _ in range(3):
+        r = client.get(f"/api/emotions/{eid}/ai", headers=auth)
+        assert r.status_code == 200
+        assert r.get_json() == {"id": str(eid), "ai_status": "pending", "ai": None}
+
+    assert db.emotions.find_one({"_id": eid}) == before
+    assert submitted == []
+
+
+def test_sweep_requeues_each_stale_record_once(db, submitted):
+    stale = insert_pending(db, "u1", minutes_ago=10)
+    insert_pending(db, "u1", minutes_ago=0)
+
+    assert emotion_ai.requeue_stale(db, client=None) == 1
+    assert [d["_id"] for d in submitted] == [stale]
+    assert {"user_id", "emotion", "intensity"} <= set(submitted[0])
+
+    # claimed: a second sweep (or another process) leaves it alone until it goes stale again
+    assert emotion_ai.requeue_stale(db, client=None) == 0
+    later = datetime.datetime.utcnow() + emotion_ai.STALE_AFTER * 2
+    assert emotion_ai.requeue_stale(db, client=None, now=later) == 2
+
+
+def test_sweep_stops_when_the_pool_is_full(db, monkeypatch):
+    for _ in range(3):
+        insert_pending(db, "u1", minutes_ago=10)
+    monkeypatch.setattr(emotion_ai.enricher, "submit", lambda db, client, doc: False)
+
+    assert emotion_ai.requeue_stale(db, client=None) == 0
+    claimed = db.emotions.count_documents({"ai_requested_at": {"$gt": datetime.datetime.utcnow() - datetime.timedelta(minutes=1)}})
+    assert claimed == 1  # retried after STALE_AFTER like any lost worker
@@ -0,0 +1,110 @@
+import datetime
+import random
+import threading
+from collections import Counter
+
+import pytest
+from bson import ObjectId
+
+import emotion_rollup
+
+LABELS = ["Joy", "Calm", "Sad", "Stressed"]
+T0 = datetime.datetime(2024, 1, 1)
+
+
+def make_emotion(db, user_id, seconds, ai=True):
+    doc = {
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "emotion": random.choice(LABELS),
+        "intensity": random.randint(0, 100),
+        "timestamp": T0 + datetime.timedelta(seconds=seconds),
+        "ai": {"focus_score": random.randint(0, 100), "stress_score": random.randint(0, 100)} if ai else {},
+    }
+    db["emotions"].insert_one(doc)
+    return doc
+
+
+def brute_force(db, user_id, n):
+    docs = sorted(db["emotions"].find({"user_id": user_id}), key=lambda d: (d["timestamp"], d["_id"]), reverse=True)[:n]
+
+    def avg(values):
+        return sum(values) / len(values) if values else None
+
+    return {
+        "count": len(docs),
+        "emotion_counts": dict(Counter(d["emotion"] for d in docs)),
+        "avg_intensity": avg([d["intensity"] for d in docs]),
+        "focus_avg": avg([d["ai"]["focus_score"] for d in docs if "focus_score" in d["ai"]]),
+        "stress_avg": avg([d["ai"]["stress_score"] for d in docs if "stress_score" in d["ai"]]),
+    }
+
+
+def assert_exact(db, user_id):
+    rollup = emotion_rollup.get_rollup(db, user_id)
+    for n in emotion_rollup.WINDOWS:
+        stats = emotion_rollup.window_stats(rollup, n)
+        expected = brute_force(db, user_id, n)
+        for key, value in expected.items():
+            assert stats[key] == pytest.approx(value), (n, key)
+
+
+def test_sequential_inserts_match_brute_force(db):
+    for i in range(45):
+        doc = make_emotion(db, "u1", i)
+        emotion_rollup.record_emotion(db, "u1", doc)
+    assert_exact(db, "u1")
+
+
+def test_first_insert_seed_that_already_saw_a_concurrent_insert(db):
+    # A and B are both inserted before either is recorded: A's seed reads
+    # B from history, so B's own record must not count it a second time
+    a = make_emotion(db, "u1", 1)
+    b = make_emotion(db, "u1", 2)
+    emotion_rollup.record_emotion(db, "u1", a)
+    emotion_rollup.record_emotion(db, "u1", b)
+    assert_exact(db, "u1")
+    assert len(emotion_rollup.get_rollup(db, "u1")["recent"]) == 2
+
+
+def test_out_of_order_records_land_in_timestamp_order(db):
+    for i in range(30):
+        make_emotion(db, "u1", i)
+    emotion_rollup.rebuild(db, "u1")
+    late = make_emotion(db, "u1", 25.5)  # recorded after newer ones
+    emotion_rollup.record_emotion(db, "u1", late)
+    too_old = make_emotion(db, "u1", -10)  # falls outside every window
+    emotion_rollup.record_emotion(db, "u1", too_old)
+    assert_exact(db, "u1")
+
+
+def test_pending_scores_fold_in_later(db):
+    docs = []
+    for i in range(25):
+        doc = make_emotion(db, "u1", i, ai=False)
+        emotion_rollup.record_emotion(db, "u1", doc)
+        docs.append(doc)
+    for doc in docs[-12:]:
+        ai = {"focus_score": random.randint(0, 100), "stress_score": random.randint(0, 100)}
+        db["emotions"].update_one({"_id": doc["_id"]}, {"$set": {"ai": ai}})
+        emotion_rollup.record_scores(db, "u1", doc["_id"], ai)
+    assert_exact(db, "u1")
+
+
+def test_concurrent_first_inserts(db):
+    # two requests insert and record at the same time for a user with no rollup
+    for round_ in range(20):
+        user_id = f"u{round_}"
+        barrier = threading.Barrier(2)
+
+        def request(seconds):
+            doc = make_emotion(db, user_id, seconds)
+            barrier.wait()
+            emotion_rollup.record_emotion(db, user_id, doc)
+
+        threads = [threading.Thread(target=request, args=(s,)) for s in (1, 2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert_exact(db, user_id)
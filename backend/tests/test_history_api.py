@@ -0,0 +1,48 @@
+import datetime
+import json
+
+import pytest
+from bson import ObjectId
+
+
+@pytest.fixture
+def emotions(app_db, user_id):
+    start = datetime.datetime(2024, 5, 1, 9, 0, 0)
+    docs = [{
+        "_id": ObjectId(), "user_id": user_id, "emotion": f"E{i}", "intensity": i,
+        "timestamp": start + datetime.timedelta(milliseconds=i // 3),
+        "ai": {"focus_score": i}, "ai_status": "done", "ai_completed_at": start,
+    } for i in range(17)]
+    app_db.emotions.insert_many(docs)
+    app_db.emotions.insert_one({"_id": ObjectId(), "user_id": "someone-else", "emotion": "X", "timestamp": start})
+    return sorted(docs, key=lambda d: (d["timestamp"], d["_id"]), reverse=True)
+
+
+def walk(client, auth, path, limit):
+    bodies, url = [], f"{path}?limit={limit}"
+    while True:
+        r = client.get(url, headers=auth)
+        assert r.status_code == 200
+        bodies.extend(r.get_json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            return bodies
+        url = f"{path}?limit={limit}&before={cursor}"
+
+
+@pytest.mark.parametrize("limit", [1, 4, 17, 100])
+def test_emotion_pages_return_every_row_once(client, auth, emotions, limit):
+    bodies = walk(client, auth, "/api/emotions", limit)
+    assert [b["_id"] for b in bodies] == [str(d["_id"]) for d in emotions]
+
+
+def test_streamed_history_matches_the_pages(client, auth, emotions):
+    paged = walk(client, auth, "/api/emotions", 5)
+    ndjson = [json.loads(line) for line in client.get("/api/emotions?format=ndjson", headers=auth).get_data(as_text=True).splitlines()]
+    array = client.get("/api/emotions?stream=1", headers=auth).get_json()
+    assert ndjson == array == paged
+
+
+def test_bad_cursor_is_a_400(client, auth, emotions):
+    assert client.get("/api/emotions?before=not-a-cursor", headers=auth).status_code == 400
+    assert client.get("/api/emotions?limit=0", headers=auth).status_code == 400
@@ -0,0 +1,49 @@
+import pytest
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+import indexes
+import llm_cache
+
+
+def test_changed_ttl_is_updated_with_collmod(db, monkeypatch):
+    db.llm_cache.create_indexes([
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=60),
+    ])
+    commands = []
+
+    def command(cmd):
+        # mongomock has no collMod: apply it the way the server would
+        commands.append(cmd)
+        stored = db[cmd["collMod"]]._store.indexes[cmd["index"]["name"]]
+        stored["expireAfterSeconds"] = cmd["index"]["expireAfterSeconds"]
+
+    monkeypatch.setattr(db, "command", command)
+    indexes.ensure_indexes(db)
+
+    assert commands == [{"collMod": "llm_cache",
+                         "index": {"name": "created_at_ttl", "expireAfterSeconds": llm_cache.TTL_SECONDS}}]
+    assert db.llm_cache.index_information()["created_at_ttl"]["expireAfterSeconds"] == llm_cache.TTL_SECONDS
+
+    commands.clear()
+    indexes.ensure_indexes(db)
+    assert commands == []
+
+
+def test_fresh_database_needs_no_collmod(db, monkeypatch):
+    monkeypatch.setattr(db, "command", lambda cmd: (_ for _ in ()).throw(AssertionError(cmd)))
+    indexes.ensure_indexes(db)
+    assert db.llm_cache.index_information()["created_at_ttl"]["expireAfterSeconds"] == llm_cache.TTL_SECONDS
+
+
+def test_duplicate_emails_are_named_when_the_unique_index_fails(db, capsys):
+    for email in ("ada@example.com", "ada@example.com", "bob@example.com", "cy@example.com", "cy@example.com",
+                  "cy@example.com"):
+        db.users.insert_one({"email": email})
+
+    with pytest.raises(OperationFailure):
+        indexes.ensure_indexes(db)
+    out = capsys.readouterr().out
+    assert "'cy@example.com' (3 users), 'ada@example.com' (2 users)" in out
+    assert "bob@example.com" not in out
+    assert "email_unique" not in db.users.index_information()
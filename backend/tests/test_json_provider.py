@@ -0,0 +1,48 @@
+import datetime
+import json
+
+from bson import Decimal128, ObjectId, Timestamp
+
+import json_provider
+
+OID = ObjectId("65f1a2b3c4d5e6f708192a3b")
+DOC = {
+    "_id": OID,
+    "ids": [OID],
+    "naive": datetime.datetime(2024, 5, 1, 12, 30, 15, 250000),
+    "aware": datetime.datetime(2024, 5, 1, 14, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+    "day": datetime.date(2024, 5, 1),
+    "price": Decimal128("0.10"),
+    "ts": Timestamp(1714566600, 1),
+    "blob": b"\x00\x01",
+    "tags": frozenset(["a"]),
+    "nested": {"name": "Åsa", "score": 1e-05},
+}
+EXPECTED = {
+    "_id": "65f1a2b3c4d5e6f708192a3b",
+    "ids": ["65f1a2b3c4d5e6f708192a3b"],
+    "naive": "2024-05-01T12:30:15.250000+00:00",
+    "aware": "2024-05-01T14:30:00+02:00",
+    "day": "2024-05-01",
+    "price": "0.10",
+    "ts": "2024-05-01T12:30:00+00:00",
+    "blob": "AAE=",
+    "tags": ["a"],
+    "nested": {"name": "Åsa", "score": 1e-05},
+}
+
+
+def test_mongo_types_encode_natively():
+    assert json.loads(json_provider.dumps_bytes(DOC)) == EXPECTED
+
+
+def test_stdlib_fallback_encodes_the_same():
+    fallback = json.dumps(DOC, default=json_provider.default, ensure_ascii=False)
+    assert json.loads(fallback) == json.loads(json_provider.dumps_bytes(DOC))
+
+
+def test_jsonify_uses_the_provider(app):
+    with app.test_request_context():
+        response = app.json.response(DOC)
+    assert response.mimetype == "application/json"
+    assert response.get_json() == EXPECTED
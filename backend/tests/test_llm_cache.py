@@ -0,0 +1,67 @@
+import json
+import types
+import uuid
+
+import pytest
+
+import emotion_ai
+import llm_cache
+
+
+class FakeLLM:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    def chat(self, site, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise TimeoutError("model down")
+        content = json.dumps({"focus_score": 70, "stress_score": 20, "motivation_score": 60,
+                              "cognitive_state": "steady", "interpretation": "i", "recommendation": "r"})
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+
+def label():
+    return f"Calm {uuid.uuid4().hex[:8]}"
+
+
+@pytest.mark.parametrize("a, b", [(("  Calm ", 41), ("calm", 44)), (("Very  Tired", 96), ("very tired", "100"))])
+def test_equivalent_inputs_share_a_key(a, b):
+    assert llm_cache.cache_key(*a) == llm_cache.cache_key(*b)
+
+
+def test_bucket_is_clamped_and_tolerates_bad_input():
+    assert llm_cache.bucket_intensity(-5) == 0
+    assert llm_cache.bucket_intensity(250) == 100
+    assert llm_cache.bucket_intensity("n/a") == llm_cache.bucket_intensity(50)
+
+
+def test_one_model_call_per_bucket(db):
+    llm, name = FakeLLM(), label()
+    first, status = emotion_ai.interpret(db, llm, name, 42)
+    assert status == "done"
+    for intensity in (38, 41, 44):
+        assert emotion_ai.interpret(db, llm, f"  {name.upper()} ", intensity) == (first, "done")
+    assert llm.calls == 1
+
+    emotion_ai.interpret(db, llm, name, 80)
+    assert llm.calls == 2
+
+
+def test_answers_survive_a_process_restart(db):
+    llm, name = FakeLLM(), label()
+    answer, _ = emotion_ai.interpret(db, llm, name, 60)
+    llm_cache._memory.clear()
+    assert llm_cache.lookup(db, name, 61) == answer
+    assert llm.calls == 1
+
+
+def test_fallbacks_are_not_cached(db):
+    name = label()
+    ai_data, status = emotion_ai.interpret(db, FakeLLM(fail=True), name, 50)
+    assert status == "fallback"
+    assert ai_data == emotion_ai.FALLBACK
+    assert llm_cache.lookup(db, name, 50) is None
+    assert db.llm_cache.count_documents({}) == 0
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import types
+
+import pytest
+
+import llm_client
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def fake_sdk(outcomes, asynchronous=False):
+    """SDK stand-in whose create() raises or returns the next outcome."""
+    outcomes = iter(outcomes)
+
+    def create(**kwargs):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def acreate(**kwargs):
+        return create(**kwargs)
+
+    completions = types.SimpleNamespace(create=acreate if asynchronous else create)
+    return types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+
+
+def make_client(outcomes, cls=llm_client.LLMClient, **kwargs):
+    kwargs = {"max_retries": 0, "breaker_threshold": 3, "breaker_cooldown": 60, **kwargs}
+    return cls(fake_sdk(outcomes, cls is llm_client.AsyncLLMClient), **kwargs)
+
+
+def ok():
+    return types.SimpleNamespace(usage=None)
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 413, 422])
+def test_client_errors_do_not_open_the_breaker(status):
+    client = make_client([APIStatusError(status)] * 10)
+    for _ in range(10):
+        with pytest.raises(APIStatusError):
+            client.chat("test")
+    assert client.breaker.state == llm_client.CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize("error", [APIStatusError(429), APIStatusError(503), llm_client.LLMTimeoutError("slow")])
+def test_outages_open_the_breaker(error):
+    client = make_client([error] * 3)
+    for _ in range(3):
+        with pytest.raises(type(error)):
+            client.chat("test")
+    assert client.breaker.state == llm_client.CircuitBreaker.OPEN
+    with pytest.raises(llm_client.CircuitOpenError):
+        client.chat("test")
+
+
+def test_client_error_breaks_a_streak_of_outages():
+    client = make_client([APIStatusError(503), APIStatusError(503), APIStatusError(400), APIStatusError(503)])
+    for _ in range(4):
+        with pytest.raises(APIStatusError):
+            client.chat("test")
+    assert client.breaker.snapshot()["consecutive_failures"] == 1
+
+
+def test_half_open_trial_answered_with_a_client_error_closes_the_breaker():
+    client = make_client([APIStatusError(503)] * 3 + [APIStatusError(400), ok()], breaker_cooldown=0)
+    for _ in range(3):
+        with pytest.raises(APIStatusError):
+            client.chat("test")
+    with pytest.raises(APIStatusError):
+        client.chat("test")  # the trial: the endpoint answered
+    assert client.breaker.state == llm_client.CircuitBreaker.CLOSED
+    client.chat("test")
+
+
+def test_half_open_lets_exactly_one_trial_through():
+    breaker = llm_client.CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    barrier = threading.Barrier(16)
+    allowed = []
+
+    def worker():
+        barrier.wait()
+        allowed.append(breaker.allow())
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert allowed.count(True) == 1
+
+
+def test_stream_open_errors_follow_the_same_rule():
+    client = make_client([APIStatusError(400)] * 5)
+    for _ in range(5):
+        with pytest.raises(APIStatusError):
+            list(client.stream("test"))
+    assert client.breaker.state == llm_client.CircuitBreaker.CLOSED
+
+
+def test_async_client_counts_only_outages():
+    async def run(client, n):
+        for _ in range(n):
+            with pytest.raises(APIStatusError):
+                await client.chat("test")
+
+    client = make_client([APIStatusError(422)] * 5, cls=llm_client.AsyncLLMClient)
+    asyncio.run(run(client, 5))
+    assert client.breaker.state == llm_client.CircuitBreaker.CLOSED
+
+    client = make_client([APIStatusError(500)] * 3, cls=llm_client.AsyncLLMClient)
+    asyncio.run(run(client, 3))
+    assert client.breaker.state == llm_client.CircuitBreaker.OPEN
@@ -0,0 +1,130 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import metrics
+
+PROFILE_COUNT = 'http_requests_total{route="/api/user/profile",method="GET",status="200"}'
+
+
+def samples(text):
+    """{'name{labels}': value} for every sample line of an exposition."""
+    out = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            out[name] = float(value)
+    return out
+
+
+def scrape(client, **kwargs):
+    r = client.get("/metrics", **kwargs)
+    assert r.status_code == 200
+    assert r.content_type == metrics.CONTENT_TYPE
+    return r.get_data(as_text=True)
+
+
+def test_exposition_after_a_few_requests(client, auth):
+    before = samples(scrape(client))
+    for _ in range(3):
+        assert client.get("/api/user/profile", headers=auth).status_code == 200
+    client.get("/api/courses/not-an-id", headers=auth)
+    text = scrape(client)
+    after = samples(text)
+
+    assert "# TYPE http_requests_total counter" in text
+    assert "# TYPE http_request_seconds histogram" in text
+    assert after[PROFILE_COUNT] - before.get(PROFILE_COUNT, 0) == 3
+    assert after['http_requests_total{route="/api/courses/<cid>",method="GET",status="400"}'] >= 1
+
+    # histogram: cumulative buckets ending at +Inf == _count, and a sum
+    prefix = 'http_request_seconds_bucket{route="/api/user/profile",method="GET",le="'
+    buckets = [v for k, v in after.items() if k.startswith(prefix)]
+    assert buckets == sorted(buckets)
+    assert after[prefix + '+Inf"}'] == after['http_request_seconds_count{route="/api/user/profile",method="GET"}']
+    assert after['http_request_seconds_count{route="/api/user/profile",method="GET"}'] - \
+        before.get('http_request_seconds_count{route="/api/user/profile",method="GET"}', 0) == 3
+    assert after['http_request_seconds_sum{route="/api/user/profile",method="GET"}'] > 0
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("t_total", "t", ("path",))
+    counter.inc('a"b\\c\nd')
+    assert metrics.render({"t_total": counter.snapshot()}).splitlines()[-1] == 't_total{path="a\\"b\\\\c\\nd"} 1'
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def other_worker(metrics_dir, pid):
+    """Another worker's snapshot: 5 profile reads and a family only it has."""
+    snapshot = {
+        "http_requests_total": {
+            "type": "counter", "help": "HTTP responses by route, method and status.",
+            "labelnames": ["route", "method", "status"],
+            "values": {json.dumps(["/api/user/profile", "GET", "200"]): 5},
+        },
+        "http_request_seconds": {
+            "type": "histogram", "help": "Time to produce the response.", "labelnames": ["route", "method"],
+            "buckets": list(metrics.LATENCY_BUCKETS),
+            "values": {json.dumps(["/api/user/profile", "GET"]): [5] + [0] * len(metrics.LATENCY_BUCKETS) + [0.02]},
+        },
+        "worker_only_total": {"type": "counter", "help": "Only in the other worker.", "labelnames": [],
+                              "values": {"[]": 7}},
+    }
+    (metrics_dir / f"{pid}.json").write_text(json.dumps(snapshot))
+
+
+def test_scrape_sums_the_live_workers_snapshots(client, auth, metrics_dir):
+    client.get("/api/user/profile", headers=auth)
+    own = samples(metrics.render(metrics.REGISTRY.snapshot()))
+
+    other_worker(metrics_dir, os.getppid())  # alive
+    gone = dead_pid()
+    other_worker(metrics_dir, gone)
+    (metrics_dir / "notes.txt").write_text("ignored")
+
+    merged = samples(scrape(client))
+    assert merged[PROFILE_COUNT] == own[PROFILE_COUNT] + 5
+    count = 'http_request_seconds_count{route="/api/user/profile",method="GET"}'
+    assert merged[count] == own[count] + 5
+    assert merged['http_request_seconds_sum{route="/api/user/profile",method="GET"}'] == pytest.approx(
+        own['http_request_seconds_sum{route="/api/user/profile",method="GET"}'] + 0.02)
+    assert merged["worker_only_total"] == 7
+
+    # the exited worker's file is dropped, this worker's is (re)written
+    assert not (metrics_dir / f"{gone}.json").exists()
+    assert (metrics_dir / f"{os.getpid()}.json").exists()
+
+
+def test_merge_sums_counters_and_histograms():
+    a = {"c": {"type": "counter", "help": "", "labelnames": ["x"], "values": {'["1"]': 2}},
+         "h": {"type": "histogram", "help": "", "labelnames": [], "buckets": [1], "values": {"[]": [1, 0, 0.5]}}}
+    b = {"c": {"type": "counter", "help": "", "labelnames": ["x"], "values": {'["1"]': 3, '["2"]': 1}},
+         "h": {"type": "histogram", "help": "", "labelnames": [], "buckets": [1], "values": {"[]": [0, 2, 4.0]}}}
+    merged = metrics.merge([a, b])
+    assert merged["c"]["values"] == {'["1"]': 5, '["2"]': 1}
+    assert merged["h"]["values"] == {"[]": [1, 2, 4.5]}
+    assert a["c"]["values"] == {'["1"]': 2}  # inputs are not modified
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setenv("METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert "# TYPE" in scrape(client, headers={"Authorization": "Bearer scrape-me"})
+
+    monkeypatch.delenv("METRICS_TOKEN")
+    assert client.get("/metrics").status_code == 200
@@ -0,0 +1,84 @@
+import base64
+import datetime
+import math
+
+import pytest
+from bson import ObjectId
+
+import pagination
+
+
+def walk_sorted(col, field, direction, limit):
+    pages, after = [], None
+    while True:
+        docs, after = pagination.sorted_page(col, {"user_id": "u1"}, None, field, direction, limit, after)
+        pages.append(docs)
+        if after is None:
+            return [d["_id"] for page in pages for d in page]
+
+
+@pytest.mark.parametrize("direction", [1, -1])
+@pytest.mark.parametrize("limit", [1, 2, 3, 7])
+def test_sorted_walk_returns_every_row_once(db, direction, limit):
+    values = [0, 1, 1, 2, 1e-05, 2.5e-07, 0.1, 0.1, 3.75, 1e20, -1e-05, math.inf, -math.inf, 7, 7, 7]
+    db.courses.insert_many([{"_id": ObjectId(), "user_id": "u1", "score": v} for v in values])
+    expected = [d["_id"] for d in db.courses.find({"user_id": "u1"}).sort([("score", direction), ("_id", direction)])]
+
+    assert walk_sorted(db.courses, "score", direction, limit) == expected
+
+
+@pytest.mark.parametrize("value", [0, 42, -3, 1e-05, 2.5e-300, 0.1, 1e20, math.inf, -math.inf, 12.0])
+def test_sort_cursor_round_trips_value_and_type(value):
+    oid = ObjectId()
+    decoded, decoded_oid = pagination.decode_sort_cursor(pagination.encode_sort_cursor({"score": value, "_id": oid}, "score"))
+    assert decoded == value and type(decoded) is type(value)
+    assert decoded_oid == oid
+
+
+def tagged_cursor(tagged):
+    return base64.urlsafe_b64encode(f"{tagged}|{ObjectId()}".encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("token", ["", "!!!", base64.urlsafe_b64encode(b"x1|nope").decode(), base64.urlsafe_b64encode(b"fabc|0").decode(),
+                                   tagged_cursor("n12"), tagged_cursor("x12"), tagged_cursor("")])
+def test_bad_sort_cursors_are_rejected(token):
+    with pytest.raises(pagination.CursorError):
+        pagination.decode_sort_cursor(token)
+
+
+def walk_history(col, limit):
+    ids, before = [], None
+    while True:
+        docs, before = pagination.fetch_page(col, {"user_id": "u1"}, None, limit, before)
+        ids.extend(d["_id"] for d in docs)
+        if before is None:
+            return ids
+
+
+@pytest.mark.parametrize("limit", [1, 2, 5, 50])
+def test_history_walk_returns_every_row_once(db, limit):
+    # bursts share a millisecond timestamp, so _id has to break the ties
+    start = datetime.datetime(2024, 5, 1, 12, 0, 0)
+    stamps = [start + datetime.timedelta(milliseconds=i // 4) for i in range(23)]
+    db.emotions.insert_many([{"_id": ObjectId(), "user_id": "u1", "timestamp": ts} for ts in stamps])
+    db.emotions.insert_one({"_id": ObjectId(), "user_id": "u2", "timestamp": start})
+    expected = [d["_id"] for d in db.emotions.find({"user_id": "u1"}).sort(pagination.SORT)]
+
+    ids = walk_history(db.emotions, limit)
+    assert ids == expected
+    assert len(set(ids)) == 23
+
+
+def test_history_walk_is_stable_while_rows_arrive(db):
+    start = datetime.datetime(2024, 5, 1)
+    db.emotions.insert_many([{"_id": ObjectId(), "user_id": "u1", "timestamp": start + datetime.timedelta(seconds=i)}
+                             for i in range(10)])
+    first, before = pagination.fetch_page(db.emotions, {"user_id": "u1"}, None, 4)
+    db.emotions.insert_one({"_id": ObjectId(), "user_id": "u1", "timestamp": start + datetime.timedelta(hours=1)})
+
+    rest = []
+    while before:
+        docs, before = pagination.fetch_page(db.emotions, {"user_id": "u1"}, None, 4, before)
+        rest.extend(docs)
+    assert len(first) + len(rest) == 10
+    assert {d["_id"] for d in first}.isdisjoint(d["_id"] for d in rest)
@@ -0,0 +1,22 @@
+import pytest
+
+import profiling
+
+
+def test_on_demand_profiling_is_off_without_configuration(monkeypatch):
+    monkeypatch.setattr(profiling, "SECRET", None)
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", None)
+    forged = profiling.sign(60, secret="neuro_secret_key")  # the repo's public JWT default
+    assert not profiling.authorized(forged)
+    assert not profiling.authorized("anything")
+    with pytest.raises(ValueError):
+        profiling.sign(60)
+
+
+def test_signed_header_and_admin_token(monkeypatch):
+    monkeypatch.setattr(profiling, "SECRET", "s3cret")
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "admin")
+    assert profiling.authorized(profiling.sign(60))
+    assert profiling.authorized("admin")
+    assert not profiling.authorized(profiling.sign(-1))  # expired
+    assert not profiling.authorized(profiling.sign(60, secret="other"))
@@ -0,0 +1,35 @@
+import threading
+
+import readiness
+
+
+def blocked_warmup(monkeypatch):
+    """A fresh warm-up whose `mongo` check runs until the returned event is set."""
+    release = threading.Event()
+    warmup = readiness.Warmup()
+    monkeypatch.setattr(readiness, "warmup", warmup)
+    warmup.start({"mongo": lambda: release.wait(5)})
+    return warmup, release
+
+
+def test_wait_returns_once_the_check_passes(monkeypatch):
+    warmup, release = blocked_warmup(monkeypatch)
+    assert not warmup.wait("mongo", 0.05)
+    assert not warmup.wait("missing", 0)
+    release.set()
+    assert warmup.wait("mongo", 5)
+    assert warmup.status()["ready"]
+
+
+def test_registration_waits_for_the_unique_email_index(client, app_db, monkeypatch):
+    monkeypatch.setattr(readiness, "WAIT_SECONDS", 0.05)
+    _, release = blocked_warmup(monkeypatch)
+    body = {"name": "Ada", "email": "ada@example.com", "password": "pw"}
+
+    r = client.post("/api/auth/register", json=body)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "5"
+    assert app_db.users.count_documents({}) == 0
+
+    release.set()
+    assert client.post("/api/auth/register", json=body).status_code == 201
@@ -0,0 +1,49 @@
+import datetime
+
+from bson import ObjectId
+
+import pagination
+import request_loader
+
+
+def seed(db, user_id):
+    start = datetime.datetime(2024, 5, 1)
+    db.emotions.insert_many([{
+        "_id": ObjectId(), "user_id": user_id, "emotion": "Calm", "intensity": i,
+        "timestamp": start + datetime.timedelta(minutes=i), "ai": {"focus_score": i}, "ai_status": "done",
+        "ai_requested_at": start, "ai_completed_at": start, "raw_prompt": "x" * 100,
+    } for i in range(6)])
+    db.decisions.insert_many([{
+        "_id": ObjectId(), "user_id": user_id, "question": f"Q{i}", "result": {"final_decision": "Go"},
+        "timestamp": start + datetime.timedelta(minutes=i), "raw_ai": "x" * 100, "context_hash": "h",
+    } for i in range(6)])
+
+
+def test_loader_pages_have_the_direct_read_shape(db):
+    seed(db, "u1")
+    loader = request_loader.RequestLoader(db, {"_id": "u1"})
+    cases = [
+        (loader.recent_emotions, "emotions", request_loader.EMOTION_LIST_PROJECTION),
+        (loader.recent_decisions, "decisions", request_loader.DECISION_LIST_PROJECTION),
+    ]
+    for recent, collection, projection in cases:
+        direct, _ = pagination.fetch_page(db[collection], {"user_id": "u1"}, projection, 4)
+        assert recent(4) == direct
+        assert set(direct[0]) == {"_id", *projection}
+
+
+def test_loader_reads_once_and_forgets_on_write(db, monkeypatch):
+    seed(db, "u1")
+    loader = request_loader.RequestLoader(db, {"_id": "u1"})
+    monkeypatch.setattr(request_loader.data_version, "bump", lambda db, user_id: 1)
+    calls = []
+    find = type(db.emotions).find
+    monkeypatch.setattr(type(db.emotions), "find", lambda self, *a, **kw: calls.append(self.name) or find(self, *a, **kw))
+
+    assert len(loader.recent_emotions(5)) == 5
+    assert len(loader.recent_emotions(3)) == 3
+    assert calls == ["emotions"]
+
+    loader.wrote("emotions")
+    loader.recent_emotions(3)
+    assert calls == ["emotions", "emotions"]
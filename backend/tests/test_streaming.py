@@ -0,0 +1,141 @@
+import codecs
+import json
+import types
+
+import pytest
+
+import streaming
+
+DECISION = {
+    "final_decision": "Keep \"Physics\" \\ drop nothing, café ☕ 🚀",
+    "rationale": "Braces } and ] and commas, inside strings are text.",
+    "confidence_score": 72,
+    "bias_detected": None,
+    "risk_level": "low",
+    "cognitive_alignment": "été \n\t tab",
+    "emotional_influence": "",
+    "short_term_effect": "More load: {\"weeks\": [1, 2]}",
+    "long_term_effect": "Better options",
+    "action_steps": ["Talk to the tutor", {"when": "Monday", "tags": ["a,b", "}"]}],
+}
+# ensure_ascii=True puts \uXXXX escapes (and surrogate pairs) in the stream
+ESCAPED = "```json\n" + json.dumps(DECISION, ensure_ascii=True, indent=1) + "\n```"
+RAW = "```json\n" + json.dumps(DECISION, ensure_ascii=False) + "\n```"
+
+
+def scan(chunks):
+    scanner = streaming.JSONFieldScanner()
+    fields = []
+    for chunk in chunks:
+        fields.extend(scanner.feed(chunk))
+    return fields, scanner
+
+
+@pytest.mark.parametrize("text", [ESCAPED, RAW], ids=["escaped", "raw"])
+def test_every_character_split_yields_the_same_fields(text):
+    for i in range(len(text) + 1):
+        fields, scanner = scan([text[:i], text[i:]])
+        assert fields == list(DECISION.items()), i
+        assert scanner.finished
+
+
+def test_every_byte_split_of_a_utf8_stream_yields_the_same_fields():
+    data = RAW.encode("utf-8")
+    for i in range(len(data) + 1):
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        fields, _ = scan([decoder.decode(data[:i]), decoder.decode(data[i:], final=True)])
+        assert fields == list(DECISION.items()), i
+
+
+def test_one_character_at_a_time():
+    fields, _ = scan(ESCAPED)
+    assert fields == list(DECISION.items())
+
+
+def test_members_are_reported_as_soon_as_they_complete():
+    scanner = streaming.JSONFieldScanner()
+    assert scanner.feed('{"final_decision": "Go, now"') == []
+    assert scanner.feed(', "risk_level"') == [("final_decision", "Go, now")]
+    assert scanner.feed(': "low"}') == [("risk_level", "low")]
+    assert scanner.feed(' trailing {"ignored": 1}') == []
+
+
+# ---------------------------
+# SSE endpoint
+# ---------------------------
+class StreamingLLM:
+    def __init__(self, text, size=7):
+        self.text = text
+        self.size = size
+        self.streams = 0
+
+    def stream(self, site, **kwargs):
+        self.streams += 1
+        for i in range(0, len(self.text), self.size):
+            delta = types.SimpleNamespace(content=self.text[i:i + self.size])
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+
+def events(response):
+    parsed = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            parsed.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+
+@pytest.fixture
+def fake_llm(monkeypatch, app):
+    import app as app_module
+    llm = StreamingLLM(ESCAPED)
+    monkeypatch.setattr(app_module, "llm", llm)
+    return llm
+
+
+def ask(client, auth, question):
+    """The parsed events; reading the body is what runs the stream."""
+    response = client.post("/api/decision/analyze?stream=1", json={"question": question}, headers=auth)
+    assert response.mimetype == "text/event-stream"
+    return events(response)
+
+
+def test_stream_sends_tokens_fields_then_done(client, auth, app_db, fake_llm):
+    sent = ask(client, auth, "Should I drop Physics?")
+    kinds = [kind for kind, _ in sent]
+
+    assert "".join(data["text"] for kind, data in sent if kind == "token") == ESCAPED
+    assert [(d["key"], d["value"]) for k, d in sent if k == "field"] == list(DECISION.items())
+    # fields arrive while the model is still streaming, not after it
+    assert kinds.index("field") < len(kinds) - 1 - kinds[::-1].index("token")
+    assert kinds[-1] == "done" and kinds.count("done") == 1
+    assert sent[-1][1] == DECISION
+
+    assert fake_llm.streams == 1
+    saved = list(app_db.decisions.find({"question": "Should I drop Physics?"}))
+    assert len(saved) == 1
+    assert saved[0]["result"] == DECISION
+
+
+def test_cache_hit_streams_one_done_and_no_model_call(client, auth, app_db, fake_llm):
+    ask(client, auth, "Should I take Chemistry?")
+    sent = ask(client, auth, "Should I take Chemistry?")
+
+    assert fake_llm.streams == 1
+    assert [kind for kind, _ in sent if kind != "field"] == ["done"]
+    assert sent[-1] == ("done", DECISION)
+    assert app_db.decisions.count_documents({"question": "Should I take Chemistry?"}) == 1
+
+
+def test_model_failure_streams_an_error_and_saves_nothing(client, auth, app_db, monkeypatch, app):
+    import app as app_module
+
+    class Broken:
+        def stream(self, site, **kwargs):
+            raise TimeoutError("model down")
+            yield
+
+    monkeypatch.setattr(app_module, "llm", Broken())
+    sent = ask(client, auth, "Should I quit?")
+    assert sent == [("error", {"error": "AI failed to generate a response"})]
+    assert app_db.decisions.count_documents({}) == 0
@@ -0,0 +1,136 @@
+import io
+import json
+
+import pytest
+
+import syllabus
+from course_insights import scan_counters
+
+CSV = """section,title,completed,max_score,score
+lesson,Limits,yes,,
+Lessons,Derivatives,,,
+lab, Lab 1 ,x,,
+assessment,Quiz 1,,20,15
+"""
+ROWS = [
+    {"section": "lesson", "title": "Limits", "completed": True},
+    {"section": "Lessons", "title": "Derivatives"},
+    {"section": "lab", "title": " Lab 1 ", "completed": "x"},
+    {"section": "assessment", "title": "Quiz 1", "max_score": 20, "score": 15},
+]
+EXPECTED = {
+    "lessons": [("Limits", True), ("Derivatives", False)],
+    "labs": [("Lab 1", True)],
+    "assessments": [("Quiz 1", 20, 15)],
+}
+BODIES = {
+    "text/csv": CSV,
+    "application/x-ndjson": "\n".join(json.dumps(r) for r in ROWS) + "\n\n",
+    "application/json": json.dumps(ROWS),
+}
+
+
+def parse(body, content_type, **kwargs):
+    return syllabus.parse(io.BytesIO(body.encode("utf-8")), content_type, **kwargs)
+
+
+def summarize(sections):
+    return {
+        plural: [(i["title"], i["max_score"], i["score"]) if plural == "assessments" else (i["title"], i["completed"])
+                 for i in items]
+        for plural, items in sections.items()
+    }
+
+
+@pytest.mark.parametrize("content_type", [*BODIES, "text/csv; charset=utf-8"])
+def test_each_format_parses_to_the_same_sections(content_type):
+    body = BODIES[content_type.split(";")[0]]
+    assert summarize(parse(body, content_type)) == EXPECTED
+
+
+def test_json_object_of_sections():
+    body = json.dumps({"lessons": ["Limits", {"title": "Derivatives"}], "labs": [{"title": "Lab 1", "completed": 1}],
+                       "assessments": [{"title": "Quiz 1", "max_score": 20, "score": 15}], "notes": ["ignored"]})
+    expected = {**EXPECTED, "lessons": [("Limits", False), ("Derivatives", False)]}
+    assert summarize(parse(body, "application/json")) == expected
+
+
+@pytest.mark.parametrize("content_type, body, error", [
+    ("text/csv", "section,title\nlesson,L1\nchapter,C1\n", "row 2: unknown section 'chapter'"),
+    ("text/csv", "section,title\nlesson,L1\nlab,\n", "row 2: title required"),
+    ("text/csv", "section,title,score\nassessment,Quiz,high\n", "row 1: not a number: 'high'"),
+    ("text/csv", "name,title\nlesson,L1\n", "CSV header must include section,title"),
+    ("application/x-ndjson", '{"section": "lab", "title": "L"}\n["lab"]\n', "row 2: expected an object"),
+    ("application/x-ndjson", '{"section": "lab", "title": "L"}\n{"section": \n', "unreadable body"),
+    ("application/json", '[{"section": "lab", "title": "L"}, {"title": "T"}]', "row 2: unknown section None"),
+    ("application/json", '"lab"', "JSON body must be an array or an object of sections"),
+])
+def test_bad_rows_name_the_row(content_type, body, error):
+    with pytest.raises(syllabus.SyllabusError) as e:
+        parse(body, content_type)
+    assert str(e.value).startswith(error)
+
+
+def test_undecodable_bytes_are_reported():
+    with pytest.raises(syllabus.SyllabusError, match="unreadable body"):
+        syllabus.parse(io.BytesIO(b"section,title\nlesson,\xff\xfe\n"), "text/csv")
+
+
+def test_max_items_cut_off():
+    body = "section,title\n" + "".join(f"lesson,L{i}\n" for i in range(5))
+    assert len(parse(body, "text/csv", max_items=5)["lessons"]) == 5
+    with pytest.raises(syllabus.SyllabusError, match=r"too many items \(max 4\)"):
+        parse(body, "text/csv", max_items=4)
+
+
+@pytest.mark.parametrize("content_type", ["text/plain", "application/xml", "", None])
+def test_unsupported_content_type(content_type):
+    with pytest.raises(syllabus.SyllabusError, match="Unsupported content type"):
+        parse(CSV, content_type)
+
+
+# ---------------------------
+# Route
+# ---------------------------
+@pytest.fixture(params=["embedded", "collection"])
+def course_id(request, client, auth, monkeypatch):
+    monkeypatch.setenv("COURSE_ITEMS_LAYOUT", request.param)
+    return client.post("/api/courses", json={"title": "Calculus", "code": "MA102"}, headers=auth).get_json()["_id"]
+
+
+def stored_counters(app_db, course_id):
+    import course_items
+    from bson import ObjectId
+
+    course = app_db.courses.find_one({"_id": ObjectId(course_id)})
+    if course.get("items_layout") == "collection":
+        return course["counters"], course_items.recount(app_db, course["_id"])
+    return course["counters"], scan_counters(course)
+
+
+def test_import_updates_items_and_counters(client, auth, app_db, course_id):
+    r = client.post(f"/api/courses/{course_id}/syllabus", data=CSV, content_type="text/csv", headers=auth)
+    assert r.status_code == 201
+    assert r.get_json()["imported"] == {"lessons": 2, "labs": 1, "assessments": 1}
+
+    counters, recounted = stored_counters(app_db, course_id)
+    assert counters == recounted
+    assert counters["lessons"] == {"total": 2, "completed": 1}
+    assert counters["labs"] == {"total": 1, "completed": 1}
+    assert counters["assessments"] == {"total": 1, "score": 15, "max_score": 20}
+
+    course = client.get(f"/api/courses/{course_id}", headers=auth).get_json()
+    assert course["counters"] == counters
+    assert [lesson["title"] for lesson in course["lessons"]] == ["Limits", "Derivatives"]
+
+
+@pytest.mark.parametrize("content_type, body", [
+    ("text/csv", "section,title\nlesson,L1\nchapter,C1\n"),
+    ("text/plain", CSV),
+])
+def test_rejected_imports_write_nothing(client, auth, app_db, course_id, content_type, body):
+    before, _ = stored_counters(app_db, course_id)
+    r = client.post(f"/api/courses/{course_id}/syllabus", data=body, content_type=content_type, headers=auth)
+    assert r.status_code == 400
+    assert "error" in r.get_json()
+    assert stored_counters(app_db, course_id)[0] == before
@@ -51,24 +51,33 @@ const Dashboard = () => {
       if (!token) return;
 
       try {
-        const [profileRes, emotionRes, dashboardRes] = await Promise.all([
-          fetch(`${API_BASE_URL}/api/user/profile`, {
-            headers: { Authorization: `Bearer ${token}` },
+        // one round trip: profile, emotion summary and dashboard via /api/batch
+        const batchRes = await fetch(`${API_BASE_URL}/api/batch`, {
+          method: "POST",
+          headers: {
+            Authorization: `Bearer ${token}`,
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({
+            parallel: true,
+            requests: [
+              { method: "GET", path: "/api/user/profile" },
+              { method: "GET", path: "/api/emotions/summary" },
+              { method: "GET", path: "/api/dashboard" },
+            ],
           }),
-          fetch(`${API_BASE_URL}/api/emotions/summary`, {
-            headers: { Authorization: `Bearer ${token}` },
-          }),
-          fetch(`${API_BASE_URL}/api/dashboard`, {
-            headers: { Authorization: `Bearer ${token}` },
-          }),
-        ]);
+        });
+
+        const batchData = await batchRes.json();
+        if (!batchRes.ok) throw new Error(batchData.error || "Failed to load dashboard");
 
-        const profileData = await profileRes.json();
-        const emotionData = await emotionRes.json();
-        const dashboardData: DashboardData = await dashboardRes.json();
+        const [profileRes, emotionRes, dashboardRes] = batchData.responses;
+        const profileData = profileRes.body;
+        const emotionData = emotionRes.body;
+        const dashboardData: DashboardData = dashboardRes.body ?? {};
 
-        if (!profileRes.ok) throw new Error(profileData.error || "Failed to load user");
-        if (!emotionRes.ok) throw new Error(emotionData.error || "Failed to load emotions");
+        if (profileRes.status !== 200) throw new Error(profileData?.error || "Failed to load user");
+        if (emotionRes.status !== 200) throw new Error(emotionData?.error || "Failed to load emotions");
 
         // Profile & emotion
         setUser(profileData);
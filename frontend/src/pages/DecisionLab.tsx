@@ -155,7 +155,7 @@ const DecisionLab = () => {
                 <div className="flex justify-between items-start">
                   <div>
                     <p className="font-medium">{h.question}</p>
-                    <p className="text-xs text-muted-foreground">{h.timestamp}</p>
+                    <p className="text-xs text-muted-foreground">{new Date(h.timestamp).toLocaleString()}</p>
                   </div>
                   <div className="text-right">
                     <p className="text-sm font-semibold">{h.result?.confidence_score ?? "-" }%</p>